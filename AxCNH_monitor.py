@@ -4,11 +4,19 @@ cron: */10 * * * *
 '''
 
 # 监控AxCNH的监管账号的余额变更
-from typing import TypedDict
+from typing import TypedDict, Dict, List
 import os
-import json
-import requests
+import re
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from utils.notify_utils import BarkNotify
+from utils.http_metrics import InstrumentedSession, TimedHTTPAdapter
+from utils.series_store import SeriesStore
+from utils.state_store import StateStore
+from utils.metrics_exporter import Metrics
+from utils.watcher import Watch, handled_by_runner
 import sys, traceback
 class Data(TypedDict):
     """
@@ -16,88 +24,323 @@ class Data(TypedDict):
     """
     AxCNH_supply: str
     AxCNH_bank_balance: str
+    AxCNH_balances: Dict[str, str]
+    AxCNH_trend_alerts: Dict[str, int]
 # 直接使用conflux_web3去跟踪的话有点麻烦，采用confluxscan的API方式
 class ConfluxScan:
-    def __init__(self):
+    # confluxscan 免费 API 限速（次/秒）
+    RATE_LIMIT = 5
+    # ERC20 方法选择器
+    SELECTOR_TOTAL_SUPPLY = '0x18160ddd'
+    SELECTOR_BALANCE_OF = '0x70a08231'
+    def __init__(self, rpc=None, rate_limit=RATE_LIMIT, max_workers=4):
         self.api= 'https://api.confluxscan.org'
         self.evmapi = 'https://evmapi.confluxscan.org'
+        # eSpace JSON-RPC 地址，配置后优先用批量 eth_call 一次取回
+        self.rpc = rpc
+        self.max_workers = max_workers
+        self.session = InstrumentedSession()
+        self.session.mount('https://', TimedHTTPAdapter(pool_maxsize=max_workers))
+        # 简单的匀速限流
+        self._interval = 1 / rate_limit
+        self._next_slot = 0.0
+        self._rate_lock = threading.Lock()
+    def _reserve_slot(self):
+        """占用下一个请求时间片，返回需要等待的秒数"""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        return wait
+    def _throttle(self):
+        wait = self._reserve_slot()
+        if wait > 0:
+            time.sleep(wait)
+    def _get(self, url):
+        self._throttle()
+        return self.session.get(url, timeout=30).json().get('result')
+    async def _get_async(self, client, url):
+        wait = self._reserve_slot()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        response = await client.get(url, timeout=30)
+        return response.json().get('result')
+    def token_supply_url(self, contract_address):
+        return self.evmapi + f'/api?module=stats&action=tokensupply&contractaddress={contract_address}'
+    def token_balance_url(self, contract_address, address):
+        return self.evmapi + f'/api?module=account&action=tokenbalance&contractaddress={contract_address}&address={address}'
     def get_token_supply(self, contract_address):
         """
         获取代币的供应量
         """
-        url = self.evmapi + f'/api?module=stats&action=tokensupply&contractaddress={contract_address}'
-        return requests.get(url).json().get('result')
+        return self._get(self.token_supply_url(contract_address))
     def get_token_banlance(self, contract_address, address):
         """
         获取代币的余额
         """
-        url = self.evmapi + f'/api?module=account&action=tokenbalance&contractaddress={contract_address}&address={address}'
-        return requests.get(url).json().get('result')
+        return self._get(self.token_balance_url(contract_address, address))
+    @staticmethod
+    def rpc_payload(calls):
+        return [
+            {'jsonrpc': '2.0', 'id': i, 'method': 'eth_call', 'params': [{'to': to, 'data': data}, 'latest']}
+            for i, (to, data) in enumerate(calls)
+        ]
+    def rpc_batch(self, calls):
+        """
+        批量 eth_call，一次请求返回所有结果
+        :param calls: [(合约地址, 调用数据)]
+        :return: 十进制字符串结果列表，与 calls 一一对应
+        """
+        responses = self.session.post(self.rpc, json=self.rpc_payload(calls), timeout=30).json()
+        return self.rpc_values(calls, responses)
+    @staticmethod
+    def rpc_values(calls, responses):
+        results = {r['id']: r for r in responses}
+        values = []
+        for i in range(len(calls)):
+            if 'result' not in results.get(i, {}):
+                raise RuntimeError(f"eth_call 失败: {results.get(i, {}).get('error')}")
+            values.append(str(int(results[i]['result'], 16)))
+        return values
+    def rpc_calls(self, contracts, holders):
+        calls = [(c, self.SELECTOR_TOTAL_SUPPLY) for c in contracts]
+        calls += [(c, self.SELECTOR_BALANCE_OF + h.lower().replace('0x', '').rjust(64, '0')) for c in contracts for h in holders]
+        return calls
+    @staticmethod
+    def rpc_collected(contracts, holders, values):
+        supply = dict(zip(contracts, values[:len(contracts)]))
+        balances = {c: {} for c in contracts}
+        for (c, h), value in zip([(c, h) for c in contracts for h in holders], values[len(contracts):]):
+            balances[c][h] = value
+        return {'supply': supply, 'balances': balances}
+    def _collect_rpc(self, contracts, holders):
+        return self.rpc_collected(contracts, holders, self.rpc_batch(self.rpc_calls(contracts, holders)))
+    @staticmethod
+    def scan_amount(value, label):
+        """
+        confluxscan 返回的 result 转为十进制整数字符串
+        限流或出错时 result 可能是提示文字，此时打印警告并返回 None（与未查到相同）
+        """
+        if value is None:
+            return None
+        text = str(value).strip()
+        if text.isdigit():
+            return str(int(text))
+        print(f"⚠️ {label} 查询结果 {value!r} 不是整数，按未查到处理")
+        return None
+    def scan_collected(self, contracts, holders, supply, balances):
+        return {
+            'supply': {c: self.scan_amount(supply[c], f'{c} 供应量') for c in contracts},
+            'balances': {c: {h: self.scan_amount(balances[c][h], f'{h} 余额') for h in holders} for c in contracts},
+        }
+    def _collect_scan(self, contracts, holders):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            supply_futures = {c: executor.submit(self.get_token_supply, c) for c in contracts}
+            balance_futures = {c: {h: executor.submit(self.get_token_banlance, c, h) for h in holders} for c in contracts}
+            return self.scan_collected(contracts, holders,
+                                       {c: f.result() for c, f in supply_futures.items()},
+                                       {c: {h: f.result() for h, f in fs.items()} for c, fs in balance_futures.items()})
+    def collect(self, contracts: List[str], holders: List[str]):
+        """
+        查询多个合约的供应量及多个地址的余额
+        优先走 JSON-RPC 批量请求，失败时改为并发调用 confluxscan API
+        :return: {'supply': {合约: 供应量}, 'balances': {合约: {地址: 余额}}}
+        """
+        if self.rpc:
+            try:
+                return self._collect_rpc(contracts, holders)
+            except Exception as e:
+                print(f"JSON-RPC 批量查询失败，改用 confluxscan API: {e}")
+        return self._collect_scan(contracts, holders)
+    async def collect_async(self, client, contracts: List[str], holders: List[str]):
+        """
+        与 collect 相同，使用传入的 httpx.AsyncClient（统一监测引擎共享的连接池）
+        """
+        if self.rpc:
+            try:
+                calls = self.rpc_calls(contracts, holders)
+                response = await client.post(self.rpc, json=self.rpc_payload(calls), timeout=30)
+                return self.rpc_collected(contracts, holders, self.rpc_values(calls, response.json()))
+            except Exception as e:
+                print(f"JSON-RPC 批量查询失败，改用 confluxscan API: {e}")
+        supply = await asyncio.gather(*(self._get_async(client, self.token_supply_url(c)) for c in contracts))
+        balances = await asyncio.gather(*(asyncio.gather(*(self._get_async(client, self.token_balance_url(c, h)) for h in holders))
+                                          for c in contracts))
+        return self.scan_collected(contracts, holders, dict(zip(contracts, supply)),
+                                   {c: dict(zip(holders, values)) for c, values in zip(contracts, balances)})
 class DataFile:
-    def __init__(self):
-        self.file_path = '/ql/data/AxCNH_result.json'
+    def __init__(self, file_path='/ql/data/AxCNH_result.json'):
+        self.file_path = file_path
+        self.store = StateStore(self.file_path)
+    def lock(self):
+        """定时任务重叠执行时串行化读改写"""
+        return self.store.lock()
     def read(self)->Data:
-        # 检查文件是否存在
-        if os.path.exists(self.file_path):
-            return json.loads(open(self.file_path, 'r', encoding='utf-8').read())
-        return None
+        # 文件不存在或损坏时返回 None
+        return self.store.load()
     def write(self, data: Data):
-        # 检查文件是否存在
-        if not os.path.exists(self.file_path):
-            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-if __name__ == "__main__":
-    try:
-        AxCNH_contract_address = '0x70bfd7f7eadf9b9827541272589a6b2bb760ae2e'
-        bank_address = '0xf8fC002aAE4F42B7aafE9Ef43eCca1C3EDA15D8e'
-        api = ConfluxScan()
-        # 获取代币供应量
-        AxCNH_supply=api.get_token_supply(AxCNH_contract_address)
-        print(f"AxCNH代币供应量:{AxCNH_supply}")
-        # 获取现存已知的受信账户代币的余额
-        AxCNH_bank_balance=api.get_token_banlance(AxCNH_contract_address,bank_address)
-        print(f"AxCNH代币收信账户余额:{AxCNH_bank_balance}")
-        data_file = DataFile()
+        self.store.save(data)
+class Num_Format:
+    '''
+    数字格式化
+    '''
+    @staticmethod
+    def format_number(num_str):
+        '''
+        将数字字符串格式化为带单位的显示格式(K, M, B等)
+        '''
+        try:
+            num = float(num_str)
+            if num >= 1e9:
+                return f"{num/1e9:.2f}B"
+            elif num >= 1e6:
+                return f"{num/1e6:.2f}M"
+            elif num >= 1e3:
+                return f"{num/1e3:.2f}K"
+            else:
+                return str(num)
+        except (ValueError, TypeError):
+            return num_str
+def check_trends(history: SeriesStore, names: Dict[str, str], alerted: Dict[str, int]):
+    """
+    检查时间窗口内的变化幅度，超过阈值时推送（同一序列一个窗口内只推送一次）
+    :param names: {序列名: 推送标题}
+    :param alerted: {序列名: 上次推送时间}，会被更新
+    """
+    threshold = float(os.environ.get('AxCNH_alert_pct', '5'))
+    window = int(float(os.environ.get('AxCNH_alert_window_hours', '24')) * 3600)
+    now = int(time.time())
+    for name, title in names.items():
+        delta = history.delta(name, window)
+        if not delta or delta['percent'] is None or abs(delta['percent']) < threshold:
+            continue
+        if now - alerted.get(name, 0) < window:
+            continue
+        old_formatted = Num_Format.format_number(delta['old'])
+        new_formatted = Num_Format.format_number(delta['new'])
+        BarkNotify.send_notify(title, f'{window // 3600}小时内从 {old_formatted} 变为 {new_formatted}（{delta["percent"]:+.2f}%）',level=BarkNotify.Level.CRITICAL,group='AxCNH')
+        alerted[name] = now
+AxCNH_contract_address = '0x70bfd7f7eadf9b9827541272589a6b2bb760ae2e'
+bank_address = '0xf8fC002aAE4F42B7aafE9Ef43eCca1C3EDA15D8e'
+def parse_holders():
+    # 额外关注的储备地址，逗号分隔
+    return [bank_address] + [h for h in re.split(r'[,，\s]+', os.environ.get('AxCNH_holders', '')) if h and h != bank_address]
+def compare_balances(old, new):
+    """
+    比较供应量与各地址余额，返回变化列表 [{'title', 'body', 'url'}]
+    """
+    if not old:
+        return []
+    changes = []
+    # 任一侧未查到（None）时不比较，避免把查询失败当成变动推送
+    if None not in (old.get('supply'), new['supply']) and old.get('supply') != new['supply']:
+        changes.append({'title': '代币总供应量出现变动',
+                        'body': f"从 {Num_Format.format_number(old.get('supply'))} 变更为 {Num_Format.format_number(new['supply'])}",
+                        'url': f'https://evm.confluxscan.org/token/{AxCNH_contract_address}'})
+    old_balances = old.get('balances', {})
+    for holder, balance in new['balances'].items():
+        # 新加入关注的地址没有旧值，不推送
+        if None not in (old_balances.get(holder), balance) and old_balances[holder] != balance:
+            title = '授权银行余额出现变动' if holder == bank_address else '储备地址余额出现变动'
+            changes.append({'title': title,
+                            'body': f"{holder} 从 {Num_Format.format_number(old_balances[holder])} 变更为 {Num_Format.format_number(balance)}",
+                            'url': f'https://evm.confluxscan.org/address/{holder}'})
+    return changes
+def stored_balances(result):
+    """
+    AxCNH_result.json 的内容转为 compare_balances 使用的 {'supply', 'balances'}，没有记录时为 None
+    """
+    if not result:
+        return None
+    balances = dict(result.get('AxCNH_balances') or {})
+    balances.setdefault(bank_address, result.get('AxCNH_bank_balance'))
+    return {'supply': result.get('AxCNH_supply'), 'balances': balances}
+def notify_change(change):
+    BarkNotify.send_notify(change['title'], change['body'], level=BarkNotify.Level.CRITICAL, group='AxCNH', url=change['url'])
+def build_watches(data_file=None):
+    """
+    统一监测引擎使用的监测项：供应量与余额变化即推送（历史趋势仍由 main 记录），
+    首次执行时从 AxCNH_result.json 接续上次的供应量和余额
+    """
+    api = ConfluxScan(rpc=os.environ.get('conflux_evm_rpc', 'https://evm.confluxrpc.com'))
+    holders = parse_holders()
+    data_file = data_file or DataFile()
+    def seed():
+        old = stored_balances(data_file.read())
+        return {'value': old} if old else None
+    async def fetch(client, old):
+        return await api.collect_async(client, [AxCNH_contract_address], holders)
+    return [Watch(
+        name='AxCNH',
+        fetch=fetch,
+        extract=lambda collected: {'supply': collected['supply'][AxCNH_contract_address],
+                                   'balances': collected['balances'][AxCNH_contract_address]},
+        compare=compare_balances,
+        notify=notify_change,
+        interval=600,
+        seed=seed,
+    )]
+metrics = Metrics.for_job('AxCNH_monitor')
+@metrics.track
+def main():
+    holders = parse_holders()
+    api = ConfluxScan(rpc=os.environ.get('conflux_evm_rpc', 'https://evm.confluxrpc.com'))
+    collected = api.collect([AxCNH_contract_address], holders)
+    # 获取代币供应量
+    AxCNH_supply = collected['supply'][AxCNH_contract_address]
+    print(f"AxCNH代币供应量:{AxCNH_supply}")
+    # 获取现存已知的受信账户代币的余额
+    balances = collected['balances'][AxCNH_contract_address]
+    AxCNH_bank_balance = balances[bank_address]
+    print(f"AxCNH代币收信账户余额:{AxCNH_bank_balance}")
+    for holder in holders[1:]:
+        print(f"AxCNH代币地址{holder}余额:{balances[holder]}")
+    # 导出指标（原始整数值，未查到时不记录）
+    metrics.gauge('axcnh_total_supply', AxCNH_supply, 'AxCNH 代币总供应量', contract=AxCNH_contract_address)
+    for holder in holders:
+        metrics.gauge('axcnh_balance', balances[holder], 'AxCNH 地址余额', contract=AxCNH_contract_address, address=holder)
+    # 记录历史（精确整数），用于趋势判断
+    history = SeriesStore('/ql/data/AxCNH_history.db')
+    data_file = DataFile()
+    # 加锁，避免上一轮还没写完时本轮读到旧值重复推送
+    with data_file.lock():
         result = data_file.read()
-        class Num_Format:
-            '''
-            数字格式化
-            '''
-            @staticmethod
-            def format_number(num_str):
-                '''
-                将数字字符串格式化为带单位的显示格式(K, M, B等)
-                '''
-                try:
-                    num = float(num_str)
-                    if num >= 1e9:
-                        return f"{num/1e9:.2f}B"
-                    elif num >= 1e6:
-                        return f"{num/1e6:.2f}M"
-                    elif num >= 1e3:
-                        return f"{num/1e3:.2f}K"
-                    else:
-                        return str(num)
-                except (ValueError, TypeError):
-                    return num_str
-        
-        if result:
-            if result.get('AxCNH_supply') != AxCNH_supply:
-                old_formatted = Num_Format.format_number(result.get('AxCNH_supply'))
-                new_formatted = Num_Format.format_number(AxCNH_supply)
-                BarkNotify.send_notify('代币总供应量出现变动', f'从 {old_formatted} 变更为 {new_formatted}',level=BarkNotify.Level.CRITICAL,group='AxCNH',url=f'https://evm.confluxscan.org/token/{AxCNH_contract_address}')
-            if result.get('AxCNH_bank_balance') != AxCNH_bank_balance:
-                old_formatted = Num_Format.format_number(result.get('AxCNH_bank_balance'))
-                new_formatted = Num_Format.format_number(AxCNH_bank_balance)
-                BarkNotify.send_notify('授权银行余额出现变动',f'从 {old_formatted} 变更为 {new_formatted}',level=BarkNotify.Level.CRITICAL,group='AxCNH',url=f'https://evm.confluxscan.org/address/{bank_address}')
+        trend_alerts = (result or {}).get('AxCNH_trend_alerts', {})
+        try:
+            series_names = {f'supply:{AxCNH_contract_address}': '代币总供应量短期大幅变动'}
+            if AxCNH_supply is not None:
+                history.append(f'supply:{AxCNH_contract_address}', AxCNH_supply)
+            for holder in holders:
+                name = f'balance:{AxCNH_contract_address}:{holder.lower()}'
+                series_names[name] = f'{holder[:10]}余额短期大幅变动'
+                if balances[holder] is not None:
+                    history.append(name, balances[holder])
+            # 30 天前的数据只保留变化点
+            history.compact(older_than=30 * 86400)
+            check_trends(history, series_names, trend_alerts)
+        finally:
+            history.close()
 
-        
+        old = stored_balances(result)
+        new = {'supply': AxCNH_supply, 'balances': balances}
+        # 统一监测已负责变动推送时只记录历史和趋势，避免重复推送
+        if not handled_by_runner('AxCNH_monitor'):
+            for change in compare_balances(old, new):
+                notify_change(change)
+        # 本次未查到的值沿用上次记录，下次仍与最后一次查到的值比较
+        if old:
+            AxCNH_supply = old['supply'] if AxCNH_supply is None else AxCNH_supply
+            balances = {h: old['balances'].get(h) if v is None else v for h, v in balances.items()}
         file_result = {
             'AxCNH_supply':AxCNH_supply,
-            'AxCNH_bank_balance':AxCNH_bank_balance,
+            'AxCNH_bank_balance':balances[bank_address],
+            'AxCNH_balances':balances,
+            'AxCNH_trend_alerts':trend_alerts,
         }
         data_file.write(file_result)
+if __name__ == "__main__":
+    try:
+        main()
     except Exception as e:
         print("脚本执行出错:", e)
-        traceback.print_exc(file=sys.stdout)
\ No newline at end of file
+        traceback.print_exc(file=sys.stdout)
@@ -2,13 +2,14 @@
 name: 苹果ESIM说明页面更新监测
 cron: */10 8-23 * * *
 '''
-import requests
 from utils.notify_utils import BarkNotify
 from utils.ql_utils import QLUtils
-import datetime
-import os
+from utils.page_watch import PageWatcher
+from utils.state_store import StateStore
+from utils.watcher import Watch, handled_by_runner
 import sys
 import traceback
+# etag / last-modified 为首次运行时的已知版本，之后以状态文件中保存的为准
 match_data = [{
     "name": "苹果大陆ESIM中文说明页面",
     "url": "https://support.apple.com/zh-cn/123879",
@@ -20,27 +21,60 @@ match_data = [{
     "etag": "a56T1AULltDRsAug28JD4Z110--gzip",
     "last-modified": "Fri, 12 Sep 2025 00:06:12 GMT"
 }]
+# 只比较正文区域，忽略页头页脚等无关改动
+CONTENT_REGION = r'<main[\s\S]*?</main>'
+
+
+def build_watches(page_state_path=PageWatcher.DEFAULT_STATE_PATH):
+    """
+    统一监测引擎使用的监测项：条件请求 + 正文哈希比较；
+    首次执行时从 page_watch_state.json 接续校验值和正文哈希，没有记录时使用已知版本的校验值
+    """
+    page_state = StateStore(page_state_path, default=dict).load()
+
+    def seed(item):
+        entry = page_state.get(item['url'])
+        if entry:
+            return {'value': entry.get('hash'), 'etag': entry.get('etag'), 'last_modified': entry.get('last_modified')}
+        return {'etag': item['etag'], 'last_modified': item['last-modified']}
+
+    return [Watch(
+        name=f"apple_page:{item['url']}",
+        url=item['url'],
+        conditional=True,
+        extract=lambda response: PageWatcher.content_hash(response.text, CONTENT_REGION),
+        title=f"{item['name']}已更新",
+        body=f"{item['name']}已更新",
+        group='applestore',
+        interval=600,
+        seed=lambda item=item: seed(item),
+    ) for item in match_data]
+
+
+def main():
+    # 部署有前缀的话，需要适配
+    QLUtils.init_from_env()
+    if handled_by_runner('apple_monitor1'):
+        return
+    watcher = PageWatcher()
+    for item in match_data:
+        try:
+            result = watcher.check(item["url"], region=CONTENT_REGION,
+                                   etag=item["etag"], last_modified=item["last-modified"])
+        except Exception as e:
+            print(f"{item['name']}检查失败: {e}")
+            continue
+        if result['changed']:
+            print(f"{item['name']}已更新")
+            BarkNotify().send_notify(
+                f"{item['name']}已更新", f"{item['name']}已更新（{result['last_modified']}）", level=BarkNotify.Level.CRITICAL, group='applestore', url=item['url'])
+        else:
+            print(f"{item['name']}未更新（{result['status']}）")
+
+
 if __name__ == '__main__':
     try:
-        # 部署有前缀的话，需要适配
-        if os.environ.get("QlBaseUrl") is not None:
-            QLUtils.set_config(
-                host=f'http://127.0.0.1:5700{os.environ.get("QlBaseUrl")}/open')
-        for item in match_data:
-            headers = {
-                "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
-                "If-None-Match": item["etag"],
-                "If-Modified-Since": item["last-modified"]
-            }
-            response = requests.get(item["url"], headers=headers)
-            if response.status_code == 200:
-                last_modified = response.headers.get("Last-Modified")
-                # 把last_modified的GMT时间转成本地时间和现在进行比较，1小时内才提示
-                if (datetime.strptime(last_modified, "%a, %d %b %Y %H:%M:%S GMT") - datetime.now()).total_seconds() > 60 * 60:
-                    print(f"{item['name']}已更新")
-                    BarkNotify().send_notify(
-                        f"{item['name']}已更新", f"{item['name']}已更新", level=BarkNotify.Level.CRITICAL, group='applestore', url=item['url'])
-                    QLUtils.disable_self()
+        main()
     except Exception as e:
         print("脚本执行出错:", e)
         traceback.print_exc(file=sys.stdout)
@@ -3,76 +3,292 @@ name: 国行苹果Air购买界面监测
 cron: */5 8-23 * * *
 '''
 import requests
+from requests.cookies import create_cookie
 from utils.notify_utils import BarkNotify
 from utils.ql_utils import QLUtils
+from utils.state_store import StateStore
+from utils.watcher import Watch, handled_by_runner
+import io
 import os
+import re
 import sys
+import json
+import time
 import traceback
+from urllib.parse import urlsplit
 
 
-def extract_final_buyability(data):
+# 增量 JSON 解析（可选依赖），未安装时先完整解析再提取
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+BUYABILITY_SOURCES = ("stores", "sticky", "regular")
+
+
+def _children(node):
+    """返回子节点迭代器，元素为 (键, 值)，列表元素的键为 None"""
+    if isinstance(node, dict):
+        return iter(node.items())
+    if isinstance(node, list):
+        return ((None, item) for item in node)
+    return None
+
+
+def _all_found(result, sources):
+    return all(result.get(src) is not None for src in sources)
+
+
+def _finish(result, sources):
+    # 如果有的来源没有找到，默认设为 False
+    return {src: False if result.get(src) is None else result[src] for src in sources}
+
+
+def extract_final_buyability(data, sources=BUYABILITY_SOURCES):
     """
     提取 stores、sticky、regular 三个字段的 buyability.isBuyable 最终结果
+    使用显式栈按深度优先顺序遍历，所有来源都找到后立即停止
     :param data: dict 或 list
     :return: dict，形如 { "stores": True, "sticky": False, "regular": True }
     """
-    sources = ["stores", "sticky", "regular"]
-    result = {src: None for src in sources}  # 先设为空
-
-    def recursive_scan(sub_data, current_source=None):
-        if isinstance(sub_data, dict):
-            for k, v in sub_data.items():
-                if k in sources:
-                    recursive_scan(v, current_source=k)
-                elif k == "buyability" and isinstance(v, dict) and "isBuyable" in v:
-                    if current_source and result[current_source] is None:  # 只取第一个结果
-                        result[current_source] = v["isBuyable"]
-                else:
-                    recursive_scan(v, current_source)
-        elif isinstance(sub_data, list):
-            for item in sub_data:
-                recursive_scan(item, current_source)
-
-    recursive_scan(data)
+    result = {}  # 只取每个来源的第一个非空结果
+    stack = [(_children(data), None)]
+    while stack and not _all_found(result, sources):
+        items, current_source = stack[-1]
+        item = next(items, None) if items is not None else None
+        if item is None:
+            stack.pop()
+            continue
+        k, v = item
+        if k in sources:
+            stack.append((_children(v), k))
+        elif k == "buyability" and isinstance(v, dict) and "isBuyable" in v:
+            if current_source and result.get(current_source) is None:
+                result[current_source] = v["isBuyable"]
+        else:
+            stack.append((_children(v), current_source))
 
-    # 如果有的来源没有找到，默认设为 False
-    for src in sources:
-        if result[src] is None:
-            result[src] = False
+    return _finish(result, sources)
 
-    return result
 
+def extract_final_buyability_from_stream(source, sources=BUYABILITY_SOURCES):
+    """
+    直接在原始响应上增量解析，不构建完整的 dict，所有来源找到后停止读取
+    isBuyable 取值按标量处理（接口返回的都是布尔值）
+    :param source: bytes 或可读的文件对象（如 response.raw）
+    """
+    if ijson is None:
+        raw = source if isinstance(source, (bytes, str)) else source.read()
+        return extract_final_buyability(json.loads(raw), sources)
 
-if __name__ == '__main__':
-    try:
-        # 部署有前缀的话，需要适配
-        if os.environ.get("QlBaseUrl") is not None:
-            QLUtils.set_config(
-                host=f'http://127.0.0.1:5700{os.environ.get("QlBaseUrl")}/open')
-        # 下面是对国行air购买界面直接监控
-        headers = {
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    result = {}
+    # 每层容器：[所在键, 当前来源, 是否为对象, 对象中待处理的键]
+    frames = []
+    for _, event, value in ijson.parse(source):
+        if event == 'map_key':
+            frames[-1][3] = value
+        elif event in ('start_map', 'start_array'):
+            parent = frames[-1] if frames else None
+            key = parent[3] if parent and parent[2] else None
+            current_source = key if key in sources else (parent[1] if parent else None)
+            frames.append([key, current_source, event == 'start_map', None])
+        elif event in ('end_map', 'end_array'):
+            frames.pop()
+        elif frames and frames[-1][0] == "buyability" and frames[-1][3] == "isBuyable":
+            current_source = frames[-1][1]
+            if current_source and result.get(current_source) is None:
+                result[current_source] = value
+                if _all_found(result, sources):
+                    break
+
+    return _finish(result, sources)
+
+
+class AppleBuyabilityWatcher:
+    """
+    多 SKU 购买状态监测：一次 buyability-message 请求查询所有型号，
+    复用预热过的会话，cookie 过期时才重新预热
+    """
+    HEADERS = {
+        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+    }
+    PRODUCT_URL = "https://www.apple.com.cn/shop/buy-iphone/iphone-air"
+    BEACON_URL = "https://www.apple.com.cn/shop/beacon/atb"
+    BUYABILITY_URL = "https://www.apple.com.cn/shop/buyability-message"
+    FULFILLMENT_URL = "https://www.apple.com.cn/shop/fulfillment-messages"
+
+    def __init__(self, parts, product_url=PRODUCT_URL, state_path='/ql/data/apple_buyability.json'):
+        self.parts = parts
+        self.product_url = product_url
+        self.state_path = state_path
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        self.store = StateStore(state_path, default=dict)
+        self.state = self.store.load()
+        # 恢复上次运行保存的 cookie
+        for cookie in self.state.get('cookies', []):
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                     path=cookie['path'], expires=cookie['expires'])
+
+    def _write_state(self, cookies=None):
+        self.state['cookies'] = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+            for c in (self.session.cookies if cookies is None else cookies)
+        ]
+        self.store.save(self.state)
+
+    def _cookies_valid(self, cookies=None):
+        """有 cookie 且都未过期"""
+        cookies = list(self.session.cookies if cookies is None else cookies)
+        now = time.time()
+        return bool(cookies) and all(c.expires is None or c.expires > now for c in cookies)
+
+    def warmup(self, force=False):
+        """访问商品页和 beacon 获取 cookie"""
+        if not force and self._cookies_valid():
+            return
+        print("预热会话，获取 cookie")
+        self.session.cookies.clear()
+        self.session.get(self.product_url, timeout=30)
+        self.session.get(self.BEACON_URL, timeout=30)
+
+    def _parse_buyability(self, data):
+        """从 buyability-message 响应中取出 {型号: 是否可购买}，格式不对时返回 None"""
+        body = data.get('body') or {}
+        message = (body.get('content') or {}).get('buyabilityMessage')
+        if message is None:
+            return None
+        return {
+            part: any(((message.get(src) or {}).get(part) or {}).get('isBuyable', False) for src in ('sth', 'apu'))
+            for part in self.parts
         }
-        session=requests.session()
-        session.get("https://www.apple.com.cn/shop/buy-iphone/iphone-air", headers=headers)
-        session.get("https://www.apple.com.cn/shop/beacon/atb",headers=headers)
-        result = requests.get(
-            'https://www.apple.com.cn/shop/buyability-message?parts.0=MG3C4CH/A', headers=headers).json()
-        buyabilityMessage = result.get('body').get(
-            'content').get('buyabilityMessage')
-        if ('sth' in buyabilityMessage and buyabilityMessage.get('sth').get('MG3C4CH/A').get('isBuyable')) or ('apu' in buyabilityMessage and buyabilityMessage.get('apu').get('MG3C4CH/A').get('isBuyable')):
-            BarkNotify().send_notify(f'国行Air已开启官网购买', f'国行Air已开启官网购买',level=BarkNotify.Level.CRITICAL group='applestore',
-                                     url='https://www.apple.com.cn/shop/buy-iphone/iphone-air/MG3C4CH/A')
-            QLUtils.disable_self()
-
-        # response = session.get(
-        #     "https://www.apple.com.cn/shop/fulfillment-messages?fae=true&little=false&parts.0=MG3C4CH/A&mts.0=regular&mts.1=sticky&fts=true", headers=headers)
-        # result = final_result = extract_final_buyability(response)
-        # if result.get('stores') or result.get('sticky') or result.get('regular'):
-        #     BarkNotify().send_notify(f'国行Air已开启官网购买', f'国行Air已开启官网购买', group='applestore',
-        #                              url='https://www.apple.com.cn/shop/buy-iphone/iphone-air/MG3C4CH/A')
-        #     QLUtils.disable_self()
 
+    def fetch(self):
+        """一次请求查询所有型号，返回 {型号: 是否可购买}"""
+        params = {f'parts.{i}': part for i, part in enumerate(self.parts)}
+        for attempt in range(2):
+            self.warmup(force=attempt > 0)
+            response = self.session.get(self.BUYABILITY_URL, params=params, timeout=30)
+            if response.status_code == 200:
+                current = self._parse_buyability(response.json())
+                if current is not None:
+                    return current
+            print(f"查询购买状态失败（{response.status_code}），重新预热会话")
+        raise RuntimeError("查询购买状态失败")
+
+    @classmethod
+    def _apple_cookies(cls, jar):
+        domain = urlsplit(cls.BUYABILITY_URL).hostname.removeprefix('www.')
+        return [c for c in jar if c.domain.lstrip('.').endswith(domain)]
+
+    async def poll(self, client, old=None):
+        """
+        查询并保存 cookie，状态比较交给调用方；使用统一监测引擎共享的 httpx.AsyncClient，
+        cookie 放在该客户端的 cookie jar 中，同样保存到状态文件
+        """
+        jar = client.cookies.jar
+        if not self._apple_cookies(jar):
+            for cookie in self.state.get('cookies', []):
+                jar.set_cookie(create_cookie(**cookie))
+        params = {f'parts.{i}': part for i, part in enumerate(self.parts)}
+        for attempt in range(2):
+            if attempt > 0 or not self._cookies_valid(self._apple_cookies(jar)):
+                print("预热会话，获取 cookie")
+                for c in self._apple_cookies(jar):
+                    jar.clear(c.domain, c.path, c.name)
+                await client.get(self.product_url, headers=self.HEADERS)
+                await client.get(self.BEACON_URL, headers=self.HEADERS)
+            response = await client.get(self.BUYABILITY_URL, params=params, headers=self.HEADERS)
+            if response.status_code == 200:
+                current = self._parse_buyability(response.json())
+                if current is not None:
+                    self._write_state(self._apple_cookies(jar))
+                    return current
+            print(f"查询购买状态失败（{response.status_code}），重新预热会话")
+        raise RuntimeError("查询购买状态失败")
+
+    def fetch_fulfillment(self, part):
+        """查询单个型号的配送/自提状态，边下载边解析，找到结果后不再读取剩余内容"""
+        self.warmup()
+        params = {'fae': 'true', 'little': 'false', 'parts.0': part, 'mts.0': 'regular', 'mts.1': 'sticky', 'fts': 'true'}
+        with self.session.get(self.FULFILLMENT_URL, params=params, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return extract_final_buyability_from_stream(response.raw)
+
+    def run(self):
+        """检查一次并推送状态变化，返回是否所有型号都已可购买"""
+        current = self.fetch()
+        previous = self.state.get('parts', {})
+        for part, buyable in current.items():
+            if previous.get(part) == buyable:
+                continue
+            print(f"{part}: {previous.get(part)} -> {buyable}")
+            if buyable:
+                BarkNotify().send_notify(f'{part}已开启官网购买', f'{part}已开启官网购买', level=BarkNotify.Level.CRITICAL, group='applestore',
+                                         url=f'{self.product_url}/{part}')
+        self.state['parts'] = current
+        self._write_state()
+        return all(current.values())
+
+
+def parse_parts():
+    # 多个型号用逗号分隔，默认监控国行 Air
+    return [p for p in re.split(r'[,，\s]+', os.environ.get("apple_parts", "MG3C4CH/A")) if p]
+
+
+def build_watches():
+    """
+    统一监测引擎使用的监测项：在引擎共享的连接池上复用预热过的 cookie 批量查询，
+    型号变为可购买时推送，全部可购买后停用；首次执行时从 apple_buyability.json 接续上次的购买状态
+    """
+    product_url = os.environ.get("apple_product_url", AppleBuyabilityWatcher.PRODUCT_URL)
+    watcher = AppleBuyabilityWatcher(parse_parts(), product_url)
+
+    def notify(part):
+        BarkNotify.send_notify(f'{part}已开启官网购买', f'{part}已开启官网购买', level=BarkNotify.Level.CRITICAL, group='applestore',
+                               url=f'{product_url}/{part}')
+
+    return [Watch(
+        name='apple_buyability',
+        fetch=watcher.poll,
+        compare=lambda old, new: [part for part, buyable in new.items() if buyable and not (old or {}).get(part)],
+        notify=notify,
+        disable_when=lambda value: all(value.values()),
+        interval=300,
+        seed=lambda: {'value': watcher.state['parts']} if watcher.state.get('parts') else None,
+    )]
+
+
+def main():
+    # 部署有前缀的话，需要适配
+    QLUtils.init_from_env()
+    if handled_by_runner('apple_monitor2'):
+        return
+    parts = parse_parts()
+    product_url = os.environ.get("apple_product_url", AppleBuyabilityWatcher.PRODUCT_URL)
+    watcher = AppleBuyabilityWatcher(parts, product_url)
+    all_buyable = watcher.run()
+
+    # 可选：通过 fulfillment-messages 检查配送/自提状态
+    if os.environ.get("apple_check_fulfillment"):
+        for part in parts:
+            result = watcher.fetch_fulfillment(part)
+            print(f"{part} 配送/自提状态: {result}")
+            if result.get('stores') or result.get('sticky') or result.get('regular'):
+                BarkNotify().send_notify(f'{part}已开启官网购买', f'{part}已开启配送/自提', group='applestore',
+                                         url=f'{product_url}/{part}')
+
+    if all_buyable:
+        QLUtils.disable_self()
+
+
+if __name__ == '__main__':
+    try:
+        main()
     except Exception as e:
         print("脚本执行出错:", e)
         traceback.print_exc(file=sys.stdout)
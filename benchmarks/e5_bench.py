@@ -0,0 +1,182 @@
+'''
+E5 脚本基准测试
+
+在本地 Graph 模拟服务上运行四个 E5 脚本的 main()，统计耗时、请求数和 Python 内存峰值。
+凭证替换为假凭证，发往 graph.microsoft.com 的请求改写到模拟服务，脚本里的随机等待默认跳过。
+
+在仓库根目录运行：
+    python -m benchmarks.e5_bench
+    python -m benchmarks.e5_bench --sizes 10 1000 --latency 20 --throttle-rate 0.05
+    python -m benchmarks.e5_bench --scripts e5_onedrive_monitor --pacing
+    python -m benchmarks.e5_bench --sizes 10 --memory
+
+内存峰值用 tracemalloc 测量，SDK 反序列化时每个对象都会构造一个很大的字段表，
+开启追踪后运行会慢两个数量级，因此默认不测量。
+'''
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import importlib
+import contextlib
+import tracemalloc
+import httpx
+from azure.core.credentials import AccessToken
+from benchmarks.fake_graph_server import FakeGraphServer, FakeTenant, ME
+from utils.graph_client import GraphClients
+
+SCRIPTS = ['e5_onedrive_monitor', 'e5_user_expiration', 'e5_storage_sync', 'e5_workspace_activity']
+GRAPH_HOST = 'graph.microsoft.com'
+
+
+class FakeCredential:
+    '''
+        替代 ClientSecretCredential / UsernamePasswordCredential，直接返回固定令牌
+    '''
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_token(self, *scopes, **kwargs):
+        return AccessToken('fake-token', int(time.time()) + 3600)
+
+
+class RewriteTransport(httpx.AsyncBaseTransport):
+    '''
+        把发往 graph.microsoft.com 的请求改写到模拟服务
+    '''
+    def __init__(self, target, inner):
+        self.target = httpx.URL(target)
+        self.inner = inner
+
+    async def handle_async_request(self, request):
+        if request.url.host == GRAPH_HOST:
+            request.url = request.url.copy_with(scheme=self.target.scheme, host=self.target.host, port=self.target.port)
+            request.headers['host'] = f'{self.target.host}:{self.target.port}'
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class NoPacingAsyncio:
+    '''
+        模块内 asyncio 的替身：sleep 立即返回，其余属性透传
+    '''
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+    @staticmethod
+    async def sleep(delay, result=None):
+        return result
+
+
+@contextlib.contextmanager
+def patched(module, server_url, pacing):
+    """替换脚本模块中的凭证和（可选）随机等待，共享 Graph 客户端的传输层改走模拟服务"""
+    saved = {}
+    replacements = {}
+    for name in ('ClientSecretCredential', 'UsernamePasswordCredential'):
+        if hasattr(module, name):
+            replacements[name] = FakeCredential
+    if not pacing:
+        replacements['asyncio'] = NoPacingAsyncio()
+    for name, value in replacements.items():
+        saved[name] = getattr(module, name, None)
+        setattr(module, name, value)
+    transport = GraphClients.__dict__['transport']
+    GraphClients.transport = classmethod(lambda cls: RewriteTransport(server_url, transport.__func__(cls)))
+    try:
+        yield
+    finally:
+        GraphClients.transport = transport
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def set_env():
+    os.environ.update({
+        'E5_TENANT_ID': 'fake-tenant', 'E5_CLIENT_ID': 'fake-client', 'E5_CLIENT_SECRET': 'fake-secret',
+        'E5_KEEPER_USERNAME': ME, 'E5_KEEPER_PASSWORD': 'fake-password',
+    })
+    # 不发送推送
+    os.environ.pop('NOTIFY_API', None)
+
+
+def run_once(module, server, size, pacing, verbose, seed, trace_memory=False):
+    server.reset(FakeTenant(users=size, seed=seed))
+    random.seed(seed)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with patched(module, server.url, pacing), output:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        asyncio.run(module.main())
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return elapsed, peak, dict(server.stats)
+
+
+def run_script(name, server, size, pacing, verbose, seed, memory=False):
+    """
+    先运行一次预热（SDK 的请求构造器和模型是首次使用时才导入的），
+    再计时运行一次；tracemalloc 会显著拖慢执行，内存峰值单独运行一次测量
+    """
+    module = importlib.import_module(name)
+    run_once(module, server, min(size, 10), pacing, False, seed)
+    elapsed, _, stats = run_once(module, server, size, pacing, verbose, seed)
+    peak = run_once(module, server, size, pacing, False, seed, trace_memory=True)[1] if memory else 0
+    return {
+        'script': name, 'users': size, 'seconds': elapsed, 'requests': stats.get('http_requests', 0),
+        'batch_items': stats.get('batch_items', 0), 'throttled': stats.get('throttled', 0),
+        'not_found': stats.get('not_found', 0), 'peak_mb': peak / 1024 / 1024 if memory else None,
+        'routes': {k: v for k, v in stats.items() if ' ' in k},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='E5 脚本基准测试')
+    parser.add_argument('--scripts', nargs='+', default=SCRIPTS, choices=SCRIPTS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 1000, 10000], help='租户用户数')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的延迟（毫秒）')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='返回 429 的概率')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--pacing', action='store_true', help='保留脚本中的随机等待')
+    parser.add_argument('--no-throttle', action='store_true', help='关闭客户端限流（GraphThrottle）')
+    parser.add_argument('--routes', action='store_true', help='输出每个接口的请求数')
+    parser.add_argument('--verbose', action='store_true', help='显示脚本输出')
+    parser.add_argument('--memory', action='store_true', help='额外运行一次测量内存峰值（很慢）')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    set_env()
+    if args.pacing:
+        os.environ['E5_ACTIVITY_PACING'] = '1'
+    if args.no_throttle:
+        os.environ['GRAPH_THROTTLE'] = '0'
+    server = FakeGraphServer(latency=args.latency / 1000, throttle_rate=args.throttle_rate,
+                             retry_after=args.retry_after, seed=args.seed)
+    server.start_in_thread()
+    print(f"模拟服务: {server.url}  延迟 {args.latency}ms  限流 {args.throttle_rate:.0%}")
+    print(f"{'脚本':<24}{'用户数':>8}{'耗时(s)':>10}{'请求数':>8}{'批内请求':>8}{'429':>6}{'404':>6}{'内存峰值(MB)':>14}")
+    try:
+        for name in args.scripts:
+            for size in args.sizes:
+                result = run_script(name, server, size, args.pacing, args.verbose, args.seed, args.memory)
+                peak = '-' if result['peak_mb'] is None else f"{result['peak_mb']:.1f}"
+                print(f"{result['script']:<24}{result['users']:>8}{result['seconds']:>10.2f}{result['requests']:>8}"
+                      f"{result['batch_items']:>8}{result['throttled']:>6}{result['not_found']:>6}{peak:>14}")
+                if args.routes:
+                    for route, count in sorted(result['routes'].items(), key=lambda r: -r[1]):
+                        print(f"    {count:>6}  {route}")
+                sys.stdout.flush()
+    finally:
+        server.stop_thread()
+
+
+if __name__ == '__main__':
+    main()
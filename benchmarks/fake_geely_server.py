@@ -0,0 +1,387 @@
+'''
+本地吉利银河 / xchanger 接口模拟服务
+
+同一个端口同时模拟 galaxy-user-api、galaxy-app 和 user-api/device-api 四个网关，
+按真实网关的规则校验签名，签名不对的请求直接拒绝：
+- galaxy 网关（阿里云 API 网关）：x-ca-signature，HMAC-SHA256，
+  Method/Accept/Content-MD5/Content-Type/Date + x-ca-signature-headers 中的头（按名称排序）+ 路径和排序后的参数，
+  同时检查 Content-MD5、x-ca-timestamp 有效期（15 分钟）和 x-ca-nonce 是否重放
+- xchanger 网关：x-signature，HMAC-SHA1，
+  Accept/nonce/version/空行/查询串/请求体 MD5/x-timestamp/Method/路径
+
+覆盖脚本用到的接口：refresh、签到状态/签到、积分、oauth2 code、session/secure、车辆状态、详细状态和车控指令。
+任意 refreshToken 都会自动注册为一个账号。
+
+单独运行：python -m benchmarks.fake_geely_server --latency 20 --port 8001
+'''
+import re
+import json
+import time
+import hmac
+import base64
+import hashlib
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl
+from aiohttp import web
+from utils.geely.geely_panda_utils import GeelyUser
+from utils.geely.vehicle_utils import VehicleControl
+
+# 阿里云网关允许的时间偏差和 nonce 防重放窗口（毫秒）
+TIMESTAMP_WINDOW = 15 * 60 * 1000
+TOKEN_TTL = 2 * 3600
+AUTHORIZATION_TTL = 3600
+
+
+def _content_md5(body):
+    return base64.b64encode(hashlib.md5(body).digest()).decode('utf-8')
+
+
+class SignatureError(Exception):
+    def __init__(self, message, string_to_sign=''):
+        super().__init__(message)
+        self.message = message
+        self.string_to_sign = string_to_sign
+
+
+class FakeAccount:
+    '''
+        一个模拟账号：token、积分、签到状态和名下车辆
+    '''
+    def __init__(self, refresh_token, index):
+        self.refresh_token = refresh_token
+        self.token = None
+        self.points = 1000 + index
+        self.signed = False
+        self.vehicle_id = f'VIN{index:014d}'
+        self.power_mode = '1'
+
+
+class FakeGeelyServer:
+    '''
+        aiohttp 实现的吉利接口模拟服务
+    '''
+    def __init__(self, latency=0.0, verify=True):
+        """
+        :param latency: 每个请求的额外延迟（秒）
+        :param verify: 是否校验签名（关闭后只统计请求）
+        """
+        self.latency = latency
+        self.verify = verify
+        self.accounts = {}  # refreshToken -> FakeAccount
+        self.tokens = {}  # token -> FakeAccount
+        self.auth_codes = {}  # 授权码 -> FakeAccount，一次性
+        self.authorizations = {}  # 车控 accessToken -> FakeAccount
+        self.nonces = {}  # 已使用的 x-ca-nonce -> 时间戳
+        self.stats = Counter()
+        self.url = None
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._runner = None
+        self._thread = None
+        self._loop = None
+        self.routes = self._build_routes()
+
+    def reset(self):
+        with self._lock:
+            self.accounts.clear()
+            self.tokens.clear()
+            self.auth_codes.clear()
+            self.authorizations.clear()
+            self.nonces.clear()
+            self.stats.clear()
+
+    def _next_id(self, prefix):
+        with self._lock:
+            self._counter += 1
+            return f'{prefix}{self._counter:08d}'
+
+    # ---------- 路由 ----------
+
+    def _build_routes(self):
+        routes = [
+            # (方法, 路径, 签名方式, 处理函数)
+            ('GET', r'/api/v1/login/refresh', 'galaxy', self.refresh),
+            ('GET', r'/api/v1/oauth2/code', 'galaxy', self.oauth_code),
+            ('GET', r'/h5/v1/points/get', 'galaxy', self.points),
+            ('GET', r'/app/v1/sign/state', 'galaxy', self.sign_state),
+            ('POST', r'/app/v1/sign/add', 'galaxy', self.sign_add),
+            ('POST', r'/auth/account/session/secure', 'xchanger', self.session_secure),
+            ('GET', r'/remote-control/vehicle/status/state/(?P<vehicle>[^/]+)', 'xchanger', self.vehicle_state),
+            ('GET', r'/remote-control/vehicle/status/(?P<vehicle>[^/]+)', 'xchanger', self.vehicle_status),
+            ('PUT', r'/remote-control/vehicle/telematics/(?P<vehicle>[^/]+)', 'xchanger', self.telematics),
+        ]
+        return [(method, re.compile(pattern + '$'), pattern, scheme, handler)
+                for method, pattern, scheme, handler in routes]
+
+    async def handle(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.stats['http_requests'] += 1
+        body = await request.read()
+        for method, regex, pattern, scheme, handler in self.routes:
+            match = regex.match(request.path)
+            if not match or method != request.method:
+                continue
+            self.stats[f'{method} {pattern}'] += 1
+            try:
+                if self.verify:
+                    if scheme == 'galaxy':
+                        self.verify_galaxy(request, body)
+                    else:
+                        self.verify_xchanger(request, body)
+            except SignatureError as e:
+                self.stats['bad_signature'] += 1
+                return self._signature_error(scheme, e)
+            context = {'params': match.groupdict(), 'query': dict(parse_qsl(request.query_string, keep_blank_values=True)),
+                       'headers': request.headers, 'body': body}
+            return web.json_response(handler(context))
+        self.stats['not_found'] += 1
+        return web.json_response({'code': 'error', 'message': f'{request.method} {request.path} not found'}, status=404)
+
+    @staticmethod
+    def _signature_error(scheme, error):
+        if scheme == 'galaxy':
+            # 阿里云网关签名错误时返回 400，原因放在 X-Ca-Error-Message 头中，响应体为空
+            message = error.message
+            if error.string_to_sign:
+                message += ', Server StringToSign:`' + error.string_to_sign.replace('\n', '#') + '`'
+            return web.Response(status=400, headers={'X-Ca-Error-Message': message})
+        return web.json_response({'success': False, 'code': '4001', 'message': error.message}, status=401)
+
+    # ---------- 签名校验 ----------
+
+    def verify_galaxy(self, request, body):
+        """校验阿里云 API 网关的 HMAC-SHA256 签名"""
+        headers = request.headers
+        key = headers.get('x-ca-key', '')
+        secret = GeelyUser.API_KEYS.get(key)
+        if not secret:
+            raise SignatureError('Invalid AppKey')
+        signature = headers.get('x-ca-signature')
+        if not signature:
+            raise SignatureError('Empty Signature')
+
+        try:
+            timestamp = int(headers.get('x-ca-timestamp', ''))
+        except ValueError:
+            raise SignatureError('Invalid Timestamp')
+        now = int(time.time() * 1000)
+        if abs(now - timestamp) > TIMESTAMP_WINDOW:
+            raise SignatureError('Invalid Timestamp')
+
+        content_md5 = headers.get('content-md5', '')
+        if body and content_md5 and content_md5 != _content_md5(body):
+            raise SignatureError('Invalid Content-MD5')
+
+        signed_headers = [h.strip().lower() for h in headers.get('x-ca-signature-headers', '').split(',') if h.strip()]
+        string_to_sign = (f"{request.method}\n{headers.get('accept', '')}\n{content_md5}\n"
+                          f"{headers.get('content-type', '')}\n{headers.get('date', '')}\n")
+        for name in sorted(signed_headers):
+            string_to_sign += f"{name}:{headers.get(name, '')}\n"
+        params = sorted(parse_qsl(request.query_string, keep_blank_values=True))
+        string_to_sign += request.path
+        if params:
+            string_to_sign += '?' + '&'.join(f'{k}={v}' if v else k for k, v in params)
+
+        expected = base64.b64encode(hmac.new(secret.encode('utf-8'), string_to_sign.encode('utf-8'),
+                                             hashlib.sha256).digest()).decode('utf-8')
+        if not hmac.compare_digest(expected, signature):
+            raise SignatureError('Invalid Signature', string_to_sign)
+
+        nonce = headers.get('x-ca-nonce')
+        if nonce:
+            with self._lock:
+                if len(self.nonces) > 100000:
+                    self.nonces = {n: t for n, t in self.nonces.items() if now - t <= TIMESTAMP_WINDOW}
+                if nonce in self.nonces:
+                    raise SignatureError('Nonce Used')
+                self.nonces[nonce] = now
+
+    @staticmethod
+    def verify_xchanger(request, body):
+        """校验 xchanger 网关的 HMAC-SHA1 签名"""
+        headers = request.headers
+        signature = headers.get('x-signature')
+        if not signature:
+            raise SignatureError('missing x-signature')
+        string_to_sign = (f"{headers.get('Accept', '')}\n"
+                          f"x-api-signature-nonce:{headers.get('x-api-signature-nonce', '')}\n"
+                          f"x-api-signature-version:{headers.get('x-api-signature-version', '')}\n"
+                          f"\n"
+                          f"{request.query_string}\n"
+                          f"{_content_md5(body)}\n"
+                          f"{headers.get('x-timestamp', '')}\n"
+                          f"{request.method}\n"
+                          f"{request.path}")
+        expected = base64.b64encode(hmac.new(VehicleControl.API_KEY.encode('utf-8'), string_to_sign.encode('utf-8'),
+                                             hashlib.sha1).digest()).decode('utf-8')
+        if not hmac.compare_digest(expected, signature):
+            raise SignatureError('signature invalid')
+
+    # ---------- galaxy 接口 ----------
+
+    def _account_by_token(self, context):
+        return self.tokens.get(context['headers'].get('token', ''))
+
+    def refresh(self, context):
+        refresh_token = context['query'].get('refreshToken', '')
+        if not refresh_token:
+            return {'code': 'fail', 'message': 'refreshToken 不能为空'}
+        with self._lock:
+            account = self.accounts.get(refresh_token)
+            if account is None:
+                account = self.accounts[refresh_token] = FakeAccount(refresh_token, len(self.accounts))
+        account.token = self._next_id('token-')
+        self.tokens[account.token] = account
+        return {'code': 'success', 'message': '刷新成功', 'data': {'centerTokenDto': {
+            'token': account.token, 'refreshToken': refresh_token, 'expiresIn': TOKEN_TTL}}}
+
+    def oauth_code(self, context):
+        account = self._account_by_token(context)
+        if account is None:
+            return {'code': 'fail', 'message': 'token 无效'}
+        code = self._next_id('code-')
+        self.auth_codes[code] = account
+        return {'code': 'success', 'message': '成功', 'data': {'code': code}}
+
+    def points(self, context):
+        account = self._account_by_token(context)
+        if account is None:
+            return {'code': '401', 'message': '未登录'}
+        return {'code': '0', 'data': {'availablePoints': account.points}}
+
+    def sign_state(self, context):
+        account = self._account_by_token(context)
+        if account is None:
+            return {'code': '401', 'message': '未登录'}
+        return {'code': '0', 'data': account.signed}
+
+    def sign_add(self, context):
+        account = self._account_by_token(context)
+        if account is None:
+            return {'code': '401', 'message': '未登录'}
+        if account.signed:
+            return {'code': '500', 'message': '今日已签到'}
+        account.signed = True
+        account.points += 5
+        return {'code': '0', 'message': '签到成功'}
+
+    # ---------- xchanger 接口 ----------
+
+    def _account_by_authorization(self, context):
+        return self.authorizations.get(context['headers'].get('authorization', ''))
+
+    def session_secure(self, context):
+        try:
+            code = json.loads(context['body'] or b'{}').get('authCode', '')
+        except ValueError:
+            code = ''
+        with self._lock:
+            account = self.auth_codes.pop(code, None)
+        if account is None:
+            return {'success': False, 'code': 4002, 'message': 'authCode 无效或已使用'}
+        access_token = self._next_id('access-')
+        self.authorizations[access_token] = account
+        return {'success': True, 'code': 1000, 'data': {'accessToken': access_token, 'expiresIn': AUTHORIZATION_TTL}}
+
+    def vehicle_state(self, context):
+        account = self._account_by_authorization(context)
+        if account is None:
+            return {'success': False, 'code': '4010', 'message': '未授权'}
+        return {'success': True, 'code': '1000', 'data': {'powerMode': account.power_mode}}
+
+    def vehicle_status(self, context):
+        account = self._account_by_authorization(context)
+        if account is None:
+            return {'success': False, 'code': '4010', 'message': '未授权'}
+        return {'success': True, 'code': '1000', 'data': {'vehicleStatus': {
+            'updateTime': str(int(time.time() * 1000)),
+            'remoteControlInhibited': '0',
+            'configuration': {'fuelType': '4', 'vin': context['params']['vehicle']},
+            'basicVehicleStatus': {
+                'distanceToEmpty': '412', 'speed': '0.0', 'direction': 'N',
+                'position': {'latitude': '30.27', 'longitude': '120.15', 'altitude': '12', 'posCanBeTrusted': 'true'},
+            },
+            'additionalVehicleStatus': {
+                'maintenanceStatus': {'distanceToService': '9000', 'odometer': '12345.6', 'brakeFluidLevelStatus': '3',
+                                      'serviceWarningStatus': '0', 'mainBatteryStatus': {'voltage': '12.6'}},
+                'electricVehicleStatus': {'isPluggedIn': '0', 'averPowerConsumption': '13.2', 'ptReady': '0',
+                                          'stateOfCharge': '80', 'chargeLevel': '80', 'statusOfChargerConnection': '0',
+                                          'distanceToEmptyOnBatteryOnly': '412', 'isCharging': 'false',
+                                          'timeToFullyCharged': '0'},
+                'drivingBehaviourStatus': {'transimissionGearPostion': '3', 'engineSpeed': '0'},
+                'runningStatus': {'avgSpeed': '32'},
+                'drivingSafetyStatus': {'doorLockStatusDriver': '1', 'doorLockStatusPassenger': '1',
+                                        'doorLockStatusDriverRear': '1', 'doorLockStatusPassengerRear': '1',
+                                        'doorOpenStatusDriver': '0', 'doorOpenStatusPassenger': '0',
+                                        'trunkOpenStatus': '0', 'handBrakeStatus': '0', 'electricParkBrakeStatus': '0'},
+            },
+        }}}
+
+    def telematics(self, context):
+        account = self._account_by_authorization(context)
+        if account is None:
+            return {'success': False, 'code': '4010', 'message': '未授权'}
+        return {'success': True, 'code': '1000', 'data': {'sessionId': self._next_id('session-')}}
+
+    # ---------- 启动 ----------
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """在后台线程的事件循环中运行，返回服务地址"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop_thread(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地吉利接口模拟服务')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的延迟（毫秒）')
+    parser.add_argument('--no-verify', action='store_true', help='不校验签名')
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+
+    server = FakeGeelyServer(latency=args.latency / 1000, verify=not args.no_verify)
+    web.run_app(server.app(), host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,545 @@
+'''
+本地 Microsoft Graph 模拟服务
+
+为 E5 脚本的基准测试提供一个内存中的假租户，覆盖脚本用到的接口：
+/users（分页、$select）、/users/{id}/drive、/me/drive、drive 子项/上传/删除、$batch、
+OneNote、To Do、邮件、日历、Planner、站点。
+可配置延迟、限流（429 + Retry-After）和租户用户数，并统计请求数。
+
+单独运行：python -m benchmarks.fake_graph_server --users 1000 --latency 20 --port 8000
+'''
+import re
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs, unquote
+from aiohttp import web
+
+API_PREFIX = '/v1.0'
+ME = 'keeper@contoso.onmicrosoft.com'
+GB = 1024 ** 3
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+class GraphError(Exception):
+    def __init__(self, status, code, message=''):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class FakeTenant:
+    '''
+        内存中的租户数据
+    '''
+    def __init__(self, users=10, prefix='Salted Fish', seed=0, mailbox_size=30, drive_files=20):
+        rng = random.Random(seed)
+        now = _now()
+        self.users = {}
+        self.drives = {}
+        for i in range(users):
+            # 大约一半用户带前缀，创建时间分布在过去三年内
+            name = f'{prefix}-{i:05d}' if i % 2 == 0 else f'Member {i:05d}'
+            user_id = _new_id()
+            self.users[user_id] = {
+                'id': user_id,
+                'userPrincipalName': f'user{i:05d}@contoso.onmicrosoft.com',
+                'displayName': name,
+                'accountEnabled': rng.random() > 0.1,
+                'createdDateTime': _iso(now - timedelta(days=rng.randint(1, 3 * 365))),
+                'postalCode': rng.choice(['1', '2', '3', None]),
+            }
+            self.drives[user_id] = {
+                'id': f'drive-{user_id}',
+                'driveType': 'business',
+                'lastModifiedDateTime': _iso(now - timedelta(hours=rng.randint(1, 500))),
+                'quota': {'total': 1024 * GB, 'used': rng.randint(0, 900) * GB},
+                'items': {},
+            }
+
+        # 委托权限账号（/me）
+        self.me_id = _new_id()
+        self.users[self.me_id] = {
+            'id': self.me_id, 'userPrincipalName': ME, 'displayName': 'Keeper',
+            'accountEnabled': True, 'createdDateTime': _iso(now - timedelta(days=30)), 'postalCode': None,
+        }
+        self.drives[self.me_id] = {
+            'id': f'drive-{self.me_id}', 'driveType': 'business', 'lastModifiedDateTime': _iso(now),
+            'quota': {'total': 1024 * GB, 'used': 0}, 'items': {},
+        }
+        for i in range(drive_files):
+            self._put_file(self.me_id, f'doc_{100000 + i}.txt', b'x' * rng.randint(100, 5000),
+                           now - timedelta(hours=i))
+
+        subjects = ['Project Management Review', 'Cloud Computing Strategy', 'Data Analysis Report',
+                    'Security Best Practices', 'Team Collaboration Plan', 'Meeting Notes Summary']
+        self.messages = {}
+        for i in range(mailbox_size):
+            self._add_message(rng.choice(subjects), now - timedelta(hours=i),
+                              sender=ME if i % 2 == 0 else 'someone@example.com')
+        self.events = {}
+        for i in range(mailbox_size // 2):
+            event_id = _new_id()
+            start = now + timedelta(days=i - 10)
+            self.events[event_id] = {
+                'id': event_id, 'subject': rng.choice(subjects),
+                'start': {'dateTime': start.strftime('%Y-%m-%dT%H:%M:%S'), 'timeZone': 'UTC'},
+                'end': {'dateTime': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S'), 'timeZone': 'UTC'},
+                'createdDateTime': _iso(now - timedelta(days=20 - i)),
+            }
+        list_id = _new_id()
+        self.todo_lists = {list_id: {'id': list_id, 'displayName': 'Tasks', 'tasks': {}}}
+        for i in range(10):
+            task_id = _new_id()
+            self.todo_lists[list_id]['tasks'][task_id] = {
+                'id': task_id, 'title': rng.choice(subjects),
+                'status': 'completed' if i % 3 == 0 else 'notStarted',
+                'createdDateTime': _iso(now - timedelta(days=i)),
+            }
+        self.notebooks = {}
+        self.sections = {}
+        self.pages = {}
+
+    def _put_file(self, user_id, name, content, modified=None):
+        items = self.drives[user_id]['items']
+        existing = next((item for item in items.values() if item['name'] == name), None)
+        item = existing or {'id': _new_id(), 'name': name, 'file': {'mimeType': 'application/octet-stream'}}
+        item['size'] = len(content)
+        item['lastModifiedDateTime'] = _iso(modified or _now())
+        items[item['id']] = item
+        return item
+
+    def _add_message(self, subject, received=None, sender=ME, is_draft=False):
+        message_id = _new_id()
+        self.messages[message_id] = {
+            'id': message_id, 'subject': subject, 'isDraft': is_draft,
+            'receivedDateTime': _iso(received or _now()),
+            'from': {'emailAddress': {'address': sender}},
+            'bodyPreview': f'{subject} ...',
+        }
+        return self.messages[message_id]
+
+
+class FakeGraphServer:
+    '''
+        aiohttp 实现的 Graph 模拟服务
+    '''
+    def __init__(self, tenant=None, latency=0.0, throttle_rate=0.0, retry_after=1, seed=0,
+                 public_base='https://graph.microsoft.com'):
+        """
+        :param latency: 每个请求的额外延迟（秒）
+        :param throttle_rate: 返回 429 的概率
+        :param retry_after: 429 响应的 Retry-After（秒）
+        :param public_base: 分页链接使用的地址，默认与真实 Graph 相同（由客户端改写到本服务）
+        """
+        self.tenant = tenant or FakeTenant()
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.public_base = public_base
+        self._rng = random.Random(seed)
+        self.stats = Counter()
+        self.url = None
+        self._runner = None
+        self._thread = None
+        self._loop = None
+        self.routes = self._build_routes()
+
+    def reset(self, tenant):
+        self.tenant = tenant
+        self.stats.clear()
+
+    # ---------- 路由 ----------
+
+    def _build_routes(self):
+        routes = [
+            ('GET', r'/users', self.list_users),
+            ('GET', r'/(?:users/(?P<user>[^/]+)|me)', self.get_user),
+            ('PATCH', r'/users/(?P<user>[^/]+)', self.update_user),
+            ('DELETE', r'/users/(?P<user>[^/]+)', self.delete_user),
+            ('GET', r'/(?:users/(?P<user>[^/]+)|me)/drive', self.get_drive),
+            ('GET', r'/drives/(?P<drive>[^/]+)/items/root/children', self.list_children),
+            ('PUT', r'/drives/(?P<drive>[^/]+)/items/root:/(?P<name>[^:]+):/content', self.upload),
+            ('DELETE', r'/drives/(?P<drive>[^/]+)/items/(?P<item>[^/]+)', self.delete_item),
+            ('GET', r'/me/messages', self.list_messages),
+            ('POST', r'/me/messages', self.create_message),
+            ('POST', r'/me/messages/(?P<message>[^/]+)/send', self.send_message),
+            ('DELETE', r'/me/messages/(?P<message>[^/]+)', self.delete_message),
+            ('GET', r'/me/events', self.list_events),
+            ('POST', r'/me/events', self.create_event),
+            ('DELETE', r'/me/events/(?P<event>[^/]+)', self.delete_event),
+            ('GET', r'/me/todo/lists', self.list_todo_lists),
+            ('GET', r'/me/todo/lists/(?P<list>[^/]+)/tasks', self.list_tasks),
+            ('POST', r'/me/todo/lists/(?P<list>[^/]+)/tasks', self.create_task),
+            ('DELETE', r'/me/todo/lists/(?P<list>[^/]+)/tasks/(?P<task>[^/]+)', self.delete_task),
+            ('GET', r'/me/onenote/notebooks', self.list_notebooks),
+            ('POST', r'/me/onenote/notebooks', self.create_notebook),
+            ('GET', r'/me/onenote/notebooks/(?P<notebook>[^/]+)/sections', self.list_sections),
+            ('POST', r'/me/onenote/notebooks/(?P<notebook>[^/]+)/sections', self.create_section),
+            ('GET', r'/me/onenote/sections/(?P<section>[^/]+)/pages', self.list_pages),
+            ('POST', r'/me/onenote/sections/(?P<section>[^/]+)/pages', self.create_page),
+            ('DELETE', r'/me/onenote/pages/(?P<page>[^/]+)', self.delete_page),
+            ('GET', r'/me/planner/plans', lambda req: (200, {'value': []})),
+            ('GET', r'/sites/root', lambda req: (200, {'id': 'contoso.sharepoint.com,root', 'displayName': 'Root'})),
+            ('GET', r'/me/followedSites', lambda req: (200, {'value': []})),
+        ]
+        return [(method, re.compile(pattern + r'/?$'), pattern, handler) for method, pattern, handler in routes]
+
+    def dispatch(self, method, target, body=None, headers=None):
+        """
+        执行一个请求（HTTP 请求与 $batch 中的子请求共用）
+        :return: (状态码, 响应体 dict 或 None, 响应头 dict)
+        """
+        parts = urlsplit(target)
+        path = unquote(parts.path)
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        for route_method, regex, pattern, handler in self.routes:
+            match = regex.match(path)
+            if match and route_method == method:
+                self.stats[f'{method} {pattern}'] += 1
+                if self.throttle_rate and self._rng.random() < self.throttle_rate:
+                    self.stats['throttled'] += 1
+                    return 429, {'error': {'code': 'TooManyRequests', 'message': 'Too many requests'}}, \
+                        {'Retry-After': str(self.retry_after)}
+                request = {'params': {k: v for k, v in match.groupdict().items() if v is not None},
+                           'query': query, 'body': body, 'headers': headers or {}, 'path': path}
+                try:
+                    status, payload = handler(request)
+                except GraphError as e:
+                    return e.status, {'error': {'code': e.code, 'message': e.message}}, {}
+                return status, payload, {}
+        self.stats['not_found'] += 1
+        return 404, {'error': {'code': 'NotFound', 'message': f'{method} {path}'}}, {}
+
+    async def handle(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.stats['http_requests'] += 1
+        raw = await request.read()
+        content_type = request.headers.get('Content-Type', '')
+        body = None
+        if raw:
+            body = json.loads(raw) if 'json' in content_type else raw
+        if request.method == 'POST' and request.path.rstrip('/') == f'{API_PREFIX}/$batch':
+            status, payload, headers = self.batch(body or {})
+        else:
+            status, payload, headers = self.dispatch(request.method, request.path_qs, body, dict(request.headers))
+        if payload is None:
+            return web.Response(status=status, headers=headers)
+        return web.json_response(payload, status=status, headers=headers)
+
+    def batch(self, body):
+        """JSON 批处理，最多 20 个子请求"""
+        requests = body.get('requests') or []
+        if len(requests) > 20:
+            return 400, {'error': {'code': 'BadRequest', 'message': 'Batch limited to 20 requests'}}, {}
+        self.stats['batch_items'] += len(requests)
+        responses = []
+        for item in requests:
+            url = item.get('url', '')
+            target = url if url.startswith('/') else '/' + url
+            status, payload, headers = self.dispatch(item.get('method', 'GET').upper(), target,
+                                                     item.get('body'), item.get('headers'))
+            response = {'id': item.get('id'), 'status': status, 'headers': headers}
+            if payload is not None:
+                response['body'] = payload
+            responses.append(response)
+        return 200, {'responses': responses}, {}
+
+    # ---------- 通用列表处理 ----------
+
+    def _page(self, request, items, default_top=100, max_top=999):
+        """$filter 之外的 OData 参数：$search / $orderby / $select / $top / $skiptoken"""
+        query = request['query']
+        if query.get('$search'):
+            items = self._search(items, query['$search'])
+        orderby = query.get('$orderby')
+        if orderby:
+            field, _, direction = orderby.partition(' ')
+            items = sorted(items, key=lambda i: str(self._field(i, field) or ''), reverse=direction.lower() == 'desc')
+        total = len(items)
+        top = min(int(query.get('$top', default_top)), max_top)
+        skip = int(query.get('$skiptoken', 0))
+        page = items[skip:skip + top]
+        select = query.get('$select')
+        if select:
+            fields = set(select.split(',')) | {'id'}
+            page = [{k: v for k, v in item.items() if k in fields} for item in page]
+        result = {'value': page}
+        if skip + top < total:
+            result['@odata.nextLink'] = (f"{self.public_base}{API_PREFIX}{request['path']}"
+                                         f"?$top={top}&$skiptoken={skip + top}"
+                                         + (f"&$select={select}" if select else ''))
+        return 200, result
+
+    @staticmethod
+    def _field(item, path):
+        """按 a/b 形式的路径取嵌套字段"""
+        for key in path.split('/'):
+            item = item.get(key) if isinstance(item, dict) else None
+        return item
+
+    @staticmethod
+    def _search(items, search):
+        """$search="subject:a OR subject:b"，不带字段前缀时匹配全部字段"""
+        terms = [t for t in re.split(r'\s+OR\s+', search.strip().strip('"')) if t]
+
+        def matches(item, term):
+            field, sep, value = term.partition(':')
+            if not sep:
+                field, value = None, term
+            text = str(item.get(field, '')) if field else json.dumps(item)
+            return value.strip('"').lower() in text.lower()
+
+        return [item for item in items if any(matches(item, term) for term in terms)]
+
+    @staticmethod
+    def _public(item):
+        return {k: v for k, v in item.items() if k not in ('items', 'tasks')}
+
+    def _user(self, request):
+        key = request['params'].get('user')
+        if key is None:
+            return self.tenant.users[self.tenant.me_id]
+        user = self.tenant.users.get(key) or next(
+            (u for u in self.tenant.users.values() if u['userPrincipalName'] == key), None)
+        if not user:
+            raise GraphError(404, 'Request_ResourceNotFound', f'user {key}')
+        return user
+
+    def _drive(self, drive_id):
+        drive = next((d for d in self.tenant.drives.values() if d['id'] == drive_id), None)
+        if not drive:
+            raise GraphError(404, 'itemNotFound', f'drive {drive_id}')
+        return drive
+
+    # ---------- 用户与 OneDrive ----------
+
+    def list_users(self, request):
+        return self._page(request, list(self.tenant.users.values()))
+
+    def get_user(self, request):
+        user = self._user(request)
+        select = request['query'].get('$select')
+        if select:
+            fields = set(select.split(',')) | {'id'}
+            user = {k: v for k, v in user.items() if k in fields}
+        return 200, user
+
+    def update_user(self, request):
+        self._user(request).update(request['body'] or {})
+        return 204, None
+
+    def delete_user(self, request):
+        user = self._user(request)
+        del self.tenant.users[user['id']]
+        return 204, None
+
+    def get_drive(self, request):
+        return 200, self._public(self.tenant.drives[self._user(request)['id']])
+
+    def list_children(self, request):
+        return self._page(request, list(self._drive(request['params']['drive'])['items'].values()), default_top=200)
+
+    def upload(self, request):
+        drive = self._drive(request['params']['drive'])
+        owner = next(user_id for user_id, d in self.tenant.drives.items() if d is drive)
+        content = request['body'] if isinstance(request['body'], bytes) else json.dumps(request['body']).encode()
+        return 201, self.tenant._put_file(owner, request['params']['name'], content or b'')
+
+    def delete_item(self, request):
+        items = self._drive(request['params']['drive'])['items']
+        if items.pop(request['params']['item'], None) is None:
+            raise GraphError(404, 'itemNotFound', request['params']['item'])
+        return 204, None
+
+    # ---------- 邮件与日历 ----------
+
+    def list_messages(self, request):
+        items = sorted(self.tenant.messages.values(), key=lambda m: m['receivedDateTime'], reverse=True)
+        return self._page(request, items, default_top=10, max_top=1000)
+
+    def create_message(self, request):
+        body = request['body'] or {}
+        return 201, self.tenant._add_message(body.get('subject', ''), is_draft=True)
+
+    def send_message(self, request):
+        message = self.tenant.messages.get(request['params']['message'])
+        if not message:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['message'])
+        message['isDraft'] = False
+        message['receivedDateTime'] = _iso(_now())
+        return 202, None
+
+    def delete_message(self, request):
+        if self.tenant.messages.pop(request['params']['message'], None) is None:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['message'])
+        return 204, None
+
+    def list_events(self, request):
+        return self._page(request, list(self.tenant.events.values()), default_top=10, max_top=1000)
+
+    def create_event(self, request):
+        body = request['body'] or {}
+        event_id = _new_id()
+        self.tenant.events[event_id] = {'id': event_id, 'subject': body.get('subject'), 'start': body.get('start'),
+                                        'end': body.get('end'), 'createdDateTime': _iso(_now())}
+        return 201, self.tenant.events[event_id]
+
+    def delete_event(self, request):
+        if self.tenant.events.pop(request['params']['event'], None) is None:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['event'])
+        return 204, None
+
+    # ---------- To Do ----------
+
+    def _todo_list(self, request):
+        todo_list = self.tenant.todo_lists.get(request['params']['list'])
+        if not todo_list:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['list'])
+        return todo_list
+
+    def list_todo_lists(self, request):
+        return self._page(request, [self._public(l) for l in self.tenant.todo_lists.values()])
+
+    def list_tasks(self, request):
+        return self._page(request, list(self._todo_list(request)['tasks'].values()))
+
+    def create_task(self, request):
+        body = request['body'] or {}
+        task_id = _new_id()
+        task = {'id': task_id, 'title': body.get('title'), 'status': 'notStarted', 'createdDateTime': _iso(_now())}
+        self._todo_list(request)['tasks'][task_id] = task
+        return 201, task
+
+    def delete_task(self, request):
+        if self._todo_list(request)['tasks'].pop(request['params']['task'], None) is None:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['task'])
+        return 204, None
+
+    # ---------- OneNote ----------
+
+    def list_notebooks(self, request):
+        return self._page(request, list(self.tenant.notebooks.values()))
+
+    def create_notebook(self, request):
+        notebook_id = _new_id()
+        self.tenant.notebooks[notebook_id] = {'id': notebook_id, 'displayName': (request['body'] or {}).get('displayName')}
+        return 201, self.tenant.notebooks[notebook_id]
+
+    def list_sections(self, request):
+        notebook_id = request['params']['notebook']
+        return self._page(request, [s for s in self.tenant.sections.values() if s['notebookId'] == notebook_id])
+
+    def create_section(self, request):
+        notebook_id = request['params']['notebook']
+        if notebook_id not in self.tenant.notebooks:
+            raise GraphError(404, 'ErrorItemNotFound', notebook_id)
+        section_id = _new_id()
+        self.tenant.sections[section_id] = {'id': section_id, 'notebookId': notebook_id,
+                                            'displayName': (request['body'] or {}).get('displayName')}
+        return 201, self.tenant.sections[section_id]
+
+    def list_pages(self, request):
+        section_id = request['params']['section']
+        return self._page(request, [p for p in self.tenant.pages.values() if p['sectionId'] == section_id])
+
+    def create_page(self, request):
+        section_id = request['params']['section']
+        if section_id not in self.tenant.sections:
+            raise GraphError(404, 'ErrorItemNotFound', section_id)
+        content = request['body'].decode('utf-8', errors='ignore') if isinstance(request['body'], bytes) else ''
+        match = re.search(r'<title>(.*?)</title>', content)
+        page_id = _new_id()
+        self.tenant.pages[page_id] = {
+            'id': page_id, 'sectionId': section_id, 'title': match.group(1) if match else '',
+            'createdDateTime': _iso(_now()),
+            'links': {'oneNoteWebUrl': {'href': f'https://onenote.example/{page_id}'}},
+        }
+        return 201, self.tenant.pages[page_id]
+
+    def delete_page(self, request):
+        if self.tenant.pages.pop(request['params']['page'], None) is None:
+            raise GraphError(404, 'ErrorItemNotFound', request['params']['page'])
+        return 204, None
+
+    # ---------- 启动 ----------
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """在后台线程的事件循环中运行，返回服务地址"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop_thread(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Microsoft Graph 模拟服务')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的延迟（毫秒）')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='返回 429 的概率')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    server = FakeGraphServer(FakeTenant(users=args.users), latency=args.latency / 1000,
+                             throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    web.run_app(server.app(), host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+'''
+吉利签名和接口流程基准测试
+
+在本地模拟服务上测量：
+- 签名：GeelyUser 的 GET/POST 请求头（HMAC-SHA256）和 VehicleControl 的 HMAC-SHA1 签名，每秒次数
+- 签到流程：refresh -> 签到状态 -> 签到 -> 积分
+- 车辆状态流程：refresh -> oauth2 code -> session/secure -> 车辆状态 -> 详细状态
+单账号串行和多账号并发各跑一轮，输出每秒流程数和每秒请求数。
+模拟服务会校验签名，签名错误的请求计入“签名错误”列。
+
+在仓库根目录运行：
+    python -m benchmarks.geely_bench
+    python -m benchmarks.geely_bench --accounts 1 20 --latency 30 --rounds 5
+'''
+import os
+import sys
+import time
+import timeit
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_geely_server import FakeGeelyServer
+from utils.geely.geely_panda_utils import GeelyUser
+from utils.geely.vehicle_utils import VehicleControl
+from utils.geely.credential_chain import GeelyCredentialChain
+
+
+@contextlib.contextmanager
+def patched(server_url):
+    """把 GeelyUser / VehicleControl 的接口地址指向模拟服务"""
+    saved = [(GeelyUser, 'USER_API_URL'), (GeelyUser, 'APP_API_URL'),
+             (VehicleControl, 'BASE_AUTH_URL'), (VehicleControl, 'BASE_DEVICE_URL')]
+    values = [getattr(cls, name) for cls, name in saved]
+    for cls, name in saved:
+        setattr(cls, name, server_url)
+    try:
+        yield
+    finally:
+        for (cls, name), value in zip(saved, values):
+            setattr(cls, name, value)
+
+
+def bench_signing(number):
+    """签名相关的纯计算开销"""
+    user = GeelyUser('rt-bench&SN0001')
+    user.token = 'token-bench'
+    vehicle = VehicleControl('VIN00000000000001')
+    body = '{"signType": 0}'
+    md5 = vehicle.calculate_content_md5(body)
+    cases = [
+        ('GeelyUser GET 请求头', lambda: user.get_get_header('204453306', '/app/v1/sign/state')),
+        ('GeelyUser POST 请求头', lambda: user.get_post_header('204453306', '/app/v1/sign/add', body)),
+        ('VehicleControl 签名', lambda: vehicle.calculate_signature(
+            vehicle.generate_nonce(1700000000000), md5, 1700000000000, 'PUT', '/remote-control/vehicle/telematics/x')),
+    ]
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<28} {number / best:>12,.0f} 次/秒")
+
+
+def sign_flow(index, round_no, workdir):
+    """一个账号的完整签到流程"""
+    user = GeelyUser(f'rt-{index:04d}&SN{index:04d}')
+    return bool(user.do_sign())
+
+
+def status_flow(index, round_no, workdir):
+    """一个账号从 refreshToken 开始的完整车辆状态流程（凭证缓存为空）"""
+    user = GeelyUser(f'rt-{index:04d}&SN{index:04d}')
+    chain = GeelyCredentialChain(user, file_path=os.path.join(workdir, f'credentials-{index}-{round_no}.json'))
+    vehicle = chain.vehicle_control(f'VIN{index:014d}')
+    if not vehicle.authorization:
+        return False
+    return vehicle.get_vehicle_status() is not None and vehicle.get_vehicle_detailed_status() is not None
+
+
+def bench_flow(server, flow, accounts, rounds, workdir):
+    """accounts 个账号并发执行 rounds 轮，返回 (秒, 成功流程数, 请求数, 签名错误数)"""
+    server.reset()
+    # 每次使用新的凭证缓存目录，避免读到上一次运行（服务端已重置）的缓存
+    workdir = tempfile.mkdtemp(dir=workdir)
+    start = time.perf_counter()
+    ok = 0
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        with ThreadPoolExecutor(max_workers=accounts) as executor:
+            for round_no in range(rounds):
+                ok += sum(executor.map(lambda i: flow(i, round_no, workdir), range(accounts)))
+    elapsed = time.perf_counter() - start
+    return elapsed, ok, server.stats.get('http_requests', 0), server.stats.get('bad_signature', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='吉利签名和接口流程基准测试')
+    parser.add_argument('--accounts', nargs='+', type=int, default=[1, 10], help='并发账号数')
+    parser.add_argument('--rounds', type=int, default=3, help='每个账号执行的轮数')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的延迟（毫秒）')
+    parser.add_argument('--sign-number', type=int, default=5000, help='签名基准每轮次数')
+    args = parser.parse_args()
+
+    print("== 签名 ==")
+    bench_signing(args.sign_number)
+
+    server = FakeGeelyServer(latency=args.latency / 1000)
+    server.start_in_thread()
+    print(f"\n== 接口流程 ==  模拟服务: {server.url}  延迟 {args.latency}ms")
+    print(f"{'流程':<12}{'账号数':>6}{'耗时(s)':>10}{'成功':>8}{'流程/秒':>10}{'请求/秒':>10}{'签名错误':>8}")
+    try:
+        with patched(server.url), tempfile.TemporaryDirectory() as workdir:
+            for name, flow in (('签到', sign_flow), ('车辆状态', status_flow)):
+                for accounts in args.accounts:
+                    elapsed, ok, requests, bad = bench_flow(server, flow, accounts, args.rounds, workdir)
+                    total = accounts * args.rounds
+                    print(f"{name:<12}{accounts:>6}{elapsed:>10.2f}{f'{ok}/{total}':>8}"
+                          f"{total / elapsed:>10.1f}{requests / elapsed:>10.1f}{bad:>8}")
+                    sys.stdout.flush()
+    finally:
+        server.stop_thread()
+
+
+if __name__ == '__main__':
+    main()
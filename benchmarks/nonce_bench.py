@@ -0,0 +1,73 @@
+'''
+签名随机数生成的微基准
+
+对比原实现（random.choices 拼接 / uuid.uuid4）与 NonceProvider，
+在仓库根目录运行：python -m benchmarks.nonce_bench
+'''
+import random
+import string
+import time
+import timeit
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from utils.geely.nonce_utils import NonceProvider
+
+
+def legacy_vehicle_nonce(timestamp):
+    """原 VehicleControl.generate_nonce 实现"""
+    prefix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=3))
+    middle = ''.join(random.choices(string.ascii_lowercase + string.digits, k=12))
+    suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
+    return f"{prefix}-{middle}{suffix}{timestamp}"
+
+
+def legacy_uuid():
+    """原 GeelyUser.generate_uuid 实现"""
+    return str(uuid.uuid4())
+
+
+def bench(name, func, number):
+    """运行若干次取最好成绩，输出每秒次数"""
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{name:<32} {number / best:>12,.0f} 次/秒")
+
+
+def bench_threads(name, func, number, workers=8):
+    """多线程并发调用的吞吐"""
+    per_worker = number // workers
+
+    def worker():
+        for _ in range(per_worker):
+            func()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {per_worker * workers / elapsed:>12,.0f} 次/秒 ({workers} 线程)")
+
+
+def main():
+    provider = NonceProvider()
+    timestamp = int(time.time() * 1000)
+    number = 100000
+
+    print("== vehicle nonce ==")
+    bench("legacy random.choices", lambda: legacy_vehicle_nonce(timestamp), number)
+    bench("NonceProvider.vehicle_nonce", lambda: provider.vehicle_nonce(timestamp), number)
+    bench_threads("NonceProvider.vehicle_nonce", lambda: provider.vehicle_nonce(timestamp), number)
+
+    print("== uuid ==")
+    bench("legacy uuid.uuid4", legacy_uuid, number)
+    bench("NonceProvider.uuid4", provider.uuid4, number)
+    bench_threads("NonceProvider.uuid4", provider.uuid4, number)
+
+    # 校验输出格式与原实现一致
+    sample = provider.uuid4()
+    assert str(uuid.UUID(sample)) == sample and uuid.UUID(sample).version == 4
+    assert len(provider.vehicle_nonce(timestamp)) == len(legacy_vehicle_nonce(timestamp))
+
+
+if __name__ == "__main__":
+    main()
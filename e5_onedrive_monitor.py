@@ -10,7 +10,8 @@ import traceback
 from typing import List, Dict, TypedDict, Optional
 from datetime import datetime
 from azure.identity import ClientSecretCredential
-from msgraph import GraphServiceClient
+from utils.graph_client import GraphClients
+from utils.metrics_exporter import Metrics
 
 # 加载 .env 文件（本地开发时使用）
 try:
@@ -60,7 +61,7 @@ class OneDriveMonitor:
             client_id=config.client_id,
             client_secret=config.client_secret
         )
-        self.graph_client = GraphServiceClient(credentials=credential)
+        self.graph_client = GraphClients.shared(('app', config.tenant_id, config.client_id), credential)
 
     async def get_all_users(self) -> List[Dict]:
         """获取所有用户列表"""
@@ -257,7 +258,24 @@ class ReportGenerator:
 
         return "\n".join(report_lines)
 
+    @staticmethod
+    def record_metrics(users_data: List[UserOneDriveInfo]):
+        """记录导出指标：汇总值和每个用户的用量"""
+        metrics.gauge('e5_onedrive_users', len(users_data), '监控的用户数')
+        metrics.gauge('e5_onedrive_used_gb_total', sum(u['used_gb'] for u in users_data), '总已用空间（GB）')
+        metrics.gauge('e5_onedrive_capacity_gb_total', sum(u['total_gb'] for u in users_data), '总容量（GB）')
+        if users_data:
+            metrics.gauge('e5_onedrive_usage_percent_avg',
+                          sum(u['usage_percentage'] for u in users_data) / len(users_data), '平均使用率（%）')
+        for user in users_data:
+            metrics.gauge('e5_onedrive_used_gb', user['used_gb'], '已用空间（GB）', user=user['user_email'])
+            metrics.gauge('e5_onedrive_usage_percent', user['usage_percentage'], '使用率（%）', user=user['user_email'])
+
+
+metrics = Metrics.for_job('e5_onedrive_monitor')
+
 
+@metrics.track
 async def main():
     """主函数"""
     try:
@@ -286,6 +304,7 @@ async def main():
 
         report = ReportGenerator.generate_push_report(users_data)
         print(report)
+        ReportGenerator.record_metrics(users_data)
 
         # 发送推送通知
         try:
@@ -302,6 +321,7 @@ async def main():
         print("\n✓ 监控完成")
 
     except Exception as e:
+        metrics.fail()
         error_msg = str(e)
         print(f"\n✗ 脚本执行出错: {e}")
         traceback.print_exc(file=sys.stdout)
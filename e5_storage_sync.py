@@ -11,7 +11,7 @@ import random
 from datetime import datetime
 from io import BytesIO
 from azure.identity import UsernamePasswordCredential
-from msgraph import GraphServiceClient
+from utils.graph_client import GraphClients
 
 # 加载 .env 文件（本地开发时使用）
 try:
@@ -50,7 +50,7 @@ class OneDriveFileManager:
             password=config.password,
             tenant_id=config.tenant_id
         )
-        self.graph_client = GraphServiceClient(credentials=credential)
+        self.graph_client = GraphClients.shared(('user', config.tenant_id, config.client_id, config.username), credential)
         self.drive_id = None
 
     async def ensure_drive_id(self):
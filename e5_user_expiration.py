@@ -10,7 +10,8 @@ import traceback
 from typing import List, Dict, TypedDict
 from datetime import datetime, timedelta, timezone
 from azure.identity import ClientSecretCredential
-from msgraph import GraphServiceClient
+from utils.graph_client import GraphClients
+from utils.metrics_exporter import Metrics
 
 # 加载 .env 文件（本地开发时使用）
 try:
@@ -63,7 +64,7 @@ class UserExpirationManager:
             client_id=config.client_id,
             client_secret=config.client_secret
         )
-        self.graph_client = GraphServiceClient(credentials=credential)
+        self.graph_client = GraphClients.shared(('app', config.tenant_id, config.client_id), credential)
 
     async def get_all_users(self) -> List[Dict]:
         """获取所有用户列表"""
@@ -274,7 +275,22 @@ class ReportGenerator:
 
         return "\n".join(report_lines)
 
+    @staticmethod
+    def record_metrics(stats: Dict, users_info: List[UserExpirationInfo]):
+        """记录导出指标：管理用户数、各类处理结果数，以及最近过期用户剩余天数"""
+        metrics.gauge('e5_users_managed', len(users_info), '管理的用户数')
+        for result in ('deleted', 'disabled', 'warned', 'failed'):
+            metrics.gauge('e5_users_processed', len(stats[result]), '本次各类处理结果的用户数', result=result)
+            metrics.counter('e5_users_processed_total', len(stats[result]), '累计各类处理结果的用户数', result=result)
+        if users_info:
+            metrics.gauge('e5_users_min_days_until_expire', min(u['days_until_expire'] for u in users_info),
+                          '最近过期用户的剩余天数')
+
+
+metrics = Metrics.for_job('e5_user_expiration')
+
 
+@metrics.track
 async def main():
     """主函数"""
     try:
@@ -314,6 +330,7 @@ async def main():
 
         report = ReportGenerator.generate_report(stats, users_info)
         print(report)
+        ReportGenerator.record_metrics(stats, users_info)
 
         # 发送推送通知（仅在成功禁用或删除用户时发送）
         if stats['deleted'] or stats['disabled']:
@@ -336,6 +353,7 @@ async def main():
         print("\n✓ 检查完成")
 
     except Exception as e:
+        metrics.fail()
         error_msg = str(e)
         print(f"\n✗ 脚本执行出错: {e}")
         traceback.print_exc(file=sys.stdout)
@@ -10,7 +10,10 @@ import traceback
 import random
 from datetime import datetime
 from azure.identity import UsernamePasswordCredential
-from msgraph import GraphServiceClient
+from utils.graph_client import GraphClients
+from utils.graph_batch import GraphBatch
+from utils.profiler import Profiler
+from utils.metrics_exporter import Metrics
 
 # 加载 .env 文件（本地开发时使用）
 try:
@@ -49,7 +52,12 @@ class WorkspaceActivityManager:
             password=config.password,
             tenant_id=config.tenant_id
         )
-        self.graph_client = GraphServiceClient(credentials=self.credential)
+        # 环境变量 E5_PROFILE 开启运行分析
+        self.profiler = Profiler.from_env('E5_PROFILE', 'e5_workspace_activity')
+        self.graph_client = self.profiler.instrument_graph(GraphClients.shared(
+            ('user', config.tenant_id, config.client_id, config.username), self.credential))
+        # 请求速率由 GraphThrottle 控制；E5_ACTIVITY_PACING=1 时仍在活动之间随机停顿 1-2 秒
+        self.pacing = os.getenv('E5_ACTIVITY_PACING', '0').strip().lower() in ('1', 'true')
 
     # 统一的主题列表（用于邮件、日历、任务、OneNote）
     UNIFIED_TOPICS = [
@@ -99,6 +107,20 @@ class WorkspaceActivityManager:
         'Performance',
     ]
 
+    # 一次搜索最多取回的邮件数
+    SEARCH_TOP = 50
+
+    async def pause(self, seconds: float):
+        """活动之间的主动等待（分析时与真实 I/O 分开统计）"""
+        with self.profiler.pacing():
+            await asyncio.sleep(seconds)
+
+    async def pace(self):
+        """活动之间的随机停顿（仅开启 E5_ACTIVITY_PACING 时）"""
+        if self.pacing:
+            await self.pause(random.uniform(1, 2))
+
+    @Profiler.traced()
     async def send_email_to_self(self, subject: str) -> dict:
         """发送邮件给自己"""
         try:
@@ -144,6 +166,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def create_calendar_event(self, title: str) -> dict:
         """创建日历事件"""
         try:
@@ -191,6 +214,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def create_onenote_notebook(self, name: str) -> dict:
         """创建 OneNote 笔记本"""
         try:
@@ -214,6 +238,7 @@ class WorkspaceActivityManager:
                 'error': str(e)[:100]
             }
 
+    @Profiler.traced()
     async def create_onenote_section(self, notebook_id: str, name: str) -> dict:
         """创建 OneNote 分区"""
         try:
@@ -237,6 +262,7 @@ class WorkspaceActivityManager:
                 'error': str(e)[:100]
             }
 
+    @Profiler.traced()
     async def create_onenote_page(self, title: str) -> dict:
         """创建 OneNote 页面（自动创建笔记本和分区，或使用现有的）"""
         try:
@@ -261,7 +287,7 @@ class WorkspaceActivityManager:
                         'error': f"创建笔记本失败: {nb_result.get('error', '')}"
                     }
                 # 等待创建完成并重新获取
-                await asyncio.sleep(2)
+                await self.pause(2)
                 notebooks = await self.graph_client.me.onenote.notebooks.get()
                 if notebooks and notebooks.value:
                     for nb in notebooks.value:
@@ -299,7 +325,7 @@ class WorkspaceActivityManager:
                         'error': f"创建分区失败: {sec_result.get('error', '')}"
                     }
                 # 等待创建完成并重新获取
-                await asyncio.sleep(2)
+                await self.pause(2)
                 sections = await self.graph_client.me.onenote.notebooks.by_notebook_id(notebook.id).sections.get()
                 if sections and sections.value:
                     for sec in sections.value:
@@ -410,6 +436,7 @@ class WorkspaceActivityManager:
                 'error': error_msg[:300]
             }
 
+    @Profiler.traced()
     async def upload_sharepoint_file(self, file_name: str) -> dict:
         """上传文件到 OneDrive（SharePoint）"""
         try:
@@ -439,35 +466,34 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
-    async def search_content(self, keyword: str) -> dict:
-        """搜索邮件内容"""
+    @Profiler.traced()
+    async def search_content(self, keywords: list) -> dict:
+        """搜索邮件：多个关键词合并成一次服务端 $search，只取回主题，再按关键词计数"""
         try:
-            # 简单调用：直接获取邮件列表，然后在本地过滤
-            result = await self.graph_client.me.messages.get()
-
-            # 简单的本地关键词匹配
-            message_count = 0
-            if result and result.value:
-                keyword_lower = keyword.lower()
-                for msg in result.value[:20]:  # 只检查前20封
-                    subject = (msg.subject or "").lower()
-                    if keyword_lower in subject:
-                        message_count += 1
-
+            messages = self.graph_client.me.messages
+            result = await messages.get(request_configuration=GraphClients.query(
+                messages,
+                search='"' + ' OR '.join(f'subject:{keyword}' for keyword in keywords) + '"',
+                select=['subject'],
+                top=self.SEARCH_TOP
+            ))
+
+            subjects = [(msg.subject or "").lower() for msg in (result.value if result and result.value else [])]
             return {
                 'success': True,
-                'keyword': keyword,
-                'count': message_count
+                'keywords': keywords,
+                'counts': {keyword: sum(keyword.lower() in subject for subject in subjects) for keyword in keywords}
             }
 
         except Exception as e:
             error_msg = str(e)
             return {
                 'success': False,
-                'keyword': keyword,
+                'keywords': keywords,
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def create_planner_task(self, title: str) -> dict:
         """创建 Planner 任务"""
         try:
@@ -514,18 +540,21 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def access_todo_lists(self) -> dict:
         """访问 To Do 列表"""
         try:
-            # 获取 To Do 列表
-            result = await self.graph_client.me.todo.lists.get()
+            # 获取 To Do 列表（只需要 id）
+            lists = self.graph_client.me.todo.lists
+            result = await lists.get(request_configuration=GraphClients.query(lists, select=['id']))
 
             list_count = len(result.value) if result and result.value else 0
 
             # 如果有列表，读取第一个列表的任务
             if result and result.value and len(result.value) > 0:
                 todo_list = result.value[0]
-                tasks = await self.graph_client.me.todo.lists.by_todo_task_list_id(todo_list.id).tasks.get()
+                tasks = self.graph_client.me.todo.lists.by_todo_task_list_id(todo_list.id).tasks
+                tasks = await tasks.get(request_configuration=GraphClients.query(tasks, select=['id']))
                 task_count = len(tasks.value) if tasks and tasks.value else 0
 
                 return {
@@ -547,6 +576,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def create_todo_task(self, title: str) -> dict:
         """创建 To Do 任务"""
         try:
@@ -591,16 +621,18 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def access_calendar_events(self) -> dict:
         """访问日历事件"""
         try:
-            # 直接获取事件列表
-            result = await self.graph_client.me.events.get()
+            # 只取前 20 个事件的开始时间
+            events = self.graph_client.me.events
+            result = await events.get(request_configuration=GraphClients.query(events, select=['start'], top=20))
 
             # 统计事件数量
             event_count = 0
             if result and result.value:
-                for event in result.value[:20]:  # 只检查前20个事件
+                for event in result.value:
                     if event.start and event.start.date_time:
                         # 简单检查，只要有事件就计数
                         event_count += 1
@@ -617,6 +649,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def access_onenote(self) -> dict:
         """访问 OneNote 笔记本"""
         try:
@@ -647,23 +680,31 @@ class WorkspaceActivityManager:
                 'error': error_msg[:300]
             }
 
-    async def delete_old_emails(self, count: int = 5) -> dict:
-        """删除旧邮件（发件人是自己的）"""
+    @Profiler.traced()
+    async def find_old_emails(self, count: int = 5) -> dict:
+        """查找要删除的旧邮件（发件人是自己的），返回 $batch 子请求路径"""
         try:
-            # 获取发件人是自己的邮件
-            messages = await self.graph_client.me.messages.get()
-
-            deleted = 0
+            # 在服务端筛选发件人是自己的邮件，按接收时间从旧到新取 count 封
+            # （同时使用 $filter 和 $orderby 时，排序字段必须先出现在筛选条件里）
+            messages = self.graph_client.me.messages
+            messages = await messages.get(request_configuration=GraphClients.query(
+                messages,
+                filter=f"receivedDateTime ge 1900-01-01T00:00:00Z and from/emailAddress/address eq '{self.config.username}'",
+                orderby=['receivedDateTime'],
+                select=['id', 'from'],
+                top=count
+            ))
+
+            paths = []
             if messages and messages.value:
-                for msg in messages.value[:count]:
+                for msg in messages.value:
                     # 检查是否是自己发的
                     if msg.from_ and msg.from_.email_address and msg.from_.email_address.address == self.config.username:
-                        await self.graph_client.me.messages.by_message_id(msg.id).delete()
-                        deleted += 1
+                        paths.append(GraphBatch.path('me', 'messages', msg.id))
 
             return {
                 'success': True,
-                'deleted': deleted
+                'paths': paths
             }
 
         except Exception as e:
@@ -673,20 +714,23 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
-    async def delete_old_events(self, count: int = 3) -> dict:
-        """删除旧的日历事件"""
+    @Profiler.traced()
+    async def find_old_events(self, count: int = 3) -> dict:
+        """查找要删除的旧日历事件，返回 $batch 子请求路径"""
         try:
-            events = await self.graph_client.me.events.get()
+            # 按开始时间从旧到新取 count 个
+            events = self.graph_client.me.events
+            events = await events.get(request_configuration=GraphClients.query(
+                events, select=['id'], orderby=['start/dateTime'], top=count))
 
-            deleted = 0
+            paths = []
             if events and events.value:
-                for event in events.value[:count]:
-                    await self.graph_client.me.events.by_event_id(event.id).delete()
-                    deleted += 1
+                for event in events.value:
+                    paths.append(GraphBatch.path('me', 'events', event.id))
 
             return {
                 'success': True,
-                'deleted': deleted
+                'paths': paths
             }
 
         except Exception as e:
@@ -696,28 +740,31 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
-    async def delete_completed_tasks(self) -> dict:
-        """删除已完成的 To Do 任务"""
+    @Profiler.traced()
+    async def find_completed_tasks(self) -> dict:
+        """查找要删除的 To Do 任务（已完成的或随机挑一些，最多 3 个），返回 $batch 子请求路径"""
         try:
-            lists = await self.graph_client.me.todo.lists.get()
+            # 只用到第一个列表
+            lists = self.graph_client.me.todo.lists
+            lists = await lists.get(request_configuration=GraphClients.query(lists, select=['id'], top=1))
 
-            deleted = 0
+            paths = []
             if lists and lists.value and len(lists.value) > 0:
                 todo_list = lists.value[0]
-                tasks = await self.graph_client.me.todo.lists.by_todo_task_list_id(todo_list.id).tasks.get()
+                tasks = self.graph_client.me.todo.lists.by_todo_task_list_id(todo_list.id).tasks
+                tasks = await tasks.get(request_configuration=GraphClients.query(tasks, select=['id', 'status']))
 
                 if tasks and tasks.value:
                     for task in tasks.value:
                         # 删除已完成的任务或随机删除一些
                         if task.status == "completed" or random.choice([True, False, False]):
-                            await self.graph_client.me.todo.lists.by_todo_task_list_id(todo_list.id).tasks.by_todo_task_id(task.id).delete()
-                            deleted += 1
-                            if deleted >= 3:  # 最多删除3个
+                            paths.append(GraphBatch.path('me', 'todo', 'lists', todo_list.id, 'tasks', task.id))
+                            if len(paths) >= 3:  # 最多删除3个
                                 break
 
             return {
                 'success': True,
-                'deleted': deleted
+                'paths': paths
             }
 
         except Exception as e:
@@ -727,13 +774,14 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
-    async def delete_onenote_pages(self, count: int = 3) -> dict:
-        """删除 OneNote 页面（仅删除 Work Notes 笔记本中的页面）"""
+    @Profiler.traced()
+    async def find_onenote_pages(self, count: int = 3) -> dict:
+        """查找要删除的 OneNote 页面（仅 Work Notes 笔记本 Activity Log 分区中的），返回 $batch 子请求路径"""
         try:
             # 获取笔记本
             notebooks = await self.graph_client.me.onenote.notebooks.get()
 
-            deleted = 0
+            paths = []
             if notebooks and notebooks.value:
                 # 查找 "Work Notes" 笔记本
                 target_notebook = None
@@ -758,12 +806,11 @@ class WorkspaceActivityManager:
 
                             if pages and pages.value:
                                 for page in pages.value[:count]:
-                                    await self.graph_client.me.onenote.pages.by_onenote_page_id(page.id).delete()
-                                    deleted += 1
+                                    paths.append(GraphBatch.path('me', 'onenote', 'pages', page.id))
 
             return {
                 'success': True,
-                'deleted': deleted
+                'paths': paths
             }
 
         except Exception as e:
@@ -773,29 +820,50 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
-    async def delete_old_files(self, count: int = 3) -> dict:
-        """删除旧文件"""
+    @Profiler.traced()
+    async def find_old_files(self, count: int = 3) -> dict:
+        """查找要删除的旧文件（根目录下脚本创建的 doc_*.txt），返回 $batch 子请求路径"""
         try:
             # 获取 drive ID
-            drive = await self.graph_client.me.drive.get()
+            drive = self.graph_client.me.drive
+            drive = await drive.get(request_configuration=GraphClients.query(drive, select=['id']))
             drive_id = drive.id
 
-            # 获取根目录下的文件
-            items = await self.graph_client.drives.by_drive_id(drive_id).items.by_drive_item_id('root').children.get()
+            # 获取根目录下的文件，只取名称，按修改时间从旧到新
+            children = self.graph_client.drives.by_drive_id(drive_id).items.by_drive_item_id('root').children
+            items = await children.get(request_configuration=GraphClients.query(
+                children, select=['id', 'name'], orderby=['lastModifiedDateTime']))
 
-            deleted = 0
+            paths = []
             if items and items.value:
                 # 只删除文件名匹配 doc_*.txt 的文件（脚本创建的）
                 for item in items.value:
                     if item.name and item.name.startswith('doc_') and item.name.endswith('.txt'):
-                        await self.graph_client.drives.by_drive_id(drive_id).items.by_drive_item_id(item.id).delete()
-                        deleted += 1
-                        if deleted >= count:
+                        paths.append(GraphBatch.path('drives', drive_id, 'items', item.id))
+                        if len(paths) >= count:
                             break
 
             return {
                 'success': True,
-                'deleted': deleted
+                'paths': paths
+            }
+
+        except Exception as e:
+            error_msg = str(e)
+            return {
+                'success': False,
+                'error': error_msg
+            }
+
+    @Profiler.traced()
+    async def bulk_delete(self, groups: dict) -> dict:
+        """把各类要删除的对象合并成 $batch 删除，groups: {类别: [子请求路径]}，返回 {类别: 删除成功数}"""
+        try:
+            paths = [path for group in groups.values() for path in group]
+            deleted = await GraphBatch(self.graph_client).delete(paths) if paths else set()
+            return {
+                'success': True,
+                'deleted': {key: sum(path in deleted for path in group) for key, group in groups.items()}
             }
 
         except Exception as e:
@@ -805,6 +873,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def access_sharepoint_sites(self) -> dict:
         """访问 SharePoint 站点"""
         try:
@@ -848,6 +917,7 @@ class WorkspaceActivityManager:
                 'error': error_msg
             }
 
+    @Profiler.traced()
     async def perform_random_activities(self):
         """执行随机活动"""
         print("\n开始执行随机活动...")
@@ -884,7 +954,7 @@ class WorkspaceActivityManager:
                 else:
                     results['failed'] += 1
                     print(f"  ✗ 邮件 {i+1}/{email_count} 发送失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                await self.pace()
         else:
             print(f"\n[1/10] 跳过邮件发送")
 
@@ -893,16 +963,16 @@ class WorkspaceActivityManager:
             search_count = random.randint(3, 5)
             print(f"\n[2/10] 搜索内容（{search_count} 个关键词）")
             keywords = random.sample(self.SEARCH_KEYWORDS, search_count)
-            for keyword in keywords:
-                print(f"  搜索: {keyword}")
-                result = await self.search_content(keyword)
-                if result['success']:
+            print(f"  搜索: {', '.join(keywords)}")
+            result = await self.search_content(keywords)
+            if result['success']:
+                for keyword in keywords:
                     results['search'] += 1
-                    print(f"    ✓ 找到 {result.get('count', 0)} 封邮件")
-                else:
-                    results['failed'] += 1
-                    print(f"    ✗ 搜索失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                    print(f"    ✓ {keyword}: 找到 {result['counts'][keyword]} 封邮件")
+            else:
+                results['failed'] += 1
+                print(f"    ✗ 搜索失败: {result.get('error', '')[:50]}")
+            await self.pace()
         else:
             print(f"\n[2/10] 跳过搜索")
 
@@ -919,7 +989,7 @@ class WorkspaceActivityManager:
                 else:
                     results['failed'] += 1
                     print(f"  ✗ 事件 {i+1}/{event_count} 创建失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                await self.pace()
         else:
             print(f"\n[3/10] 跳过日历事件创建")
 
@@ -956,7 +1026,7 @@ class WorkspaceActivityManager:
                 else:
                     results['failed'] += 1
                     print(f"  ✗ 任务 {i+1}/{task_count} 创建失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                await self.pace()
         else:
             print(f"\n[6/10] 跳过 To Do 任务创建")
 
@@ -977,7 +1047,7 @@ class WorkspaceActivityManager:
                 else:
                     results['failed'] += 1
                     print(f"  ✗ 页面 {i+1}/{page_count} 创建失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                await self.pace()
         else:
             print(f"\n[7/10] 跳过 OneNote 页面创建")
 
@@ -1004,7 +1074,7 @@ class WorkspaceActivityManager:
                 else:
                     results['failed'] += 1
                     print(f"  ✗ 文件 {i+1}/{file_count} 上传失败: {result.get('error', '')[:50]}")
-                await asyncio.sleep(random.uniform(1, 2))
+                await self.pace()
         else:
             print(f"\n[9/10] 跳过文件上传")
 
@@ -1022,47 +1092,34 @@ class WorkspaceActivityManager:
         if random.randint(1, 10) <= 3:
             print(f"\n[清理] 开始清理旧数据...")
 
-            # 清理邮件
-            result = await self.delete_old_emails(8)
-            if result['success'] and result['deleted'] > 0:
-                results['emails_deleted'] = result['deleted']
-                print(f"  ✓ 删除邮件: {result['deleted']} 封")
-
-            await asyncio.sleep(random.uniform(1, 2))
-
-            # 清理日历事件
-            result = await self.delete_old_events(5)
-            if result['success'] and result['deleted'] > 0:
-                results['events_deleted'] = result['deleted']
-                print(f"  ✓ 删除事件: {result['deleted']} 个")
+            # 先查出各类要删除的对象，再合并成 $batch 一起删除
+            cleanup = [
+                ('emails_deleted', '删除邮件', '封', self.find_old_emails(8)),
+                ('events_deleted', '删除事件', '个', self.find_old_events(5)),
+                ('tasks_deleted', '删除任务', '个', self.find_completed_tasks()),
+                ('onenote_pages_deleted', '删除 OneNote 页面', '个', self.find_onenote_pages(5)),
+                ('files_deleted', '删除文件', '个', self.find_old_files(5)),
+            ]
+            found = await asyncio.gather(*(find for _, _, _, find in cleanup))
+            groups = {key: result['paths'] for (key, _, _, _), result in zip(cleanup, found) if result['success']}
+
+            result = await self.bulk_delete(groups)
+            if result['success']:
+                for key, label, unit, _ in cleanup:
+                    deleted = result['deleted'].get(key, 0)
+                    if deleted > 0:
+                        results[key] = deleted
+                        print(f"  ✓ {label}: {deleted} {unit}")
+            else:
+                print(f"  ✗ 批量删除失败: {result.get('error', '')[:50]}")
 
-            await asyncio.sleep(random.uniform(1, 2))
-
-            # 清理任务
-            result = await self.delete_completed_tasks()
-            if result['success'] and result['deleted'] > 0:
-                results['tasks_deleted'] = result['deleted']
-                print(f"  ✓ 删除任务: {result['deleted']} 个")
-
-            await asyncio.sleep(random.uniform(1, 2))
-
-            # 清理 OneNote 页面
-            result = await self.delete_onenote_pages(5)
-            if result['success'] and result['deleted'] > 0:
-                results['onenote_pages_deleted'] = result['deleted']
-                print(f"  ✓ 删除 OneNote 页面: {result['deleted']} 个")
-
-            await asyncio.sleep(random.uniform(1, 2))
+        return results
 
-            # 清理文件
-            result = await self.delete_old_files(5)
-            if result['success'] and result['deleted'] > 0:
-                results['files_deleted'] = result['deleted']
-                print(f"  ✓ 删除文件: {result['deleted']} 个")
 
-        return results
+metrics = Metrics.for_job('e5_workspace_activity')
 
 
+@metrics.track
 async def main():
     """主函数"""
     try:
@@ -1096,7 +1153,17 @@ async def main():
             print(f"  失败: {results['failed']} 次")
         print("=" * 60)
 
+        for activity, count in results.items():
+            if activity != 'failed':
+                metrics.gauge('e5_workspace_activity_last_run', count, '最近一次运行各项活动的次数', activity=activity)
+                metrics.counter('e5_workspace_activity_total', count, '各项活动累计次数', activity=activity)
+        metrics.gauge('e5_workspace_activity_failures_last_run', results['failed'], '最近一次运行失败的活动数')
+        metrics.counter('e5_workspace_activity_failures_total', results['failed'], '累计失败的活动数')
+
+        manager.profiler.write()
+
     except Exception as e:
+        metrics.fail()
         print(f"\n✗ 脚本执行出错: {e}")
         traceback.print_exc(file=sys.stdout)
 
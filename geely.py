@@ -3,17 +3,59 @@ name: 吉利自动签到脚本
 cron: 0 8 * * *
 '''
 import os
+import sys
 from utils.geely.geely_panda_utils import GeelyUser
+from utils.geely.credential_chain import GeelyCredentialChain
+from utils.geely.vehicle_store import VehicleTelemetryStore
+from utils.metrics_exporter import Metrics
 
-if __name__ == '__main__':
+metrics = Metrics.for_job('geely')
+
+
+def query_status(chain, vehicle_id):
+    """通过凭证链查询车辆状态并记录遥测历史，缓存的车控 accessToken 在服务端失效时重新获取一次"""
+    store = VehicleTelemetryStore()
+    try:
+        for attempt in range(2):
+            vehicle = chain.vehicle_control(vehicle_id, telemetry_store=store)
+            if vehicle.authorization and vehicle.get_vehicle_detailed_status() is not None:
+                return True
+            if attempt == 0:
+                chain.invalidate('authorization')
+        return False
+    finally:
+        store.close()
+
+
+@metrics.track
+def main():
     # 获取环境变量
     user_cookie = os.environ.get("jlyh")
-    
+
     if not user_cookie:
         print("未找到CK，请检查环境变量设置")
-        exit(1)
-    
-    # 创建用户实例并执行签到
+        metrics.fail()
+        return False
+
+    # 创建用户实例并执行签到，token 和轮换后的 refreshToken 由凭证链缓存
     user = GeelyUser(user_cookie)
-    user.do_sign()
-    
\ No newline at end of file
+    chain = GeelyCredentialChain(user)
+    signed = user.do_sign(chain.get_token)
+    metrics.gauge('geely_sign_success', 1 if signed else 0, '最近一次签到是否成功')
+    metrics.gauge('geely_points', user.points, '剩余积分')
+    if not signed:
+        metrics.fail()
+
+    # 配置了车辆 ID（jlyh_vin）时顺带查询车辆状态
+    vehicle_id = os.environ.get("jlyh_vin")
+    if vehicle_id:
+        status_ok = query_status(chain, vehicle_id)
+        metrics.gauge('geely_status_success', 1 if status_ok else 0, '最近一次车辆状态查询是否成功')
+        if not status_ok:
+            metrics.fail()
+    return True
+
+
+if __name__ == '__main__':
+    if not main():
+        sys.exit(1)
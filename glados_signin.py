@@ -3,21 +3,106 @@ name: glados签到
 cron: 30 8 * * *
 '''
 import os
-import requests
+import sys
 import json
-# glados_token=os.environ.get("glados_token","")
-glados_cookies=os.environ.get("glados_cookies","")
-# 把字符串转数组 "["",""]"
-cookies_list=json.loads(glados_cookies)
-for cookie in cookies_list:
-    requests.post("https://glados.cloud/api/user/checkin",json={"token":"glados.cloud"},headers={
-        # "Authorization" : glados_token,
-        "Cookie" : glados_cookies,
-        "User-Agent" : "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
-    })
-    result=requests.get("https://glados.cloud/api/user/status",headers={
-        "Cookie" : glados_cookies,
-        "User-Agent" : "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
-    }).json()
-    print(f"{result['email']}签到成功！")
-    
\ No newline at end of file
+import traceback
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from utils.notify_utils import BarkNotify
+
+
+class GladosAccount:
+    '''
+        单个账号签到，每个账号独立会话（独立 cookie 与连接池）
+    '''
+    API = "https://glados.cloud/api/user"
+    USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
+
+    def __init__(self, cookie):
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Cookie": cookie,
+            "User-Agent": self.USER_AGENT,
+        })
+
+    @staticmethod
+    def _parse_checkin(result):
+        """
+        解析签到结果
+        code 0 为签到成功，1 为今日已签到，其他为失败
+        """
+        points = result.get('points')
+        balance = None
+        records = result.get('list') or []
+        if records:
+            # 列表第一条是最新的积分变动
+            balance = records[0].get('balance')
+        return {
+            'success': result.get('code') in (0, 1),
+            'message': result.get('message', ''),
+            'points': points,
+            'balance': balance,
+        }
+
+    def run(self):
+        """签到并查询账号状态"""
+        report = {'email': None, 'left_days': None, 'success': False, 'message': '', 'points': None, 'balance': None}
+        try:
+            checkin = self.session.post(f"{self.API}/checkin", json={"token": "glados.cloud"}, timeout=30).json()
+            report.update(self._parse_checkin(checkin))
+            status = self.session.get(f"{self.API}/status", timeout=30).json()
+            data = status.get('data') or status
+            report['email'] = data.get('email')
+            if data.get('leftDays') is not None:
+                report['left_days'] = int(float(data['leftDays']))
+        except Exception as e:
+            report['success'] = False
+            report['message'] = f"请求失败: {e}"
+        finally:
+            self.session.close()
+        return report
+
+
+def format_report(reports):
+    """汇总所有账号的签到结果"""
+    lines = []
+    for i, report in enumerate(reports, 1):
+        name = report['email'] or f"账号{i}"
+        if not report['success']:
+            lines.append(f"❌ {name}：{report['message']}")
+            continue
+        detail = [report['message']]
+        if report['points'] is not None:
+            detail.append(f"获得 {report['points']} 积分")
+        if report['balance'] is not None:
+            detail.append(f"当前积分 {int(float(report['balance']))}")
+        if report['left_days'] is not None:
+            detail.append(f"剩余 {report['left_days']} 天")
+        lines.append(f"✅ {name}：{'，'.join(d for d in detail if d)}")
+    return '\n'.join(lines)
+
+
+def main():
+    # 多个账号的 cookie，格式为 JSON 数组 ["cookie1","cookie2"]
+    cookies_list = json.loads(os.environ.get("glados_cookies", "[]"))
+    if not cookies_list:
+        print("未配置 glados_cookies")
+        return
+    concurrency = max(1, int(os.environ.get("glados_concurrency", "4")))
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(cookies_list))) as executor:
+        reports = list(executor.map(lambda cookie: GladosAccount(cookie).run(), cookies_list))
+
+    summary = format_report(reports)
+    print(summary)
+    failed = sum(1 for report in reports if not report['success'])
+    title = f"GLaDOS签到：{len(reports) - failed}/{len(reports)} 成功"
+    BarkNotify.send_notify(title, summary, group='glados',
+                           level=BarkNotify.Level.ACTIVE if failed else BarkNotify.Level.PASSIVE)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print("脚本执行出错:", e)
+        traceback.print_exc(file=sys.stdout)
@@ -5,37 +5,235 @@ cron: 0 8-21 * * *
 
 from utils.ql_utils import QLUtils
 import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
 from  utils.notify_utils import BarkNotify
+from utils.state_store import StateStore
+from utils.watcher import Watch, handled_by_runner
 import traceback,sys
 import json
-def miit_monitor(model): 
-    url=f'https://jwxk.miit.gov.cn/dev-api-20/internetService/CertificateQuery?equipmentModel={model}&sort=desc&pageNo=1&pageSize=10&isphoto=1&licenseNo=&equipmentCategory=&applyOrg=&manufacturingEnterpriseCname=&equipmentName=&startDate=&endDate='
-    headers={
-        "user-agent":"Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SeenLicenses:
+    '''
+    已通知过的证书记录，按型号保存 licenseNo|acceptId
+    '''
+    def __init__(self, file_path='/ql/data/miit_seen.json'):
+        self.store = StateStore(file_path, default=dict)
+        self.data = self.read()
+
+    def read(self):
+        return {model: set(keys) for model, keys in (self.store.load() or {}).items()}
+
+    def write(self):
+        # 加锁后合并其他进程写入的记录，避免定时任务重叠时互相覆盖
+        with self.store.lock():
+            for model, keys in (self.store.load() or {}).items():
+                self.data.setdefault(model, set()).update(keys)
+            self.store.save({model: sorted(keys) for model, keys in self.data.items()})
+
+    @staticmethod
+    def key(record):
+        return f"{record.get('licenseNo')}|{record.get('acceptId')}"
+
+    def contains(self, model, record):
+        return self.key(record) in self.data.get(model, set())
+
+    def add(self, model, record):
+        self.data.setdefault(model, set()).add(self.key(record))
+
+
+class MiitWatcher:
+    '''
+    多型号并发监测，只对新出现的证书推送
+    '''
+    API = 'https://jwxk.miit.gov.cn/dev-api-20/internetService/CertificateQuery'
+    PAGE_SIZE = 10
+    # 有记录时最多翻页数（首次运行没有记录时只查第一页）
+    MAX_PAGES = 10
+    HEADERS = {
+        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+    }
+
+    def __init__(self, models, seen: SeenLicenses, max_workers=4):
+        self.models = models
+        self.seen = seen
+        self.max_workers = max(1, min(max_workers, len(models)))
+        # 所有型号共用一个连接池
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers))
+
+    @staticmethod
+    def query_params(model, page_no):
+        return {
+            'equipmentModel': model, 'sort': 'desc', 'pageNo': page_no, 'pageSize': MiitWatcher.PAGE_SIZE,
+            'isphoto': 1, 'licenseNo': '', 'equipmentCategory': '', 'applyOrg': '',
+            'manufacturingEnterpriseCname': '', 'equipmentName': '', 'startDate': '', 'endDate': '',
         }
-    result=requests.get(url,headers=headers).text
-    result= json.loads(result.strip())
-    if result.get('code') == 200:
-        print(f'{model}入网证书信息如下：')
-        for i in result.get('data').get('records'):
-            licenseNo = i.get('licenseNo')
-            acceptId = i.get('acceptId')
-            print(f'设备{model}已获取入网证书：{licenseNo},批准编号为：{acceptId}')
-            BarkNotify.send_notify(f'{model}已获取入网证书',f'设备{model}已获取入网证书：{licenseNo},批准编号为：{acceptId}',level=BarkNotify.Level.CRITICAL,group='miit_monitor',url=f'https://jwxk.miit.gov.cn/showPhotos?lic={licenseNo}&acceptId={acceptId}')
+
+    @staticmethod
+    def parse_records(model, text):
+        result = json.loads(text.strip())
+        if result.get('code') != 200:
+            raise RuntimeError(f"{model} 查询失败: {result.get('msg')}")
+        return (result.get('data') or {}).get('records') or []
+
+    def query_page(self, model, page_no):
+        """查询一页证书记录（按时间倒序）"""
+        response = self.session.get(self.API, params=self.query_params(model, page_no), timeout=30)
+        return self.parse_records(model, response.text)
+
+    def fetch_new(self, model):
+        """翻页获取新证书，遇到已通知过的记录即停止；该型号还没有记录时只取第一页"""
+        new_records = []
+        max_pages = self.MAX_PAGES if self.seen.data.get(model) else 1
+        for page_no in range(1, max_pages + 1):
+            records = self.query_page(model, page_no)
+            for record in records:
+                if self.seen.contains(model, record):
+                    return new_records
+                new_records.append(record)
+            if len(records) < self.PAGE_SIZE:
+                break
+        return new_records
+
+    @staticmethod
+    def notify(model, record):
+        licenseNo = record.get('licenseNo')
+        acceptId = record.get('acceptId')
+        print(f'设备{model}已获取入网证书：{licenseNo},批准编号为：{acceptId}')
+        BarkNotify.send_notify(f'{model}已获取入网证书',f'设备{model}已获取入网证书：{licenseNo},批准编号为：{acceptId}',level=BarkNotify.Level.CRITICAL,group='miit_monitor',url=f'https://jwxk.miit.gov.cn/showPhotos?lic={licenseNo}&acceptId={acceptId}')
+
+    @staticmethod
+    def notify_summary(model, records):
+        """首次查到证书时只推送一条汇总（records 按时间倒序）"""
+        if len(records) == 1:
+            return MiitWatcher.notify(model, records[0])
+        licenseNo = records[0].get('licenseNo')
+        acceptId = records[0].get('acceptId')
+        print(f'设备{model}已获取入网证书{len(records)}条，最新：{licenseNo},批准编号为：{acceptId}')
+        BarkNotify.send_notify(f'{model}已获取入网证书',f'设备{model}已获取入网证书{len(records)}条，最新：{licenseNo},批准编号为：{acceptId}',level=BarkNotify.Level.CRITICAL,group='miit_monitor',url=f'https://jwxk.miit.gov.cn/showPhotos?lic={licenseNo}&acceptId={acceptId}')
+
+    def check(self, model):
+        try:
+            return model, self.fetch_new(model)
+        except Exception as e:
+            print(f"{model} 查询出错: {e}")
+            return model, []
+
+    def run(self):
+        """并发检查所有型号，返回是否所有型号都已有证书"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self.check, self.models))
+
+        for model, new_records in results:
+            if not new_records:
+                continue
+            print(f'{model}新增入网证书{len(new_records)}条：')
+            if not self.seen.data.get(model):
+                # 首次运行没有记录：当前证书全部记为已通知，只推送一条汇总
+                self.notify_summary(model, new_records)
+            else:
+                # 按时间正序推送
+                for record in reversed(new_records):
+                    self.notify(model, record)
+            for record in new_records:
+                self.seen.add(model, record)
+        self.seen.write()
+
+        return all(self.seen.data.get(model) for model in self.models)
+
+
+def parse_models(value=None):
+    # 多个型号用逗号分隔
+    value = os.environ.get("miit_model") if value is None else value
+    return [m for m in re.split(r'[,，&\s]+', value or '') if m]
+
+
+def build_watches(models=None, seen=None):
+    """
+    统一监测引擎使用的监测项：每个型号翻页查询证书直到遇到已记录的证书，出现新证书即推送，
+    取得证书后停用该型号；首次执行时从 miit_seen.json 接续已通知过的证书，
+    都没有记录时只查第一页并推送一条汇总
+    """
+    seen = seen or SeenLicenses()
+
+    def record(key):
+        license_no, _, accept_id = key.partition('|')
+        return {'licenseNo': license_no, 'acceptId': accept_id}
+
+    def seed(model):
+        keys = seen.data.get(model)
+        return {'value': {key: record(key) for key in sorted(keys)}} if keys else None
+
+    async def fetch(client, old, model):
+        """翻页获取新证书（与 MiitWatcher.fetch_new 相同），返回新证书在前、已记录证书在后的 {键: 证书}"""
+        old = old or {}
+        new = {}
+        for page_no in range(1, (MiitWatcher.MAX_PAGES if old else 1) + 1):
+            response = await client.get(MiitWatcher.API, params=MiitWatcher.query_params(model, page_no),
+                                        headers=MiitWatcher.HEADERS)
+            records = MiitWatcher.parse_records(model, response.text)
+            for r in records:
+                key = SeenLicenses.key(r)
+                if key in old:
+                    return {**new, **old}
+                new[key] = {'licenseNo': r.get('licenseNo'), 'acceptId': r.get('acceptId')}
+            if len(records) < MiitWatcher.PAGE_SIZE:
+                break
+        return {**new, **old}
+
+    def compare(old, new):
+        if not old:
+            # 没有记录时只推送一条汇总（变化为证书列表）
+            return [list(new.values())] if new else []
+        # 按时间正序推送新出现的证书
+        return [r for k, r in reversed(list(new.items())) if k not in old]
+
+    def notify(model, change):
+        if isinstance(change, list):
+            MiitWatcher.notify_summary(model, change)
+        else:
+            MiitWatcher.notify(model, change)
+
+    watches = []
+    for model in parse_models() if models is None else models:
+        watches.append(Watch(
+            name=f'miit:{model}',
+            fetch=functools.partial(fetch, model=model),
+            compare=compare,
+            notify=lambda change, model=model: notify(model, change),
+            disable_when=bool,
+            interval=3600,
+            seed=lambda model=model: seed(model),
+        ))
+    return watches
+
+
+def miit_monitor(models):
+    watcher = MiitWatcher(models, SeenLicenses())
+    # 所有型号都已取得证书后不再需要监测
+    if watcher.run():
+        QLUtils.disable_self()
+
+def main():
+    # 部署有前缀的话，需要适配
+    QLUtils.init_from_env()
+    if handled_by_runner('miit_monitor'):
+        return
+    models = parse_models()
+    if not models:
         QLUtils.disable_self()
+    else:
+        miit_monitor(models)
 
 if __name__ == '__main__':
     try:
-        miit_model=os.environ.get("miit_model")
-        # 部署有前缀的话，需要适配 
-        if os.environ.get("QlBaseUrl") is not None:
-            QLUtils.set_config(host=f'http://127.0.0.1:5700{os.environ.get("QlBaseUrl")}/open')
-        if miit_model is None:
-            QLUtils.disable_self()
-        else:
-            miit_monitor(miit_model)
-    
+        main()
     except Exception as e:
         print("脚本执行出错:", e)
-        traceback.print_exc(file=sys.stdout)
\ No newline at end of file
+        traceback.print_exc(file=sys.stdout)
@@ -0,0 +1,183 @@
+'''
+name: 常驻调度
+cron: */30 * * * *
+'''
+# 常驻进程：按各脚本文档字符串中的 cron 配置，在进程内定时执行脚本的 main()
+# 脚本只导入一次，重量级依赖、连接池和凭证缓存在多次执行之间复用
+# 启用后需在面板中禁用被接管脚本自身的定时任务；本任务的定时只起看门狗作用，已在运行时直接退出
+# 设置 METRICS_PORT 时在该端口提供 /metrics（Prometheus 文本格式）
+import os
+import re
+import sys
+import time
+import signal
+import asyncio
+import inspect
+import importlib
+import traceback
+from datetime import datetime
+from utils.cron_utils import CronExpression, parse_script_header
+from utils.ql_utils import QLUtils
+from utils.metrics_exporter import Metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 默认接管的高频脚本，可通过环境变量 ql_daemon_scripts 覆盖（逗号分隔，不带 .py）
+DEFAULT_SCRIPTS = ['e5_storage_sync', 'apple_monitor2', 'AxCNH_monitor']
+LOCK_PATH = '/ql/data/ql_daemon.lock'
+
+
+class Job:
+    '''
+        一个被调度的脚本
+    '''
+    def __init__(self, module_name):
+        header = parse_script_header(os.path.join(SCRIPT_DIR, f'{module_name}.py'))
+        if 'cron' not in header:
+            raise ValueError(f"{module_name} 没有 cron 配置")
+        self.name = header.get('name', module_name)
+        self.script = f'{module_name}.py'
+        self.cron = CronExpression(header['cron'])
+        module = importlib.import_module(module_name)
+        if not hasattr(module, 'main'):
+            raise ValueError(f"{module_name} 没有 main 函数")
+        self.main = module.main
+        self.task = None
+
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def run(self):
+        start = time.monotonic()
+        print(f"▶️ 开始执行 {self.name}")
+        try:
+            if inspect.iscoroutinefunction(self.main):
+                await self.main()
+            else:
+                await asyncio.to_thread(self.main)
+        except asyncio.CancelledError:
+            print(f"⏹️ {self.name} 已取消")
+            raise
+        except Exception as e:
+            print(f"❌ {self.name} 执行出错: {e}")
+            traceback.print_exc(file=sys.stdout)
+        finally:
+            print(f"✅ {self.name} 结束，用时 {time.monotonic() - start:.2f}s")
+
+
+class Daemon:
+    '''
+        调度循环：每到某个任务的触发分钟就启动它，上一次还没结束时跳过本次
+    '''
+    def __init__(self, jobs, grace=60):
+        self.jobs = list(jobs)
+        self.grace = grace
+        self.stop_event = None
+        self.loop = None
+
+    def drop(self, script_name):
+        """脚本调用 QLUtils.disable_self() 时移除对应任务（可能在工作线程中调用）"""
+        self.loop.call_soon_threadsafe(self._drop, script_name)
+
+    def _drop(self, script_name):
+        for job in [j for j in self.jobs if j.script == script_name]:
+            print(f"🛑 {job.name} 已请求禁用，不再调度")
+            self.jobs.remove(job)
+
+    async def _sleep_until(self, when):
+        timeout = (when - datetime.now()).total_seconds()
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self.loop.add_signal_handler(sig, self.stop_event.set)
+            except NotImplementedError:
+                pass
+        QLUtils.add_disable_hook(self.drop)
+
+        tasks = set()
+        while not self.stop_event.is_set() and self.jobs:
+            tick = min(job.cron.next_after(datetime.now()) for job in self.jobs)
+            await self._sleep_until(tick)
+            if self.stop_event.is_set():
+                break
+            for job in list(self.jobs):
+                if not job.cron.matches(tick):
+                    continue
+                if job.running():
+                    print(f"⏭️ {job.name} 上一次尚未结束，跳过")
+                    continue
+                job.task = asyncio.create_task(job.run())
+                tasks.add(job.task)
+                job.task.add_done_callback(tasks.discard)
+        await self.shutdown(tasks)
+
+    async def shutdown(self, tasks):
+        """等待执行中的任务结束，超时后取消"""
+        if not tasks:
+            return
+        print(f"等待 {len(tasks)} 个任务结束（最多 {self.grace}s）")
+        done, pending = await asyncio.wait(tasks, timeout=self.grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def acquire_single_instance():
+    """单实例锁，返回锁文件对象；已有实例在运行时返回 None"""
+    if fcntl is None:
+        return open(os.devnull)
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+    lock_file = open(LOCK_PATH, 'a')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+async def main():
+    lock_file = acquire_single_instance()
+    if lock_file is None:
+        print("常驻调度已在运行")
+        return
+    try:
+        QLUtils.init_from_env()
+        if os.environ.get('METRICS_PORT'):
+            # 各脚本 main 记录的指标在此端口的 /metrics 提供
+            Metrics.serve(int(os.environ['METRICS_PORT']))
+        names = [n.removesuffix('.py') for n in re.split(r'[,，\s]+', os.environ.get('ql_daemon_scripts', '')) if n] or DEFAULT_SCRIPTS
+        jobs = []
+        for name in names:
+            try:
+                job = Job(name)
+            except Exception as e:
+                print(f"加载 {name} 失败: {e}")
+                continue
+            print(f"已加载 {job.name}（{job.cron.expr}）")
+            jobs.append(job)
+        await Daemon(jobs, grace=int(os.environ.get('ql_daemon_grace', '60'))).run()
+        print("常驻调度已退出")
+    finally:
+        lock_file.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print("脚本执行出错:", e)
+        traceback.print_exc(file=sys.stdout)
@@ -0,0 +1,29 @@
+import pytest
+from benchmarks.fake_graph_server import FakeGraphServer, FakeTenant
+from benchmarks.e5_bench import patched
+
+
+@pytest.fixture
+def graph_server():
+    """本地 Graph 模拟服务（每个测试一个小租户）"""
+    server = FakeGraphServer(tenant=FakeTenant(users=4))
+    server.start_in_thread()
+    try:
+        yield server
+    finally:
+        server.stop_thread()
+
+
+@pytest.fixture
+def e5_env(monkeypatch):
+    for name, value in {'E5_TENANT_ID': 'fake-tenant', 'E5_CLIENT_ID': 'fake-client',
+                        'E5_CLIENT_SECRET': 'fake-secret', 'E5_KEEPER_USERNAME': 'keeper@contoso.onmicrosoft.com',
+                        'E5_KEEPER_PASSWORD': 'fake-password'}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('NOTIFY_API', raising=False)
+
+
+@pytest.fixture
+def graph_patched(graph_server):
+    """返回上下文管理器：脚本模块的凭证和共享 Graph 客户端的传输层指向模拟服务"""
+    return lambda module, pacing=True: patched(module, graph_server.url, pacing)
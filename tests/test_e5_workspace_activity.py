@@ -0,0 +1,48 @@
+import random
+import asyncio
+import e5_workspace_activity
+from benchmarks.e5_bench import NoPacingAsyncio
+
+
+class RecordingAsyncio(NoPacingAsyncio):
+    '''
+        记录 asyncio.sleep 的等待时长，不真正等待
+    '''
+    def __init__(self):
+        self.delays = []
+
+    async def sleep(self, delay, result=None):
+        self.delays.append(delay)
+        return result
+
+
+def test_activities_pause_between_steps_when_pacing_enabled(monkeypatch, e5_env, graph_patched):
+    monkeypatch.setenv('E5_ACTIVITY_PACING', '1')
+    recorder = RecordingAsyncio()
+    monkeypatch.setattr(e5_workspace_activity, 'asyncio', recorder)
+    random.seed(3)
+
+    async def run():
+        manager = e5_workspace_activity.WorkspaceActivityManager(e5_workspace_activity.E5Config())
+        assert manager.pacing
+        return await manager.perform_random_activities()
+
+    with graph_patched(e5_workspace_activity):
+        results = asyncio.run(run())
+
+    assert results['failed'] == 0
+    pauses = [d for d in recorder.delays if d != 2]  # 去掉创建资源后固定的 2 秒等待
+    assert pauses and all(1 <= d <= 2 for d in pauses)
+
+
+def test_search_content_sends_one_server_side_search(monkeypatch, e5_env, graph_server, graph_patched):
+    async def run():
+        manager = e5_workspace_activity.WorkspaceActivityManager(e5_workspace_activity.E5Config())
+        return await manager.search_content(['report', 'meeting'])
+
+    with graph_patched(e5_workspace_activity, pacing=False):
+        before = graph_server.stats['http_requests']
+        result = asyncio.run(run())
+    assert result['success'], result
+    assert graph_server.stats['http_requests'] - before == 1
+    assert set(result['counts']) == {'report', 'meeting'}
@@ -0,0 +1,62 @@
+from utils.geely.geely_panda_utils import GeelyUser
+from utils.geely.credential_chain import GeelyCredentialChain
+
+
+class RotatingServer:
+    '''
+        模拟刷新接口：每次刷新返回新 token，并把 refreshToken 轮换为新值（旧值作废）
+    '''
+    def __init__(self, refresh_token):
+        self.valid = {refresh_token}
+        self.count = 0
+
+    def api_request(self, method, url, headers, data=None):
+        refresh_token = url.split('refreshToken=')[1]
+        if refresh_token not in self.valid:
+            return {'code': 'fail', 'message': 'refreshToken 已失效'}
+        self.count += 1
+        self.valid = {f'rt-{self.count}'}
+        return {'code': 'success', 'message': '刷新成功', 'data': {'centerTokenDto': {
+            'token': f'token-{self.count}', 'refreshToken': f'rt-{self.count}', 'expiresIn': 1}}}
+
+
+def new_user(server, credential='rt-0&SN0001'):
+    user = GeelyUser(credential)
+    user.api_request = server.api_request
+    return user
+
+
+def test_rotated_refresh_token_is_saved_under_stable_key(tmp_path):
+    path = str(tmp_path / 'credentials.json')
+    server = RotatingServer('rt-0')
+    chain = GeelyCredentialChain(new_user(server), file_path=path)
+    assert chain.get_token() == 'token-1'
+
+    # 下一次运行：环境变量中仍是旧的 rt-0，缓存的 token 已过期（expiresIn=1）
+    user = new_user(server)
+    chain = GeelyCredentialChain(user, file_path=path)
+    assert user.refresh_token == 'rt-1'
+    assert chain.get_token() == 'token-2'
+    assert GeelyCredentialChain(new_user(server), file_path=path).refresh_token == 'rt-2'
+
+
+def test_falls_back_to_configured_refresh_token(tmp_path):
+    path = str(tmp_path / 'credentials.json')
+    server = RotatingServer('rt-0')
+    GeelyCredentialChain(new_user(server), file_path=path).get_token()
+
+    # 用户重新登录后在环境变量中配置了新的 refreshToken，保存的 rt-1 已失效
+    server.valid = {'rt-new'}
+    user = new_user(server, 'rt-new&SN0001')
+    chain = GeelyCredentialChain(user, file_path=path)
+    assert chain.get_token() == 'token-2'
+    assert chain.refresh_token == 'rt-2'
+
+
+def test_accounts_are_kept_apart(tmp_path):
+    path = str(tmp_path / 'credentials.json')
+    first, second = RotatingServer('rt-0'), RotatingServer('rt-0')
+    GeelyCredentialChain(new_user(first, 'rt-0&SN0001'), file_path=path).get_token()
+    GeelyCredentialChain(new_user(second, 'rt-0&SN0002'), file_path=path).get_token()
+    assert GeelyCredentialChain(new_user(first, 'rt-0&SN0001'), file_path=path).refresh_token == 'rt-1'
+    assert len(GeelyCredentialChain(new_user(first), file_path=path).store.load()) == 2
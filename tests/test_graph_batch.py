@@ -0,0 +1,46 @@
+import json
+import asyncio
+import httpx
+from utils.graph_batch import GraphBatch
+from utils.graph_throttle import GraphThrottle
+
+
+class FakeAdapter:
+    '''
+        代替 GraphRequestAdapter：按 reply(子请求列表) 的返回构造 $batch 回复
+    '''
+    def __init__(self, reply):
+        self.reply = reply
+        self.envelopes = []
+
+    async def send_primitive_async(self, request_info, response_type, error_map):
+        requests = json.loads(request_info.content)['requests']
+        self.envelopes.append(requests)
+        return json.dumps({'responses': self.reply(requests)}).encode('utf-8')
+
+
+class FakeClient:
+    def __init__(self, reply):
+        self.request_adapter = FakeAdapter(reply)
+
+
+def test_missing_sub_responses_count_as_failures(capsys):
+    paths = [GraphBatch.path('me', 'messages', f'm{i}') for i in range(5)]
+    # 回复里缺少 id 1 和 3
+    client = FakeClient(lambda requests: [{'id': r['id'], 'status': 204} for r in requests if r['id'] not in ('1', '3')])
+    deleted = asyncio.run(GraphBatch(client).delete(paths))
+    assert deleted == {paths[0], paths[2], paths[4]}
+    output = capsys.readouterr().out
+    assert f'删除失败 {paths[1]}: 0' in output and f'删除失败 {paths[3]}: 0' in output
+
+
+def test_send_returns_placeholder_for_missing_ids():
+    client = FakeClient(lambda requests: [])
+    responses = asyncio.run(GraphBatch(client).send([{'method': 'GET', 'url': '/me'}]))
+    assert responses == [{'status': 0, 'body': None}]
+    assert len(client.request_adapter.envelopes) == 1
+
+
+def test_batch_envelope_has_its_own_throttle_scope():
+    assert GraphThrottle.scope(httpx.URL('https://graph.microsoft.com/v1.0/$batch')) == ('batch', 'batch')
+    assert GraphThrottle.scope(httpx.URL('https://graph.microsoft.com/v1.0/me/messages')) == ('outlook', 'outlook:me')
@@ -0,0 +1,139 @@
+import gzip
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import httpx
+import pytest
+from benchmarks.e5_bench import FakeCredential, RewriteTransport
+from utils.graph_client import GraphClients
+from utils.http_metrics import HttpMetrics, InstrumentedSession
+
+
+def test_endpoint_name_strips_ids_and_query():
+    name = HttpMetrics.endpoint_name('get', 'https://graph.microsoft.com/v1.0/users/a@b.com/messages/AAMkAGI2TG93AAAx1234?$top=5')
+    assert name == 'GET /v1.0/users/{id}/messages/{id}'
+
+
+def test_endpoint_name_maps_sdk_me_placeholder():
+    assert HttpMetrics.endpoint_name('GET', 'https://graph.microsoft.com/v1.0/users/me-token-to-replace') == 'GET /v1.0/me'
+    assert HttpMetrics.endpoint_name('POST', 'https://graph.microsoft.com/v1.0/users/me-token-to-replace/events') \
+        == 'POST /v1.0/me/events'
+
+
+def test_graph_requests_recorded_under_me(monkeypatch, graph_server):
+    monkeypatch.setattr(HttpMetrics, 'enabled', True)
+    transport = GraphClients.__dict__['transport']
+    monkeypatch.setattr(GraphClients, 'transport',
+                        classmethod(lambda cls: RewriteTransport(graph_server.url, transport.__func__(cls))))
+    HttpMetrics.reset()
+
+    async def run():
+        client = GraphClients.create(FakeCredential())
+        await client.me.messages.get()
+
+    try:
+        asyncio.run(run())
+        endpoints = HttpMetrics.summary()['hosts']['graph.microsoft.com']['endpoints']
+    finally:
+        HttpMetrics.reset()
+    assert list(endpoints) == ['GET /v1.0/me/messages']
+    assert endpoints['GET /v1.0/me/messages']['status'] == {'200': 1}
+
+
+def metered_client(monkeypatch, handler, client_cls=httpx.Client):
+    monkeypatch.setattr(HttpMetrics, 'enabled', True)
+    HttpMetrics.reset()
+    return HttpMetrics.instrument_httpx(client_cls(transport=httpx.MockTransport(handler)))
+
+
+def endpoint_stats(name):
+    return HttpMetrics.summary()['hosts']['api.example.com']['endpoints'][name]
+
+
+def test_httpx_transport_errors_are_counted(monkeypatch):
+    def handler(request):
+        raise httpx.ConnectError('refused', request=request)
+
+    client = metered_client(monkeypatch, handler)
+    try:
+        with pytest.raises(httpx.ConnectError):
+            client.post('https://api.example.com/items', content=b'abc')
+        stats = endpoint_stats('POST /items')
+    finally:
+        HttpMetrics.reset()
+    assert stats['count'] == 1
+    assert stats['errors'] == {'ConnectError': 1}
+    assert stats['status'] == {}
+
+
+def test_httpx_bytes_counted_from_streams(monkeypatch):
+    body = gzip.compress(b'x' * 10000)
+
+    def handler(request):
+        request.read()
+        # 分块传输：没有 Content-Length
+        return httpx.Response(200, headers={'Content-Encoding': 'gzip'}, content=iter([body[:100], body[100:]]))
+
+    client = metered_client(monkeypatch, handler)
+    try:
+        response = client.post('https://api.example.com/items', content=iter([b'ab', b'cde']))
+        stats = endpoint_stats('POST /items')
+    finally:
+        HttpMetrics.reset()
+    assert response.content == b'x' * 10000
+    assert 'Content-Length' not in response.headers
+    assert stats['status'] == {'200': 1}
+    assert stats['bytes_in'] == len(body)
+    assert stats['bytes_out'] == 5
+
+
+def test_async_httpx_client_is_metered(monkeypatch):
+    async def handler(request):
+        return httpx.Response(204)
+
+    async def run():
+        async with metered_client(monkeypatch, handler, httpx.AsyncClient) as client:
+            await client.get('https://api.example.com/items/123')
+
+    try:
+        asyncio.run(run())
+        stats = endpoint_stats('GET /items/{id}')
+    finally:
+        HttpMetrics.reset()
+    assert stats['status'] == {'204': 1}
+
+
+def test_requests_chunked_stream_counted_on_close(monkeypatch):
+    body = gzip.compress(b'z' * 10000)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(body), body))
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(HttpMetrics, 'enabled', True)
+    HttpMetrics.reset()
+    try:
+        session = InstrumentedSession()
+        with session.get(f'http://127.0.0.1:{server.server_port}/feed', stream=True) as response:
+            assert HttpMetrics.summary()['hosts']['127.0.0.1']['endpoints'] == {}
+            response.raw.decode_content = True
+            assert response.raw.read() == b'z' * 10000
+        stats = HttpMetrics.summary()['hosts']['127.0.0.1']['endpoints']['GET /feed']
+    finally:
+        HttpMetrics.reset()
+        server.shutdown()
+        server.server_close()
+    assert stats['count'] == 1
+    assert stats['bytes_in'] == len(body)
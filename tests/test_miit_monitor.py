@@ -0,0 +1,47 @@
+import miit_monitor
+from miit_monitor import MiitWatcher, SeenLicenses
+from tests.test_watcher import miit_records, run_engine
+import httpx
+
+
+def full_pages(model, page_no):
+    return miit_records(*(f'p{page_no}-{i}' for i in range(MiitWatcher.PAGE_SIZE)))
+
+
+def test_first_run_marks_records_seen_with_one_push(monkeypatch, tmp_path):
+    pushes, pages = [], []
+    monkeypatch.setattr(miit_monitor.BarkNotify, 'send_notify', staticmethod(lambda title, body, **kwargs: pushes.append(body)))
+    watcher = MiitWatcher(['A'], SeenLicenses(str(tmp_path / 'miit_seen.json')))
+    monkeypatch.setattr(watcher, 'query_page', lambda model, page_no: pages.append(page_no) or full_pages(model, page_no))
+
+    assert watcher.run()
+    assert pages == [1]
+    assert len(pushes) == 1 and '10条' in pushes[0] and 'p1-0' in pushes[0]
+    assert len(SeenLicenses(str(tmp_path / 'miit_seen.json')).data['A']) == MiitWatcher.PAGE_SIZE
+
+
+def test_later_runs_push_each_new_record(monkeypatch, tmp_path):
+    pushes = []
+    monkeypatch.setattr(miit_monitor.BarkNotify, 'send_notify', staticmethod(lambda title, body, **kwargs: pushes.append(body)))
+    seen = SeenLicenses(str(tmp_path / 'miit_seen.json'))
+    seen.add('A', miit_records('old')[0])
+    watcher = MiitWatcher(['A'], seen)
+    monkeypatch.setattr(watcher, 'query_page', lambda model, page_no: miit_records('n2', 'n1', 'old'))
+
+    watcher.run()
+    assert [body.split('：')[1].split(',')[0] for body in pushes] == ['n1', 'n2']
+
+
+def test_first_watch_run_sends_one_summary(monkeypatch, tmp_path):
+    pushes, pages = [], []
+    monkeypatch.setattr(miit_monitor.BarkNotify, 'send_notify', staticmethod(lambda title, body, **kwargs: pushes.append(body)))
+
+    def handler(request):
+        page_no = int(request.url.params['pageNo'])
+        pages.append(page_no)
+        return httpx.Response(200, json={'code': 200, 'data': {'records': full_pages('A', page_no)}})
+
+    watches = miit_monitor.build_watches(['A'], seen=SeenLicenses(str(tmp_path / 'miit_seen.json')))
+    run_engine(watches, tmp_path / 'watch_state.json', handler)
+    assert pages == [1]
+    assert len(pushes) == 1 and '10条' in pushes[0]
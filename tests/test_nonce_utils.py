@@ -0,0 +1,29 @@
+import os
+import pytest
+from utils.geely.nonce_utils import NonceProvider
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 os.fork')
+def test_forked_child_does_not_reuse_parent_pool():
+    provider = NonceProvider()
+    # 先取一次，让父进程的池中留有未使用的随机数
+    provider.uuid4()
+    provider.vehicle_nonce(0)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write_fd, f'{provider.uuid4()} {provider.vehicle_nonce(0)}'.encode('ascii'))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        child = f.read().decode('ascii').split()
+    os.waitpid(pid, 0)
+    assert child != [provider.uuid4(), provider.vehicle_nonce(0)]
+    assert len(child) == 2
+
+
+def test_uuid4_format():
+    value = NonceProvider().uuid4()
+    assert len(value) == 36 and value[14] == '4' and value[19] in '89ab'
@@ -0,0 +1,55 @@
+import time
+import asyncio
+import httpx
+from benchmarks.e5_bench import FakeCredential, RewriteTransport
+from utils.graph_client import GraphClients
+from utils.graph_throttle import GraphThrottle
+from utils.profiler import Profiler
+
+
+def graph_client(monkeypatch, server):
+    transport = GraphClients.__dict__['transport']
+    monkeypatch.setattr(GraphClients, 'transport',
+                        classmethod(lambda cls: RewriteTransport(server.url, transport.__func__(cls))))
+    return GraphClients.create(FakeCredential())
+
+
+def throttle_of(client):
+    node = client.request_adapter._http_client._transport.pipeline._first_middleware
+    while not isinstance(node, GraphThrottle):
+        node = node.next
+    return node
+
+
+def test_http_time_excludes_throttle_wait(monkeypatch, graph_server, tmp_path):
+    profiler = Profiler(str(tmp_path / 'trace.json'))
+    wait = 0.3
+
+    async def run():
+        client = profiler.instrument_graph(graph_client(monkeypatch, graph_server))
+        throttle_of(client).bucket(httpx.URL('https://graph.microsoft.com/v1.0/me/messages')).pause(wait)
+        with profiler.span('list') as span:
+            start = time.perf_counter()
+            await client.me.messages.get()
+            return span, time.perf_counter() - start
+
+    span, elapsed = asyncio.run(run())
+    assert elapsed >= wait
+    assert span.requests == 1
+    assert span.http_ms < wait * 1000
+    http = [e for e in profiler.events if e['cat'] == 'http']
+    assert [e['name'] for e in http] == ['GET /v1.0/me/messages']
+    assert http[0]['args']['status'] == 200
+
+
+def test_instrument_graph_replaces_previous_profiler(monkeypatch, graph_server, tmp_path):
+    first, second = Profiler(str(tmp_path / 'a.json')), Profiler(str(tmp_path / 'b.json'))
+
+    async def run():
+        client = first.instrument_graph(graph_client(monkeypatch, graph_server))
+        second.instrument_graph(client)
+        await client.me.messages.get()
+
+    asyncio.run(run())
+    assert not [e for e in first.events if e['cat'] == 'http']
+    assert len([e for e in second.events if e['cat'] == 'http']) == 1
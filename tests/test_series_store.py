@@ -0,0 +1,73 @@
+import time
+import pytest
+from AxCNH_monitor import ConfluxScan
+from utils.series_store import SeriesStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SeriesStore(str(tmp_path / 'history.db'))
+    yield store
+    store.close()
+
+
+def test_append_keeps_exact_big_integers(store):
+    big = str(10 ** 30 + 1)
+    assert store.append('supply', big, ts=100)
+    assert store.append('supply', 42, ts=200)
+    assert store.append('supply', ' 7 ', ts=300)
+    assert store.range('supply') == [(100, 10 ** 30 + 1), (200, 42), (300, 7)]
+    assert store.latest('supply') == (300, 7)
+
+
+@pytest.mark.parametrize('value', ['1.5', 'Max rate limit reached', '', None, 1.5, True])
+def test_append_skips_non_integer_values(store, value, capsys):
+    assert store.append('supply', 10, ts=100)
+    assert not store.append('supply', value, ts=200)
+    assert store.range('supply') == [(100, 10)]
+    assert '跳过记录' in capsys.readouterr().out
+
+
+def test_delta_compares_with_value_before_window(store):
+    store.append('supply', 100, ts=1000)
+    store.append('supply', 150, ts=2000)
+    store.append('supply', 120, ts=5000)
+    # 5000 - 3500 = 1500 时刻的值是 ts=1000 的采样点
+    assert store.delta('supply', 3500) == {'old': 100, 'new': 120, 'change': 20, 'percent': 20.0}
+    assert store.delta('supply', 3000) == {'old': 150, 'new': 120, 'change': -30, 'percent': -20.0}
+    # 窗口之前没有数据
+    assert store.delta('supply', 5000) is None
+    assert store.delta('missing', 10) is None
+
+
+def test_delta_percent_is_none_when_old_is_zero(store):
+    store.append('balance', 0, ts=100)
+    store.append('balance', 5, ts=200)
+    assert store.delta('balance', 100)['percent'] is None
+
+
+def test_compact_keeps_change_points_and_recent_samples(store):
+    now = int(time.time())
+    old = now - 100 * 86400
+    for i, value in enumerate([1, 1, 1, 2, 2, 1]):
+        store.append('supply', value, ts=old + i * 3600)
+    store.append('supply', 1, ts=now - 60)
+    store.append('supply', 1, ts=now - 30)
+    store.append('other', 5, ts=old)
+    store.append('other', 5, ts=old + 1)
+    before = {ts: store.value_at('supply', ts) for ts in range(old, old + 6 * 3600, 1800)}
+
+    assert store.compact(older_than=30 * 86400, name='supply') == 3
+    assert store.range('supply') == [(old, 1), (old + 3 * 3600, 2), (old + 5 * 3600, 1), (now - 60, 1), (now - 30, 1)]
+    assert [store.value_at('supply', ts)[1] for ts in before] == [v[1] for v in before.values()]
+    # 未指定的序列不受影响
+    assert len(store.range('other')) == 2
+    assert store.compact(older_than=30 * 86400) == 1
+    assert store.range('other') == [(old, 5)]
+
+
+def test_scan_values_are_validated_before_history(capsys):
+    collected = ConfluxScan(rpc=None).scan_collected(
+        ['0xc'], ['0xa', '0xb'], {'0xc': '1000'}, {'0xc': {'0xa': 'Max rate limit reached', '0xb': None}})
+    assert collected == {'supply': {'0xc': '1000'}, 'balances': {'0xc': {'0xa': None, '0xb': None}}}
+    assert '按未查到处理' in capsys.readouterr().out
@@ -0,0 +1,25 @@
+import json
+import pytest
+from utils import state_store
+from utils.state_store import StateStore
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_non_string_keys_are_saved_like_json(monkeypatch, tmp_path, use_orjson):
+    if use_orjson and state_store.orjson is None:
+        pytest.skip('未安装 orjson')
+    if not use_orjson:
+        monkeypatch.setattr(state_store, 'orjson', None)
+    store = StateStore(str(tmp_path / 'state.json'), default=dict)
+    store.save({1: 'a', 'b': {2: [3]}})
+    assert StateStore(str(tmp_path / 'state.json')).load() == {'1': 'a', 'b': {'2': [3]}}
+    with open(tmp_path / 'state.json', encoding='utf-8') as f:
+        assert json.load(f) == {'version': 1, 'data': {'1': 'a', 'b': {'2': [3]}}}
+
+
+def test_transaction_keeps_other_keys(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'), default=dict)
+    store.save({'a': 1})
+    with store.transaction() as data:
+        data['b'] = 2
+    assert StateStore(str(tmp_path / 'state.json')).load() == {'a': 1, 'b': 2}
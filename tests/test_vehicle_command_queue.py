@@ -0,0 +1,13 @@
+import pytest
+from utils.geely.vehicle_command_queue import VehicleCommandQueue
+
+
+def test_parse_passes_temperature_to_air_only():
+    queue = VehicleCommandQueue.parse(None, 'unlock, ac:22, trunk')
+    assert queue.commands == [('open_door', {}), ('open_air', {'temperature': 22}), ('open_trunk', {})]
+
+
+@pytest.mark.parametrize('text', ['unlock:1', 'trunk:open', 'close_air:20', 'ac:', 'ac:warm', 'ac:22.5'])
+def test_parse_rejects_bad_arguments(text):
+    with pytest.raises(ValueError):
+        VehicleCommandQueue.parse(None, text)
@@ -0,0 +1,159 @@
+import json
+import asyncio
+import httpx
+import miit_monitor
+import apple_monitor1
+import AxCNH_monitor
+from utils.state_store import StateStore
+from AxCNH_monitor import DataFile
+from utils.series_store import SeriesStore
+from utils.watcher import WatchEngine, handled_by_runner
+
+
+def run_engine(watches, state_path, handler):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            async with WatchEngine(watches, state_path=str(state_path), client=client) as engine:
+                return await engine.run_once()
+    return asyncio.run(run())
+
+
+def miit_records(*keys):
+    return [{'licenseNo': key, 'acceptId': f'{key}-id'} for key in keys]
+
+
+def test_miit_watch_continues_from_seen_file_and_pages(monkeypatch, tmp_path):
+    seen = miit_monitor.SeenLicenses(str(tmp_path / 'miit_seen.json'))
+    seen.add('A', miit_records('old')[0])
+    seen.write()
+    # 第一页全是新证书，第二页遇到已通知过的证书即停止翻页
+    pages = {1: miit_records(*(f'n{i}' for i in range(10, 0, -1))), 2: miit_records('n0', 'old', 'older')}
+    requested, notified = [], []
+
+    def handler(request):
+        page_no = int(request.url.params['pageNo'])
+        requested.append(page_no)
+        return httpx.Response(200, json={'code': 200, 'data': {'records': pages.get(page_no, [])}})
+
+    monkeypatch.setattr(miit_monitor.MiitWatcher, 'notify', staticmethod(lambda model, record: notified.append(record['licenseNo'])))
+    watches = miit_monitor.build_watches(['A'], seen=miit_monitor.SeenLicenses(str(tmp_path / 'miit_seen.json')))
+    assert run_engine(watches, tmp_path / 'watch_state.json', handler) == 1
+    assert requested == [1, 2]
+    assert notified == [f'n{i}' for i in range(11)]
+    state = StateStore(str(tmp_path / 'watch_state.json')).load()
+    assert 'old|old-id' in state['miit:A']['value']
+    assert state['miit:A']['disabled']
+
+
+def test_apple_page_watch_continues_from_page_state(monkeypatch, tmp_path):
+    url = apple_monitor1.match_data[0]['url']
+    StateStore(str(tmp_path / 'page_watch_state.json')).save({url: {'etag': 'e1', 'last_modified': None, 'hash': 'h1'}})
+    seen_headers = {}
+
+    def handler(request):
+        seen_headers[str(request.url)] = request.headers.get('If-None-Match')
+        return httpx.Response(304)
+
+    watches = apple_monitor1.build_watches(str(tmp_path / 'page_watch_state.json'))
+    run_engine(watches, tmp_path / 'watch_state.json', handler)
+    assert seen_headers[url] == 'e1'
+    assert seen_headers[apple_monitor1.match_data[1]['url']] == apple_monitor1.match_data[1]['etag']
+    state = StateStore(str(tmp_path / 'watch_state.json')).load()
+    assert state[f'apple_page:{url}']['value'] == 'h1'
+
+
+def test_axcnh_watch_continues_from_result_file(monkeypatch, tmp_path):
+    monkeypatch.setenv('conflux_evm_rpc', 'https://rpc.example')
+    monkeypatch.delenv('AxCNH_holders', raising=False)
+    data_file = AxCNH_monitor.DataFile(str(tmp_path / 'AxCNH_result.json'))
+    data_file.write({'AxCNH_supply': '100', 'AxCNH_bank_balance': '7', 'AxCNH_balances': {AxCNH_monitor.bank_address: '7'},
+                     'AxCNH_trend_alerts': {}})
+    notified = []
+    monkeypatch.setattr(AxCNH_monitor.BarkNotify, 'send_notify', staticmethod(lambda title, *args, **kwargs: notified.append(title)))
+
+    def handler(request):
+        calls = json.loads(request.content)
+        values = [hex(150), hex(7)]
+        return httpx.Response(200, json=[{'jsonrpc': '2.0', 'id': c['id'], 'result': values[c['id']]} for c in calls])
+
+    run_engine(AxCNH_monitor.build_watches(data_file), tmp_path / 'watch_state.json', handler)
+    assert notified == ['代币总供应量出现变动']
+
+
+def test_apple_buyability_poll_uses_shared_client(tmp_path):
+    import apple_monitor2
+    watcher = apple_monitor2.AppleBuyabilityWatcher(['P1/A'], state_path=str(tmp_path / 'apple_buyability.json'))
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path.endswith('/buyability-message'):
+            message = {'sth': {'P1/A': {'isBuyable': True}}, 'apu': None}
+            return httpx.Response(200, json={'body': {'content': {'buyabilityMessage': message}}})
+        return httpx.Response(200, headers={'set-cookie': 'dssid=abc; Domain=.apple.com.cn; Path=/'})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await watcher.poll(client)
+            second = await watcher.poll(client)
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {'P1/A': True}
+    # 预热一次后复用 cookie
+    assert paths.count('/shop/buyability-message') == 2 and len(paths) == 4
+    saved = StateStore(str(tmp_path / 'apple_buyability.json')).load()
+    assert [c['name'] for c in saved['cookies']] == ['dssid']
+
+
+def test_apple_buyability_tolerates_null_entries():
+    import apple_monitor2
+    watcher = apple_monitor2.AppleBuyabilityWatcher(['P1/A', 'P2/A'], state_path='/nonexistent/apple_buyability.json')
+    message = {'sth': {'P1/A': None, 'P2/A': {'isBuyable': True}}, 'apu': None}
+    assert watcher._parse_buyability({'body': {'content': {'buyabilityMessage': message}}}) == {'P1/A': False, 'P2/A': True}
+
+
+def run_axcnh_main(monkeypatch, tmp_path, supply, balance):
+    monkeypatch.delenv('AxCNH_holders', raising=False)
+    monkeypatch.setattr(AxCNH_monitor.metrics, 'flush', lambda: None)
+    data_file = DataFile(str(tmp_path / 'AxCNH_result.json'))
+    monkeypatch.setattr(AxCNH_monitor, 'DataFile', lambda: data_file)
+    monkeypatch.setattr(AxCNH_monitor, 'SeriesStore', lambda path: SeriesStore(str(tmp_path / 'history.db')))
+    collected = {'supply': {AxCNH_monitor.AxCNH_contract_address: supply},
+                 'balances': {AxCNH_monitor.AxCNH_contract_address: {AxCNH_monitor.bank_address: balance}}}
+    monkeypatch.setattr(AxCNH_monitor.ConfluxScan, 'collect', lambda self, contracts, holders: collected)
+    notified = []
+    monkeypatch.setattr(AxCNH_monitor.BarkNotify, 'send_notify', staticmethod(lambda title, *args, **kwargs: notified.append(title)))
+    AxCNH_monitor.main()
+    return notified, data_file.read()
+
+
+def test_axcnh_main_pushes_changes_from_compare_balances(monkeypatch, tmp_path):
+    monkeypatch.delenv('watch_runner', raising=False)
+    assert run_axcnh_main(monkeypatch, tmp_path, '100', '7')[0] == []
+    notified, result = run_axcnh_main(monkeypatch, tmp_path, '150', '8')
+    assert notified == ['代币总供应量出现变动', '授权银行余额出现变动']
+    assert result['AxCNH_supply'] == '150' and result['AxCNH_bank_balance'] == '8'
+    # 查询失败（None）不推送，并沿用上次的值
+    notified, result = run_axcnh_main(monkeypatch, tmp_path, None, '8')
+    assert notified == []
+    assert result['AxCNH_supply'] == '150'
+
+
+def test_axcnh_main_leaves_pushes_to_runner(monkeypatch, tmp_path):
+    monkeypatch.setenv('watch_runner', '1')
+    monkeypatch.delenv('watch_modules', raising=False)
+    run_axcnh_main(monkeypatch, tmp_path, '100', '7')
+    notified, result = run_axcnh_main(monkeypatch, tmp_path, '150', '7')
+    assert notified == []
+    assert result['AxCNH_supply'] == '150'
+
+
+def test_scripts_run_alone_unless_runner_enabled(monkeypatch):
+    monkeypatch.delenv('watch_runner', raising=False)
+    monkeypatch.delenv('watch_modules', raising=False)
+    assert not handled_by_runner('miit_monitor')
+    monkeypatch.setenv('watch_runner', '1')
+    assert handled_by_runner('miit_monitor')
+    monkeypatch.setenv('watch_modules', 'apple_monitor1')
+    assert not handled_by_runner('miit_monitor')
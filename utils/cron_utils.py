@@ -0,0 +1,92 @@
+'''
+cron 表达式解析
+
+支持标准 5 段（分 时 日 月 周）以及青龙的 6 段（秒 分 时 日 月 周，秒会被忽略），
+每段支持 *、数字、a-b、逗号列表以及 /步长。
+'''
+import re
+from datetime import datetime, timedelta
+
+
+class CronExpression:
+    # (最小值, 最大值)
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr):
+        self.expr = expr
+        fields = expr.split()
+        if len(fields) == 6:
+            fields = fields[1:]
+        if len(fields) != 5:
+            raise ValueError(f"无效的 cron 表达式: {expr}")
+        self.minute, self.hour, self.day, self.month, weekday = [
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        ]
+        # 周日可写作 0 或 7
+        self.weekday = {d % 7 for d in weekday}
+        # 日和周都有限制时满足其一即可（与 crontab 一致）
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            match = re.fullmatch(r'(\*|\d+)(?:-(\d+))?(?:/(\d+))?', part)
+            if not match:
+                raise ValueError(f"无效的 cron 字段: {field}")
+            start, end, step = match.groups()
+            if start == '*':
+                first, last = low, high
+            else:
+                first = int(start)
+                # a/n 表示从 a 开始到最大值
+                last = int(end) if end else (high if step else first)
+            if first < low or last > high or first > last:
+                raise ValueError(f"cron 字段超出范围: {field}")
+            values.update(range(first, last + 1, int(step) if step else 1))
+        return values
+
+    def matches(self, dt: datetime):
+        """判断某一分钟是否触发"""
+        if dt.minute not in self.minute or dt.hour not in self.hour or dt.month not in self.month:
+            return False
+        day_ok = dt.day in self.day
+        weekday_ok = (dt.isoweekday() % 7) in self.weekday
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt: datetime):
+        """dt 之后（不含）最近一次触发的时间，按分钟逐步查找（跳过不匹配的月和小时）"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 24 * 60):
+            if candidate.month not in self.month:
+                # 跳到下个月第一天
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if candidate.hour not in self.hour:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"cron 表达式 {self.expr} 找不到触发时间")
+
+
+def parse_script_header(path):
+    """
+    读取脚本开头文档字符串中的 name: / cron: 配置
+    :return: {'name': ..., 'cron': ...}，没有的键不返回
+    """
+    header = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read(2048)
+    match = re.match(r"\s*(?:'''|\"\"\")([\s\S]*?)(?:'''|\"\"\")", text)
+    if not match:
+        return header
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(':')
+        if sep and key.strip() in ('name', 'cron'):
+            header[key.strip()] = value.strip()
+    return header
@@ -0,0 +1,174 @@
+'''
+吉利凭证链缓存
+
+车控接口需要依次经过 refreshToken -> token -> 车机授权码 -> 车控 accessToken 三跳，
+这里把每一跳的结果连同过期时间持久化，只重新执行已过期的环节。
+刷新 token 时接口返回的新 refreshToken 同样保存，下次运行优先使用（环境变量中的旧值可能已被轮换掉）。
+'''
+import os
+import json
+import time
+import base64
+import hashlib
+from utils.geely.vehicle_utils import VehicleControl
+from utils.state_store import StateStore
+
+
+class GeelyCredentialChain:
+    # 默认缓存路径，可通过环境变量 GEELY_CREDENTIAL_FILE 覆盖
+    DEFAULT_PATH = '/ql/data/geely_credentials.json'
+
+    # 接口未返回有效期时使用的默认值（秒）
+    DEFAULT_TTL = {
+        'token': 2 * 3600,
+        'auth_code': 5 * 60,
+        'authorization': 3600,
+    }
+
+    # 提前刷新的余量（秒），避免请求途中过期
+    EXPIRY_MARGIN = 60
+
+    # 缓存文件版本：2 起按账号 ID 分键并保存轮换后的 refreshToken
+    VERSION = 2
+
+    def __init__(self, user, file_path=None, ttl=None, account_id=None):
+        """
+        :param account_id: 账号的稳定标识，默认取 deviceSN，没有时取配置的 refreshToken
+        """
+        self.user = user  # GeelyUser 实例
+        self.file_path = file_path or os.environ.get('GEELY_CREDENTIAL_FILE', self.DEFAULT_PATH)
+        self.ttl = dict(self.DEFAULT_TTL, **(ttl or {}))
+        # 配置的 refreshToken，保存的新值失效时退回使用
+        self.configured_refresh_token = user.refresh_token
+        # 取摘要作为键，避免明文；refreshToken 轮换后键不变
+        account_id = account_id or user.device_sn or user.refresh_token
+        self.account_key = hashlib.sha256(account_id.encode('utf-8')).hexdigest()[:16]
+        self.store = StateStore(self.file_path, version=self.VERSION, default=dict, migrate=self._migrate)
+        entry = self._load()
+        self.stages = entry.get('stages', {})
+        self.refresh_token = entry.get('refresh_token')
+        if self.refresh_token:
+            user.refresh_token = self.refresh_token
+
+    @staticmethod
+    def _migrate(data, old_version):
+        # 旧版本以 refreshToken 摘要为键，无法对应到账号，直接丢弃（各环节会重新获取）
+        return {}
+
+    def _load(self):
+        """读取当前账号的缓存"""
+        return (self.store.load() or {}).get(self.account_key, {})
+
+    def _save(self):
+        """写回当前账号的缓存，保留其他账号"""
+        try:
+            with self.store.transaction() as data:
+                data[self.account_key] = {'refresh_token': self.refresh_token, 'stages': self.stages}
+        except Exception as e:
+            print(f"⚠️ 写入凭证缓存失败: {e}")
+
+    @staticmethod
+    def _jwt_expiry(token):
+        """JWT 格式的令牌直接读取 exp，否则返回 None"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            return int(json.loads(base64.urlsafe_b64decode(payload)).get('exp'))
+        except Exception:
+            return None
+
+    def _expires_at(self, stage, value, expires_in=None):
+        """计算过期时间：JWT exp > 接口返回的有效期 > 默认有效期"""
+        expiry = self._jwt_expiry(value)
+        if expiry:
+            return expiry
+        try:
+            if expires_in:
+                return int(time.time()) + int(expires_in)
+        except (TypeError, ValueError):
+            pass
+        return int(time.time()) + self.ttl[stage]
+
+    def _get(self, stage):
+        """获取未过期的缓存值"""
+        entry = self.stages.get(stage)
+        if entry and entry.get('expires_at', 0) - self.EXPIRY_MARGIN > time.time():
+            return entry.get('value')
+        return None
+
+    def _put(self, stage, value, expires_in=None):
+        self.stages[stage] = {
+            'value': value,
+            'expires_at': self._expires_at(stage, value, expires_in),
+        }
+        self._save()
+
+    def invalidate(self, *stages):
+        """使指定环节失效（如车控接口返回未授权），不传则全部失效"""
+        for stage in stages or list(self.stages):
+            self.stages.pop(stage, None)
+        self._save()
+
+    def _refresh(self):
+        """用 refreshToken 刷新 token；保存的 refreshToken 失效时退回配置的值再试一次"""
+        if self.user.refresh_token_func():
+            return True
+        if self.user.refresh_token == self.configured_refresh_token:
+            return False
+        print("⚠️ 保存的 refreshToken 已失效，改用配置的 refreshToken")
+        self.user.refresh_token = self.configured_refresh_token
+        return self.user.refresh_token_func()
+
+    def get_token(self):
+        """第一跳：用户 token"""
+        token = self._get('token')
+        if token:
+            self.user.token = token
+            return token
+        if not self._refresh():
+            return None
+        # 接口可能轮换 refreshToken，与 token 一起保存
+        self.refresh_token = self.user.refresh_token
+        self._put('token', self.user.token, self.user.token_expires_in)
+        return self.user.token
+
+    def get_auth_code(self):
+        """第二跳：车机控制授权码（一次性，换取 accessToken 后即丢弃）"""
+        code = self._get('auth_code')
+        if code:
+            return code
+        if not self.get_token():
+            return None
+        code = self.user.get_oauth_code()
+        if not code:
+            # token 可能已在服务端失效，重新刷新一次
+            self.invalidate('token')
+            if not self.get_token():
+                return None
+            code = self.user.get_oauth_code()
+        if code:
+            self._put('auth_code', code)
+        return code
+
+    def get_authorization(self):
+        """第三跳：车控 accessToken，缓存有效时直接返回"""
+        authorization = self._get('authorization')
+        if authorization:
+            return authorization
+
+        code = self.get_auth_code()
+        if not code:
+            return None
+        vehicle = VehicleControl()
+        authorization = vehicle.get_authorization(code)
+        # 授权码只能使用一次
+        self.stages.pop('auth_code', None)
+        if not authorization:
+            self._save()
+            return None
+        self._put('authorization', authorization, vehicle.authorization_expires_in)
+        return authorization
+
+    def vehicle_control(self, vehicle_id="", **kwargs):
+        """创建已带授权的 VehicleControl"""
+        return VehicleControl(vehicle_id, authorization=self.get_authorization(), **kwargs)
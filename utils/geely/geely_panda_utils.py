@@ -3,15 +3,13 @@
 '''
 import os
 import json
-import time
 import base64
 import hashlib
 import hmac
-import uuid
-import random
-import requests
 from datetime import datetime
-from urllib.parse import quote
+from urllib.parse import urlparse
+from utils.geely.nonce_utils import NonceProvider
+from utils.http_metrics import HttpMetrics
 
 class GeelyUser:
     # 定义常量
@@ -23,6 +21,10 @@ class GeelyUser:
         "204179735": "UhmsX3xStU4vrGHGYtqEXahtkYuQncMf"
     }
     
+    # 接口地址：安卓端（用户中心）和 h5 端
+    USER_API_URL = "https://galaxy-user-api.geely.com"
+    APP_API_URL = "https://galaxy-app.geely.com"
+
     # 基础请求头常量
     USER_AGENT = "ALIYUN-ANDROID-UA"
     APP_ID = "galaxy-app"
@@ -33,6 +35,8 @@ class GeelyUser:
         # 初始化用户信息
         self.ck_status = True
         self.token = ''
+        self.token_expires_in = None
+        self.points = None  # 最近一次查询到的积分
         if '&' in user_str:
             parts = user_str.split('&')
             self.refresh_token = parts[0]  # refreshToken值
@@ -64,7 +68,7 @@ class GeelyUser:
 
     # 生成UUID
     def generate_uuid(self):
-        return str(uuid.uuid4())
+        return NonceProvider.shared().uuid4()
 
     # 计算Content-MD5值
     def calculate_content_md5(self, request_body):
@@ -129,12 +133,12 @@ class GeelyUser:
         if key == "204179735":
             # 安卓端特有设置
             headers["usetoken"] = "true"
-            headers["host"] = "galaxy-user-api.geely.com"
+            headers["host"] = urlparse(self.USER_API_URL).netloc
             headers["taenantid"] = "569001701001"
         else:
             # h5端特有设置
             headers["usetoken"] = "1"
-            headers["host"] = "galaxy-app.geely.com"
+            headers["host"] = urlparse(self.APP_API_URL).netloc
             headers["x-refresh-token"] = "true"
             
         return headers
@@ -225,9 +229,9 @@ class GeelyUser:
     def api_request(self, method, url, headers, data=None):
         try:
             if method.upper() == "GET":
-                response = requests.get(url, headers=headers)
+                response = HttpMetrics.session().get(url, headers=headers)
             elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, data=data)
+                response = HttpMetrics.session().post(url, headers=headers, data=data)
             else:
                 raise ValueError(f"不支持的请求方法: {method}")
                 
@@ -239,7 +243,7 @@ class GeelyUser:
     # 刷新Token
     def refresh_token_func(self):
         try:
-            url = f"https://galaxy-user-api.geely.com/api/v1/login/refresh?refreshToken={self.refresh_token}"
+            url = f"{self.USER_API_URL}/api/v1/login/refresh?refreshToken={self.refresh_token}"
             headers = self.get_get_header("204179735", f"/api/v1/login/refresh?refreshToken={self.refresh_token}")
             
             result = self.api_request("GET", url, headers)
@@ -249,6 +253,10 @@ class GeelyUser:
                 print(f"🆗刷新KEY: {result['data']['centerTokenDto']['refreshToken']}")
                 self.ck_status = True
                 self.token = result['data']['centerTokenDto']['token']
+                # 接口可能轮换 refreshToken，之后的刷新使用新值
+                self.refresh_token = result['data']['centerTokenDto'].get('refreshToken') or self.refresh_token
+                # 有效期（秒），接口未返回时为 None
+                self.token_expires_in = result['data']['centerTokenDto'].get('expiresIn')
                 return True
             else:
                 print(f"❌ {result.get('message')}")
@@ -267,7 +275,7 @@ class GeelyUser:
             query = "client_id=30000025&isDestruction=false&response_type=code&scope=snsapiUserinfo"
             full_path = f"{path}?{query}"
             
-            url = f"https://galaxy-user-api.geely.com{full_path}"
+            url = f"{self.USER_API_URL}{full_path}"
             headers = self.get_get_header("204179735", full_path)
             headers["x-ca-signature-headers"] = "x-ca-appcode,x-ca-nonce,x-ca-key,token,x-ca-timestamp"
 
@@ -286,7 +294,7 @@ class GeelyUser:
                 "galaxy-app-user"
             )
 
-            response = requests.get(url, headers=headers)
+            response = HttpMetrics.session().get(url, headers=headers)
             
             # 检查响应状态码
             if response.status_code != 200:
@@ -321,14 +329,15 @@ class GeelyUser:
     # 查询积分
     def check_points(self):
         try:
-            url = "https://galaxy-app.geely.com/h5/v1/points/get"
+            url = f"{self.APP_API_URL}/h5/v1/points/get"
             headers = self.get_get_header("204453306", "/h5/v1/points/get")
             
             result = self.api_request("GET", url, headers)
             
             if result.get('code') == "0":
                 print(f"✅剩余积分: {result['data']['availablePoints']}")
-                return result['data']['availablePoints']
+                self.points = result['data']['availablePoints']
+                return self.points
             else:
                 print("❌剩余积分查询: 失败")
                 print(result)
@@ -340,7 +349,7 @@ class GeelyUser:
     # 查询签到状态
     def check_sign_state(self):
         try:
-            url = "https://galaxy-app.geely.com/app/v1/sign/state"
+            url = f"{self.APP_API_URL}/app/v1/sign/state"
             headers = self.get_get_header("204453306", "/app/v1/sign/state")
             
             result = self.api_request("GET", url, headers)
@@ -373,7 +382,7 @@ class GeelyUser:
             body = json.dumps({"signType": 0})
             
             # 使用get_post_header生成请求头
-            url = "https://galaxy-app.geely.com/app/v1/sign/add"
+            url = f"{self.APP_API_URL}/app/v1/sign/add"
             headers = self.get_post_header("204453306", "/app/v1/sign/add", body)
             
             # 执行签到请求
@@ -393,13 +402,13 @@ class GeelyUser:
             print(f"签到出错: {e}")
             return False
 
-    # 执行签到流程
-    def do_sign(self):
+    # 执行签到流程，get_token 为获取 token 的函数（如 GeelyCredentialChain.get_token），默认直接刷新
+    def do_sign(self, get_token=None):
         print(f"⌛️ {datetime.now().strftime('%Y/%m/%d %H:%M:%S')}")
         print("🔄 开始吉利银河签到")
         
         # 刷新token
-        if not self.refresh_token_func():
+        if not (get_token or self.refresh_token_func)():
             print("❌账号CK失效")
             return False
         
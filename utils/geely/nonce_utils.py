@@ -0,0 +1,105 @@
+'''
+签名用随机数生成
+
+批量从 os.urandom 取随机字节，通过预先计算的映射表一次性转换为字符，
+供 VehicleControl 的 nonce 和 GeelyUser 的 UUID 使用，线程安全。
+fork 出的子进程会清空继承来的随机数池，避免父子进程生成相同的 nonce。
+'''
+import os
+import string
+import weakref
+import threading
+
+
+class NonceProvider:
+    # 每次批量获取的随机字节数
+    BATCH_SIZE = 4096
+
+    LOWER_DIGITS = string.ascii_lowercase + string.digits
+    UPPER_DIGITS = string.ascii_uppercase + string.digits
+
+    _shared = None
+    _shared_lock = threading.Lock()
+    _instances = weakref.WeakSet()  # fork 后需要清空的实例
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._tables = {}  # 字符集 -> (映射表, 需丢弃的字节)
+        self._pools = {}  # 字符集 -> (已映射好的字符池, 读取位置)
+        self._raw = b''  # UUID 使用的原始字节池
+        self._raw_pos = 0
+        NonceProvider._instances.add(self)
+
+    def _reset(self):
+        """清空随机数池（锁可能在 fork 时被其他线程持有，一并重建）"""
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._raw = b''
+        self._raw_pos = 0
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        cls._shared_lock = threading.Lock()
+        for provider in list(cls._instances):
+            provider._reset()
+
+    @classmethod
+    def shared(cls):
+        """进程内共享实例"""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def _table(self, alphabet):
+        """
+        预计算字节到字符的映射表
+        丢弃 256 除以字符集长度的余数部分，保证每个字符概率相同
+        """
+        if alphabet not in self._tables:
+            size = len(alphabet)
+            limit = 256 - 256 % size
+            table = bytes(ord(alphabet[b % size]) for b in range(256))
+            self._tables[alphabet] = (table, bytes(range(limit, 256)))
+        return self._tables[alphabet]
+
+    def random_string(self, alphabet, k):
+        """从字符集中随机取 k 个字符（字符集需为 ASCII）"""
+        with self._lock:
+            pool, pos = self._pools.get(alphabet, ('', 0))
+            if len(pool) - pos < k:
+                table, rejected = self._table(alphabet)
+                pool = pool[pos:]
+                while len(pool) < k:
+                    pool += os.urandom(self.batch_size).translate(table, rejected).decode('ascii')
+                pos = 0
+            self._pools[alphabet] = (pool, pos + k)
+            return pool[pos:pos + k]
+
+    def random_bytes(self, n):
+        """批量缓存的随机字节"""
+        with self._lock:
+            if len(self._raw) - self._raw_pos < n:
+                self._raw = self._raw[self._raw_pos:] + os.urandom(max(self.batch_size, n))
+                self._raw_pos = 0
+            start = self._raw_pos
+            self._raw_pos += n
+            return self._raw[start:start + n]
+
+    def vehicle_nonce(self, timestamp):
+        """车控接口 nonce：3位小写数字-12位小写数字7位大写数字+时间戳"""
+        lower = self.random_string(self.LOWER_DIGITS, 15)
+        upper = self.random_string(self.UPPER_DIGITS, 7)
+        return f"{lower[:3]}-{lower[3:]}{upper}{timestamp}"
+
+    def uuid4(self):
+        """随机 UUID（版本 4），格式与 str(uuid.uuid4()) 相同"""
+        h = self.random_bytes(16).hex()
+        variant = '89ab'[int(h[16], 16) & 3]
+        return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{variant}{h[17:20]}-{h[20:]}"
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=NonceProvider._after_fork_in_child)
@@ -0,0 +1,161 @@
+'''
+车辆远程控制指令队列
+
+把多条控制指令（如 "开门, 空调22度, 开后备箱"）排队后复用同一个已授权会话连续下发，
+相同指令去重、相邻的同类指令合并，发送后轮询车辆状态确认执行结果。
+'''
+import time
+from datetime import datetime
+
+
+class VehicleCommandQueue:
+    # 指令定义：名称 -> (指令分组, 执行后期望的车辆状态)
+    # 期望状态为 (VehicleStatus 属性名, 期望值)，None 表示状态接口无法确认
+    COMMANDS = {
+        'open_door': ('door', ('door_lock_status_driver', False)),
+        'close_door': ('door', ('door_lock_status_driver', True)),
+        'open_air': ('air', None),
+        'close_air': ('air', None),
+        'search_car': ('horn', None),
+        'open_trunk': ('trunk', ('trunk_open_status', True)),
+        'close_trunk': ('trunk', ('trunk_open_status', False)),
+    }
+
+    # 接受参数的指令：名称 -> 参数名（参数为整数）
+    PARAMS = {
+        'open_air': 'temperature',
+    }
+
+    # 指令别名，便于从环境变量解析
+    ALIASES = {
+        'unlock': 'open_door',
+        'lock': 'close_door',
+        'ac': 'open_air',
+        'ac_off': 'close_air',
+        'find': 'search_car',
+        'trunk': 'open_trunk',
+    }
+
+    def __init__(self, vehicle):
+        self.vehicle = vehicle  # VehicleControl 实例
+        self.commands = []  # [(名称, 参数)]
+
+    @classmethod
+    def parse(cls, vehicle, text):
+        """
+        从文本解析指令序列，逗号分隔，参数用冒号，如 "unlock, ac:22, trunk"
+        只有 PARAMS 中的指令接受参数，且参数须为整数，否则抛出 ValueError
+        """
+        queue = cls(vehicle)
+        for item in text.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            name, sep, arg = item.partition(':')
+            name, arg = name.strip(), arg.strip()
+            kwargs = {}
+            if sep:
+                param = cls.PARAMS.get(cls.ALIASES.get(name, name))
+                if param is None:
+                    raise ValueError(f"控制指令 {name} 不接受参数: {item}")
+                try:
+                    kwargs[param] = int(arg)
+                except ValueError:
+                    raise ValueError(f"控制指令 {name} 的参数应为整数: {item}") from None
+            queue.add(name, **kwargs)
+        return queue
+
+    def add(self, name, **kwargs):
+        """添加指令，重复指令去重，与队尾同类指令合并（以后者为准）"""
+        name = self.ALIASES.get(name, name)
+        if name not in self.COMMANDS:
+            raise ValueError(f"不支持的控制指令: {name}")
+        group = self.COMMANDS[name][0]
+
+        # 找到同组最后一条指令
+        last_index = None
+        for index in range(len(self.commands) - 1, -1, -1):
+            if self.COMMANDS[self.commands[index][0]][0] == group:
+                last_index = index
+                break
+
+        if last_index is not None:
+            if self.commands[last_index] == (name, kwargs):
+                # 与同组最近一条完全相同，无需重复下发
+                return self
+            if last_index == len(self.commands) - 1:
+                # 相邻的同组指令只保留最后一条
+                self.commands[last_index] = (name, kwargs)
+                return self
+
+        self.commands.append((name, kwargs))
+        return self
+
+    def extend(self, names):
+        """批量添加指令，元素可为名称或 (名称, 参数字典)"""
+        for item in names:
+            if isinstance(item, tuple):
+                self.add(item[0], **item[1])
+            else:
+                self.add(item)
+        return self
+
+    @staticmethod
+    def _is_accepted(response):
+        """判断控制请求是否被受理"""
+        if response is None or response.status_code != 200:
+            return False
+        try:
+            result = response.json()
+        except ValueError:
+            return False
+        return bool(result.get('success'))
+
+    def run(self, wait=True, timeout=60, interval=5):
+        """
+        依次下发队列中的指令，再统一轮询车辆状态确认
+        :param wait: 是否轮询确认执行结果
+        :param timeout: 轮询超时时间（秒）
+        :param interval: 轮询间隔（秒）
+        :return: 每条指令的结果列表
+        """
+        results = []
+        for name, kwargs in self.commands:
+            response = getattr(self.vehicle, name)(**kwargs)
+            accepted = self._is_accepted(response)
+            results.append({
+                'command': name,
+                'params': kwargs,
+                'accepted': accepted,
+                # None 表示无法通过状态接口确认
+                'confirmed': False if accepted and self.COMMANDS[name][1] else None,
+            })
+            if not accepted:
+                print(f"❌ 指令 {name} 未被受理")
+        self.commands = []
+
+        pending = [r for r in results if r['confirmed'] is False]
+        if wait and pending:
+            self._wait_confirm(pending, timeout, interval)
+
+        confirmed = len([r for r in results if r['confirmed']])
+        print(f"📋 指令队列执行完成: 下发 {len(results)} 条，确认 {confirmed} 条")
+        return results
+
+    def _wait_confirm(self, pending, timeout, interval):
+        """轮询车辆状态，直到所有待确认指令生效或超时"""
+        deadline = time.time() + timeout
+        while pending and time.time() < deadline:
+            time.sleep(interval)
+            if self.vehicle.get_vehicle_detailed_status() is None:
+                continue
+            status = self.vehicle.vehicle_status
+            for result in list(pending):
+                attr, expected = self.COMMANDS[result['command']][1]
+                if getattr(status, attr) == expected:
+                    result['confirmed'] = True
+                    pending.remove(result)
+                    print(f"✅ {datetime.now().strftime('%H:%M:%S')} 指令 {result['command']} 已生效")
+
+        for result in pending:
+            print(f"⚠️ 指令 {result['command']} 在 {timeout} 秒内未确认生效")
@@ -0,0 +1,167 @@
+'''
+车辆遥测历史存储
+
+每次获取详细车辆状态后追加一行（SQLite + WAL），按 (vin, update_time) 去重，
+支持按时间范围查询和按小时/天降采样，用于离线计算电耗、充电和行程里程。
+'''
+import os
+import sqlite3
+from datetime import datetime
+
+
+class VehicleTelemetryStore:
+    """车辆遥测数据的追加式本地存储"""
+
+    # 默认存储路径，可通过环境变量 GEELY_TELEMETRY_DB 覆盖
+    DEFAULT_PATH = '/ql/data/geely_telemetry.db'
+
+    # 降采样粒度（秒）
+    BUCKETS = {
+        'hour': 3600,
+        'day': 86400,
+    }
+
+    # 记录的字段（VehicleStatus 属性名）
+    FIELDS = ['odometer', 'charge_level', 'distance_to_empty', 'latitude', 'longitude', 'altitude']
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get('GEELY_TELEMETRY_DB', self.DEFAULT_PATH)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL 模式下读写互不阻塞，追加写入只需顺序写日志
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+
+    def _init_schema(self):
+        """创建表结构，主键 (vin, update_time) 同时承担去重和范围查询索引"""
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS telemetry (
+                vin TEXT NOT NULL DEFAULT '',
+                update_time INTEGER NOT NULL,
+                odometer REAL,
+                charge_level REAL,
+                distance_to_empty REAL,
+                latitude REAL,
+                longitude REAL,
+                altitude REAL,
+                fetched_at INTEGER NOT NULL,
+                PRIMARY KEY (vin, update_time)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def _to_float(value):
+        """统一转为浮点数（兼容已解码数值和原始字符串），无法解析时为 None"""
+        if value is None or value == '':
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _to_ms(value):
+        """时间参数转为毫秒时间戳，支持 datetime、秒或毫秒"""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return int(value.timestamp() * 1000)
+        value = int(value)
+        # 小于 1e11 视为秒级时间戳
+        return value * 1000 if value < 10 ** 11 else value
+
+    def append(self, status):
+        """追加一条车辆状态，update_time 已存在时忽略，返回是否新增"""
+        if status.update_time is None:
+            return False
+
+        row = [status.vin or '', int(status.update_time)]
+        row += [self._to_float(getattr(status, field)) for field in self.FIELDS]
+        row.append(int(datetime.now().timestamp() * 1000))
+
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO telemetry '
+            '(vin, update_time, odometer, charge_level, distance_to_empty, latitude, longitude, altitude, fetched_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            row
+        )
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def _range_clause(self, start, end, vin):
+        """构建范围查询条件"""
+        clauses = []
+        params = []
+        if vin is not None:
+            clauses.append('vin = ?')
+            params.append(vin)
+        if start is not None:
+            clauses.append('update_time >= ?')
+            params.append(self._to_ms(start))
+        if end is not None:
+            clauses.append('update_time < ?')
+            params.append(self._to_ms(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def query(self, start=None, end=None, vin=None):
+        """按时间范围查询原始记录，按 update_time 升序"""
+        where, params = self._range_clause(start, end, vin)
+        rows = self.conn.execute(
+            f'SELECT * FROM telemetry {where} ORDER BY vin, update_time',
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest(self, vin=None):
+        """获取最新的一条记录"""
+        where, params = self._range_clause(None, None, vin)
+        row = self.conn.execute(
+            f'SELECT * FROM telemetry {where} ORDER BY update_time DESC LIMIT 1',
+            params
+        ).fetchone()
+        return dict(row) if row else None
+
+    def downsample(self, bucket='hour', start=None, end=None, vin=None, tz_offset=None):
+        """
+        按小时/天聚合
+        :param bucket: 'hour' 或 'day'
+        :param tz_offset: 分桶使用的时区偏移（秒），默认本地时区
+        :return: 每个时间桶一条，含里程增量、电量变化和平均续航
+        """
+        if bucket not in self.BUCKETS:
+            raise ValueError(f"不支持的聚合粒度: {bucket}")
+        size = self.BUCKETS[bucket]
+        if tz_offset is None:
+            tz_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+
+        where, params = self._range_clause(start, end, vin)
+        rows = self.conn.execute(
+            f'''
+            SELECT
+                vin,
+                ((update_time / 1000 + ?) / ?) * ? - ? AS bucket_start,
+                COUNT(*) AS samples,
+                MIN(odometer) AS odometer_min,
+                MAX(odometer) AS odometer_max,
+                MAX(odometer) - MIN(odometer) AS distance,
+                MIN(charge_level) AS charge_level_min,
+                MAX(charge_level) AS charge_level_max,
+                AVG(charge_level) AS charge_level_avg,
+                AVG(distance_to_empty) AS distance_to_empty_avg
+            FROM telemetry {where}
+            GROUP BY vin, bucket_start
+            ORDER BY vin, bucket_start
+            ''',
+            [tz_offset, size, size, tz_offset] + params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -1,17 +1,150 @@
-import requests
 import time
-import random
-import string
 import hashlib
 import base64
 import hmac
 from datetime import datetime
+from enum import Enum
+from urllib.parse import urlparse
 import json
+from utils.geely.nonce_utils import NonceProvider
+from utils.http_metrics import InstrumentedSession
+
+class PowerMode(Enum):
+    """上电状态（powerMode）"""
+    ON = 0   # 上电
+    OFF = 1  # 未上电
+
+class GearPosition(Enum):
+    """变速器挡位（transimissionGearPostion）"""
+    DRIVE = 1    # 前进挡
+    REVERSE = 2  # 倒挡
+    NEUTRAL = 3  # 空挡
+
+class StatusDecoder:
+    '''
+        车辆状态字段解码器：接口返回的都是字符串，在解析时一次性转换为 int/float/bool/枚举
+    '''
+
+    @staticmethod
+    def to_int(value):
+        if value is None or value == '':
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            try:
+                return int(float(value))
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def to_float(value):
+        if value is None or value == '':
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def to_bool(value):
+        """"1"/"true" 为 True，"0"/"false" 为 False，其他为 None"""
+        if isinstance(value, bool):
+            return value
+        if value is None or value == '':
+            return None
+        text = str(value).strip().lower()
+        if text in ('1', 'true'):
+            return True
+        if text in ('0', 'false'):
+            return False
+        return None
+
+    @staticmethod
+    def to_str(value):
+        return None if value is None else str(value)
+
+    @staticmethod
+    def raw(value):
+        return value
+
+    @staticmethod
+    def to_enum(enum_cls):
+        """生成枚举解码函数，未知取值保留为整数"""
+        def decode(value):
+            number = StatusDecoder.to_int(value)
+            if number is None:
+                return None
+            try:
+                return enum_cls(number)
+            except ValueError:
+                return number
+        return decode
 
 class VehicleStatus:
+    # 字段解码表：(属性名, 相对 vehicleStatus 的路径, 解码函数)
+    FIELDS = [
+        # 基础车辆状态
+        ('distance_to_empty', ('basicVehicleStatus', 'distanceToEmpty'), StatusDecoder.to_float),
+        ('speed', ('basicVehicleStatus', 'speed'), StatusDecoder.to_float),
+        ('direction', ('basicVehicleStatus', 'direction'), StatusDecoder.to_str),
+        # 位置信息
+        ('latitude', ('basicVehicleStatus', 'position', 'latitude'), StatusDecoder.to_float),
+        ('longitude', ('basicVehicleStatus', 'position', 'longitude'), StatusDecoder.to_float),
+        ('altitude', ('basicVehicleStatus', 'position', 'altitude'), StatusDecoder.to_float),
+        ('position_can_be_trusted', ('basicVehicleStatus', 'position', 'posCanBeTrusted'), StatusDecoder.to_bool),
+        # 配置信息
+        ('fuel_type', ('configuration', 'fuelType'), StatusDecoder.to_str),
+        ('vin', ('configuration', 'vin'), StatusDecoder.to_str),
+        # 遥控器状态
+        ('remote_control_inhibited', ('remoteControlInhibited',), StatusDecoder.to_bool),
+        # 更新时间
+        ('update_time', ('updateTime',), StatusDecoder.to_int),
+        # 保养状态
+        ('distance_to_service', ('additionalVehicleStatus', 'maintenanceStatus', 'distanceToService'), StatusDecoder.to_float),
+        ('odometer', ('additionalVehicleStatus', 'maintenanceStatus', 'odometer'), StatusDecoder.to_float),
+        ('brake_fluid_level_status', ('additionalVehicleStatus', 'maintenanceStatus', 'brakeFluidLevelStatus'), StatusDecoder.to_int),
+        ('service_warning_status', ('additionalVehicleStatus', 'maintenanceStatus', 'serviceWarningStatus'), StatusDecoder.to_int),
+        # 主电池状态
+        ('voltage', ('additionalVehicleStatus', 'maintenanceStatus', 'mainBatteryStatus', 'voltage'), StatusDecoder.to_float),
+        # 电动车状态
+        ('is_plugged_in', ('additionalVehicleStatus', 'electricVehicleStatus', 'isPluggedIn'), StatusDecoder.to_bool),
+        ('aver_power_consumption', ('additionalVehicleStatus', 'electricVehicleStatus', 'averPowerConsumption'), StatusDecoder.to_float),
+        ('pt_ready', ('additionalVehicleStatus', 'electricVehicleStatus', 'ptReady'), StatusDecoder.to_bool),
+        ('state_of_charge', ('additionalVehicleStatus', 'electricVehicleStatus', 'stateOfCharge'), StatusDecoder.to_int),
+        ('charge_level', ('additionalVehicleStatus', 'electricVehicleStatus', 'chargeLevel'), StatusDecoder.to_float),
+        ('status_of_charger_connection', ('additionalVehicleStatus', 'electricVehicleStatus', 'statusOfChargerConnection'), StatusDecoder.to_int),
+        ('charge_led_ctrl', ('additionalVehicleStatus', 'electricVehicleStatus', 'chargeLEDCtrl'), StatusDecoder.to_int),
+        ('distance_to_empty_on_battery_only', ('additionalVehicleStatus', 'electricVehicleStatus', 'distanceToEmptyOnBatteryOnly'), StatusDecoder.to_float),
+        ('is_charging', ('additionalVehicleStatus', 'electricVehicleStatus', 'isCharging'), StatusDecoder.to_bool),
+        ('bmsh_chg_conn_state', ('additionalVehicleStatus', 'electricVehicleStatus', 'bmshChgConnState'), StatusDecoder.to_int),
+        ('time_to_fully_charged', ('additionalVehicleStatus', 'electricVehicleStatus', 'timeToFullyCharged'), StatusDecoder.to_int),
+        # 驾驶行为状态
+        ('cruise_control_status', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'cruiseControlStatus'), StatusDecoder.to_int),
+        ('engine_speed_validity', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'engineSpeedValidity'), StatusDecoder.to_int),
+        ('brake_pedal_depressed', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'brakePedalDepressed'), StatusDecoder.to_bool),
+        ('transimission_gear_postion', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'transimissionGearPostion'), StatusDecoder.to_enum(GearPosition)),
+        ('engine_speed', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'engineSpeed'), StatusDecoder.to_float),
+        ('brake_pedal_depressed_validity', ('additionalVehicleStatus', 'drivingBehaviourStatus', 'brakePedalDepressedValidity'), StatusDecoder.to_int),
+        # 运行状态
+        ('avg_speed', ('additionalVehicleStatus', 'runningStatus', 'avgSpeed'), StatusDecoder.to_float),
+        # 驾驶安全状态
+        ('door_lock_status_driver_rear', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorLockStatusDriverRear'), StatusDecoder.to_bool),
+        ('hand_brake_status', ('additionalVehicleStatus', 'drivingSafetyStatus', 'handBrakeStatus'), StatusDecoder.to_int),
+        ('seat_belt_status_driver', ('additionalVehicleStatus', 'drivingSafetyStatus', 'seatBeltStatusDriver'), StatusDecoder.to_bool),
+        ('door_open_status_passenger', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorOpenStatusPassenger'), StatusDecoder.to_bool),
+        ('door_lock_status_passenger', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorLockStatusPassenger'), StatusDecoder.to_bool),
+        ('door_open_status_driver', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorOpenStatusDriver'), StatusDecoder.to_bool),
+        ('door_lock_status_passenger_rear', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorLockStatusPassengerRear'), StatusDecoder.to_bool),
+        ('electric_park_brake_status', ('additionalVehicleStatus', 'drivingSafetyStatus', 'electricParkBrakeStatus'), StatusDecoder.to_int),
+        ('door_lock_status_driver', ('additionalVehicleStatus', 'drivingSafetyStatus', 'doorLockStatusDriver'), StatusDecoder.to_bool),
+        ('vehicle_alarm', ('additionalVehicleStatus', 'drivingSafetyStatus', 'vehicleAlarm'), StatusDecoder.raw),
+        ('trunk_open_status', ('additionalVehicleStatus', 'drivingSafetyStatus', 'trunkOpenStatus'), StatusDecoder.to_bool),
+    ]
+
     def __init__(self):
         # 基本状态信息
-        self.power_mode = None  # 上电状态，"0"为上电，"1"为未上电
+        self.power_mode = None  # 上电状态，PowerMode.ON 上电，PowerMode.OFF 未上电
         
         # 位置相关
         self.altitude = None  # 海拔高度
@@ -31,7 +164,7 @@ class VehicleStatus:
         self.remote_control_inhibited = None  # 遥控器是否失效
         
         # 数据时间
-        self.update_time = None  # 车辆数据上报时间
+        self.update_time = None  # 车辆数据上报时间（毫秒时间戳）
         
         # 保养信息
         self.distance_to_service = None  # 还有多少公里需要保养
@@ -45,7 +178,7 @@ class VehicleStatus:
         # 电动车状态
         self.is_plugged_in = None  # 是否已连接充电器
         self.aver_power_consumption = None  # 电耗
-        self.pt_ready = None  # 车辆是否准备就绪，"0"未就绪，"1"就绪
+        self.pt_ready = None  # 车辆是否准备就绪
         self.state_of_charge = None  # 状态充电量
         self.charge_level = None  # 电量百分比
         self.status_of_charger_connection = None  # 充电器连接状态
@@ -59,61 +192,121 @@ class VehicleStatus:
         self.cruise_control_status = None  # 巡航控制状态
         self.engine_speed_validity = None  # 发动机转速有效性
         self.brake_pedal_depressed = None  # 刹车踏板是否被踩下
-        self.transimission_gear_postion = None  # 变速器挡位位置，"3"空挡，"2"倒挡，"1"前进挡
+        self.transimission_gear_postion = None  # 变速器挡位位置，GearPosition
         self.engine_speed = None  # 发动机转速
         self.brake_pedal_depressed_validity = None  # 制动踏板踩下有效性
         
         # 驾驶安全状态
-        self.door_lock_status_driver_rear = None  # 后部驾驶员侧门锁状态，"0"未上锁，"1"已上锁
-        self.hand_brake_status = None  # 手刹状态，"0"拉起手刹，"1"放下手刹
+        self.door_lock_status_driver_rear = None  # 后部驾驶员侧门锁状态，True 已上锁
+        self.hand_brake_status = None  # 手刹状态，0 拉起手刹，1 放下手刹
         self.seat_belt_status_driver = None  # 驾驶员安全带状态
-        self.door_open_status_passenger = None  # 副驾驶门开启状态，"0"未打开，"1"已打开
-        self.door_lock_status_passenger = None  # 副驾驶门锁状态，"0"未上锁，"1"已上锁
-        self.door_open_status_driver = None  # 主驾驶门开启状态，"0"未打开，"1"已打开
-        self.door_lock_status_passenger_rear = None  # 后部副驾驶侧门锁状态，"0"未上锁，"1"已上锁
-        self.electric_park_brake_status = None  # 电动车制动状态，"0"驻车，"1"未驻车
-        self.door_lock_status_driver = None  # 主驾驶门锁状态，"0"未上锁，"1"已上锁
+        self.door_open_status_passenger = None  # 副驾驶门开启状态，True 已打开
+        self.door_lock_status_passenger = None  # 副驾驶门锁状态，True 已上锁
+        self.door_open_status_driver = None  # 主驾驶门开启状态，True 已打开
+        self.door_lock_status_passenger_rear = None  # 后部副驾驶侧门锁状态，True 已上锁
+        self.electric_park_brake_status = None  # 电动车制动状态，0 驻车，1 未驻车
+        self.door_lock_status_driver = None  # 主驾驶门锁状态，True 已上锁
         self.vehicle_alarm = None  # 车辆报警
-        self.trunk_open_status = None  # 后备箱开启状态，"0"为关闭，"1"为开启
+        self.trunk_open_status = None  # 后备箱开启状态，True 开启
+
+    @staticmethod
+    def _lookup(vehicle_status, path):
+        """按路径取值，返回 (父节点是否存在, 值)"""
+        node = vehicle_status
+        for key in path[:-1]:
+            if not isinstance(node, dict) or key not in node:
+                return False, None
+            node = node[key]
+        if not isinstance(node, dict):
+            return False, None
+        return True, node.get(path[-1])
+
+    def update_from_api(self, data):
+        """解析详细车辆状态接口的 data 字段，缺失的分组保持原值"""
+        if not data or 'vehicleStatus' not in data:
+            return self
+        vehicle_status = data['vehicleStatus']
+        for attr, path, decode in self.FIELDS:
+            found, value = self._lookup(vehicle_status, path)
+            if found:
+                setattr(self, attr, decode(value))
+        return self
+
+    @classmethod
+    def from_api(cls, data):
+        """从接口数据创建车辆状态对象"""
+        return cls().update_from_api(data)
+
+    @classmethod
+    def decode_batch(cls, records, fields=None):
+        """
+        批量解码历史数据（按列）
+        :param records: 详细车辆状态接口 data 字段的列表
+        :param fields: 需要的属性名，默认全部
+        :return: {属性名: [值, ...]}，每列与 records 一一对应
+        """
+        specs = [spec for spec in cls.FIELDS if fields is None or spec[0] in fields]
+        statuses = [(record or {}).get('vehicleStatus') or {} for record in records]
+        lookup = cls._lookup
+        columns = {}
+        for attr, path, decode in specs:
+            columns[attr] = [decode(lookup(status, path)[1]) for status in statuses]
+        return columns
+
+    @property
+    def powered_on(self):
+        """是否上电"""
+        return None if self.power_mode is None else self.power_mode == PowerMode.ON
+
+    @property
+    def update_datetime(self):
+        """数据上报时间"""
+        return None if self.update_time is None else datetime.fromtimestamp(self.update_time / 1000)
+
+    @staticmethod
+    def _format_number(value):
+        """数值去掉多余的小数位"""
+        return f"{value:g}" if isinstance(value, float) else str(value)
 
     def __str__(self):
         """返回车辆状态的字符串表示"""
         status_info = []
+        fmt = self._format_number
         
         if self.power_mode is not None:
-            power_status = "上电" if self.power_mode == "0" else "未上电"
+            power_status = "上电" if self.powered_on else "未上电"
             status_info.append(f"电源状态: {power_status}")
         
         if self.vin is not None:
             status_info.append(f"车辆VIN: {self.vin}")
         
         if self.distance_to_empty is not None:
-            status_info.append(f"剩余续航: {self.distance_to_empty}km")
+            status_info.append(f"剩余续航: {fmt(self.distance_to_empty)}km")
         
         if self.odometer is not None:
-            status_info.append(f"总行驶里程: {self.odometer}km")
+            status_info.append(f"总行驶里程: {fmt(self.odometer)}km")
         
         if self.distance_to_service is not None:
-            status_info.append(f"保养剩余里程: {self.distance_to_service}km")
+            status_info.append(f"保养剩余里程: {fmt(self.distance_to_service)}km")
         
         if self.speed is not None:
-            status_info.append(f"当前速度: {self.speed}km/h")
+            status_info.append(f"当前速度: {fmt(self.speed)}km/h")
         
         if self.charge_level is not None:
-            status_info.append(f"电量: {self.charge_level}%")
+            status_info.append(f"电量: {fmt(self.charge_level)}%")
         
         if self.voltage is not None:
-            status_info.append(f"电池电压: {self.voltage}V")
+            status_info.append(f"电池电压: {fmt(self.voltage)}V")
         
         if self.trunk_open_status is not None:
-            trunk_status = "打开" if self.trunk_open_status == "1" else "关闭"
+            trunk_status = "打开" if self.trunk_open_status else "关闭"
             status_info.append(f"后备箱: {trunk_status}")
         
         if self.latitude is not None and self.longitude is not None:
-            status_info.append(f"位置: 经度{self.longitude}, 纬度{self.latitude}, 海拔{self.altitude}米")
+            status_info.append(f"位置: 经度{fmt(self.longitude)}, 纬度{fmt(self.latitude)}, 海拔{fmt(self.altitude)}米")
             
         if self.update_time is not None:
-            time_str = datetime.fromtimestamp(int(self.update_time)/1000).strftime('%Y-%m-%d %H:%M:%S')
+            time_str = self.update_datetime.strftime('%Y-%m-%d %H:%M:%S')
             status_info.append(f"数据更新时间: {time_str}")
             
         return "\n".join(status_info)
@@ -143,12 +336,15 @@ class VehicleControl:
     CMD_START = "start"
     CMD_STOP = "stop"
     
-    def __init__(self, vehicle_id="", authorization=None):
+    def __init__(self, vehicle_id="", authorization=None, telemetry_store=None):
         # 初始化车辆控制信息
         self.vehicle_id = vehicle_id
         self.authorization = authorization
+        self.authorization_expires_in = None
         self.power_mode = None
         self.vehicle_status = VehicleStatus()  # 创建车辆状态对象
+        self.telemetry_store = telemetry_store  # 遥测历史存储（可选，VehicleTelemetryStore）
+        self.session = InstrumentedSession()  # 复用连接，连续控制指令不必重复握手
 
     # 计算Content-MD5值
     def calculate_content_md5(self, request_body):
@@ -180,10 +376,7 @@ class VehicleControl:
 
     # 生成随机nonce
     def generate_nonce(self, timestamp):
-        prefix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=3))
-        middle = ''.join(random.choices(string.ascii_lowercase + string.digits, k=12))
-        suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=7))
-        return f"{prefix}-{middle}{suffix}{timestamp}"
+        return NonceProvider.shared().vehicle_nonce(timestamp)
 
     # 构建通用请求头
     def build_common_headers(self, nonce, signature, timestamp, host, authorization=None):
@@ -229,19 +422,21 @@ class VehicleControl:
         signature = self.calculate_signature(nonce, body_md5_base64, timestamp, "POST", path, query_param)
         
         # 构造请求头
-        host = self.BASE_AUTH_URL.replace("https://", "")
+        host = urlparse(self.BASE_AUTH_URL).netloc
         headers = self.build_common_headers(nonce, signature, timestamp, host)
         
         # 发送POST请求
         try:
             self.log_operation("🔑 正在获取授权Token")
             
-            response = requests.post(url, headers=headers, data=request_body)
+            response = self.session.post(url, headers=headers, data=request_body)
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success') and result.get('code') == 1000:
                     self.authorization = result['data']['accessToken']
+                    # 有效期（秒），接口未返回时为 None
+                    self.authorization_expires_in = result['data'].get('expiresIn')
                     print(f"✅ 授权Token获取成功")
                     return self.authorization
                 else:
@@ -308,7 +503,7 @@ class VehicleControl:
         signature = self.calculate_signature(nonce, body_md5_base64, timestamp, "PUT", path)
         
         # 构造请求头
-        host = self.BASE_DEVICE_URL.replace("https://", "")
+        host = urlparse(self.BASE_DEVICE_URL).netloc
         headers = self.build_common_headers(nonce, signature, timestamp, host, self.authorization)
         
         # 发送PUT请求
@@ -316,7 +511,7 @@ class VehicleControl:
             self.log_operation(f"🔄 发送请求: {path}")
             print(f"请求体: {request_body}")
             
-            response = requests.put(url, headers=headers, data=request_body)
+            response = self.session.put(url, headers=headers, data=request_body)
             
             print(f"状态码: {response.status_code}")
             print(f"响应内容: {response.text}")
@@ -399,6 +594,11 @@ class VehicleControl:
             log_message="📦 开始执行关闭后备箱操作"
         )
         
+    # 创建指令队列，批量下发并确认执行结果
+    def command_queue(self, *names):
+        from utils.geely.vehicle_command_queue import VehicleCommandQueue
+        return VehicleCommandQueue(self).extend(names)
+
     # 获取车辆状态
     def get_vehicle_status(self, user_id=""):
         # 确保有授权Token
@@ -426,24 +626,25 @@ class VehicleControl:
         signature = self.calculate_signature(nonce, body_md5_base64, timestamp, "GET", path, query_param)
         
         # 构造请求头
-        host = self.BASE_DEVICE_URL.replace("https://", "")
+        host = urlparse(self.BASE_DEVICE_URL).netloc
         headers = self.build_common_headers(nonce, signature, timestamp, host, self.authorization)
         
         # 发送GET请求
         try:
             self.log_operation("🚗 获取车辆状态信息")
             
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success') and result.get('code') == "1000":
                     # 保存powerMode字段
-                    self.power_mode = result['data']['powerMode']
+                    raw_power_mode = result['data']['powerMode']
+                    self.power_mode = StatusDecoder.to_enum(PowerMode)(raw_power_mode)
                     self.vehicle_status.power_mode = self.power_mode
-                    power_status = "上电" if self.power_mode == "0" else "未上电"
+                    power_status = "上电" if self.vehicle_status.powered_on else "未上电"
                     print(f"✅ 获取车辆状态成功")
-                    print(f"📊 车辆上电状态: {power_status} (powerMode={self.power_mode})")
+                    print(f"📊 车辆上电状态: {power_status} (powerMode={raw_power_mode})")
                     return result['data']
                 else:
                     print(f"❌ 获取车辆状态失败: {result.get('message')}")
@@ -483,14 +684,14 @@ class VehicleControl:
         signature = self.calculate_signature(nonce, body_md5_base64, timestamp, "GET", path, query_param)
         
         # 构造请求头
-        host = self.BASE_DEVICE_URL.replace("https://", "")
+        host = urlparse(self.BASE_DEVICE_URL).netloc
         headers = self.build_common_headers(nonce, signature, timestamp, host, self.authorization)
         
         # 发送GET请求
         try:
             self.log_operation("🚗 获取详细车辆状态信息")
             
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -498,6 +699,10 @@ class VehicleControl:
                     # 解析并保存数据到VehicleStatus对象
                     self._parse_detailed_status(result['data'])
                     
+                    # 记录遥测历史
+                    if self.telemetry_store is not None:
+                        self.telemetry_store.append(self.vehicle_status)
+                    
                     print(f"✅ 获取详细车辆状态成功")
                     print(self.vehicle_status)
                     
@@ -515,99 +720,7 @@ class VehicleControl:
     
     # 解析详细车辆状态数据
     def _parse_detailed_status(self, data):
-        if not data or 'vehicleStatus' not in data:
-            return
-            
-        vehicle_status = data['vehicleStatus']
-        
-        # 基础车辆状态
-        if 'basicVehicleStatus' in vehicle_status:
-            basic = vehicle_status['basicVehicleStatus']
-            self.vehicle_status.distance_to_empty = basic.get('distanceToEmpty')
-            self.vehicle_status.speed = basic.get('speed')
-            self.vehicle_status.direction = basic.get('direction')
-            
-            # 位置信息
-            if 'position' in basic:
-                position = basic['position']
-                self.vehicle_status.latitude = position.get('latitude')
-                self.vehicle_status.longitude = position.get('longitude')
-                self.vehicle_status.altitude = position.get('altitude')
-                self.vehicle_status.position_can_be_trusted = position.get('posCanBeTrusted')
-        
-        # 配置信息
-        if 'configuration' in vehicle_status:
-            config = vehicle_status['configuration']
-            self.vehicle_status.fuel_type = config.get('fuelType')
-            self.vehicle_status.vin = config.get('vin')
-        
-        # 遥控器状态
-        self.vehicle_status.remote_control_inhibited = vehicle_status.get('remoteControlInhibited')
-        
-        # 更新时间
-        self.vehicle_status.update_time = vehicle_status.get('updateTime')
-        
-        # 附加车辆状态
-        if 'additionalVehicleStatus' in vehicle_status:
-            additional = vehicle_status['additionalVehicleStatus']
-            
-            # 保养状态
-            if 'maintenanceStatus' in additional:
-                maintenance = additional['maintenanceStatus']
-                self.vehicle_status.distance_to_service = maintenance.get('distanceToService')
-                self.vehicle_status.odometer = maintenance.get('odometer')
-                self.vehicle_status.brake_fluid_level_status = maintenance.get('brakeFluidLevelStatus')
-                self.vehicle_status.service_warning_status = maintenance.get('serviceWarningStatus')
-                
-                # 主电池状态
-                if 'mainBatteryStatus' in maintenance:
-                    battery = maintenance['mainBatteryStatus']
-                    self.vehicle_status.voltage = battery.get('voltage')
-            
-            # 电动车状态
-            if 'electricVehicleStatus' in additional:
-                electric = additional['electricVehicleStatus']
-                self.vehicle_status.is_plugged_in = electric.get('isPluggedIn')
-                self.vehicle_status.aver_power_consumption = electric.get('averPowerConsumption')
-                self.vehicle_status.pt_ready = electric.get('ptReady')
-                self.vehicle_status.state_of_charge = electric.get('stateOfCharge')
-                self.vehicle_status.charge_level = electric.get('chargeLevel')
-                self.vehicle_status.status_of_charger_connection = electric.get('statusOfChargerConnection')
-                self.vehicle_status.charge_led_ctrl = electric.get('chargeLEDCtrl')
-                self.vehicle_status.distance_to_empty_on_battery_only = electric.get('distanceToEmptyOnBatteryOnly')
-                self.vehicle_status.is_charging = electric.get('isCharging')
-                self.vehicle_status.bmsh_chg_conn_state = electric.get('bmshChgConnState')
-                self.vehicle_status.time_to_fully_charged = electric.get('timeToFullyCharged')
-            
-            # 驾驶行为状态
-            if 'drivingBehaviourStatus' in additional:
-                driving = additional['drivingBehaviourStatus']
-                self.vehicle_status.cruise_control_status = driving.get('cruiseControlStatus')
-                self.vehicle_status.engine_speed_validity = driving.get('engineSpeedValidity')
-                self.vehicle_status.brake_pedal_depressed = driving.get('brakePedalDepressed')
-                self.vehicle_status.transimission_gear_postion = driving.get('transimissionGearPostion')
-                self.vehicle_status.engine_speed = driving.get('engineSpeed')
-                self.vehicle_status.brake_pedal_depressed_validity = driving.get('brakePedalDepressedValidity')
-            
-            # 运行状态
-            if 'runningStatus' in additional:
-                running = additional['runningStatus']
-                self.vehicle_status.avg_speed = running.get('avgSpeed')
-            
-            # 驾驶安全状态
-            if 'drivingSafetyStatus' in additional:
-                safety = additional['drivingSafetyStatus']
-                self.vehicle_status.door_lock_status_driver_rear = safety.get('doorLockStatusDriverRear')
-                self.vehicle_status.hand_brake_status = safety.get('handBrakeStatus')
-                self.vehicle_status.seat_belt_status_driver = safety.get('seatBeltStatusDriver')
-                self.vehicle_status.door_open_status_passenger = safety.get('doorOpenStatusPassenger')
-                self.vehicle_status.door_lock_status_passenger = safety.get('doorLockStatusPassenger')
-                self.vehicle_status.door_open_status_driver = safety.get('doorOpenStatusDriver')
-                self.vehicle_status.door_lock_status_passenger_rear = safety.get('doorLockStatusPassengerRear')
-                self.vehicle_status.electric_park_brake_status = safety.get('electricParkBrakeStatus')
-                self.vehicle_status.door_lock_status_driver = safety.get('doorLockStatusDriver')
-                self.vehicle_status.vehicle_alarm = safety.get('vehicleAlarm')
-                self.vehicle_status.trunk_open_status = safety.get('trunkOpenStatus')
+        self.vehicle_status.update_from_api(data)
 
 def main():
     # 创建车辆控制实例
@@ -0,0 +1,77 @@
+'''
+Microsoft Graph JSON 批处理
+
+把多个请求合并成 $batch 信封发送（每个信封最多 20 个子请求，多个信封并发），逐个检查子请求的状态码；
+被限流（429）或遇到 502/503/504 的子请求按其中最长的 Retry-After 等待后重新打包重试；
+回复中缺少的子请求记为状态 0（失败）。
+信封本身走 Graph 客户端的中间件链（认证、重试、限流、统计）。
+'''
+import json
+import asyncio
+import httpx
+from urllib.parse import quote
+from kiota_abstractions.method import Method
+from kiota_abstractions.request_information import RequestInformation
+from utils.graph_throttle import GraphThrottle
+
+
+class GraphBatch:
+    MAX_REQUESTS = 20
+    MAX_ATTEMPTS = 4
+    RETRY_STATUS = (429, 502, 503, 504)
+    DEFAULT_RETRY_AFTER = 2
+
+    def __init__(self, graph_client):
+        self.request_adapter = graph_client.request_adapter
+
+    @staticmethod
+    def path(*segments):
+        """拼接子请求路径（相对 /v1.0），各段做 URL 编码，如 GraphBatch.path('me', 'messages', message_id)"""
+        return '/' + '/'.join(quote(str(segment), safe='') for segment in segments)
+
+    async def _post(self, requests):
+        request_info = RequestInformation(Method.POST, '{+baseurl}/$batch', {})
+        request_info.headers.try_add('Accept', 'application/json')
+        request_info.set_stream_content(json.dumps({'requests': requests}).encode('utf-8'), 'application/json')
+        content = await self.request_adapter.send_primitive_async(request_info, 'bytes', None)
+        return json.loads(content)['responses']
+
+    async def send(self, requests):
+        """
+        发送请求列表 [{'method', 'url', 'headers'(可选), 'body'(可选)}]，
+        返回按顺序对应的子响应 [{'status', 'headers', 'body'}]，重试用完时保留最后一次的响应，
+        回复中没有的子请求为 {'status': 0, 'body': None}
+        """
+        responses = [{'status': 0, 'body': None} for _ in requests]
+        pending = list(range(len(requests)))
+        for attempt in range(self.MAX_ATTEMPTS):
+            envelopes = [[dict(requests[i], id=str(i)) for i in pending[start:start + self.MAX_REQUESTS]]
+                         for start in range(0, len(pending), self.MAX_REQUESTS)]
+            retry, wait = [], 0.0
+            for envelope in await asyncio.gather(*(self._post(envelope) for envelope in envelopes)):
+                for response in envelope:
+                    index = int(response['id'])
+                    responses[index] = response
+                    if response.get('status') in self.RETRY_STATUS:
+                        retry.append(index)
+                        retry_after = GraphThrottle.retry_after(httpx.Headers(response.get('headers') or {}))
+                        wait = max(wait, self.DEFAULT_RETRY_AFTER if retry_after is None else retry_after)
+            if not retry or attempt == self.MAX_ATTEMPTS - 1:
+                break
+            await asyncio.sleep(wait)
+            pending = sorted(retry)
+        return responses
+
+    async def delete(self, paths):
+        """批量 DELETE，返回删除成功的路径集合；失败的子请求逐个打印原因"""
+        responses = await self.send([{'method': 'DELETE', 'url': path} for path in paths])
+        deleted = set()
+        for path, response in zip(paths, responses):
+            status = response.get('status', 0)
+            if 200 <= status < 300:
+                deleted.add(path)
+            else:
+                body = response.get('body')
+                error = (body.get('error') or {}).get('message', '') if isinstance(body, dict) else ''
+                print(f"  ⚠️ 删除失败 {path}: {status} {error[:80]}")
+        return deleted
@@ -0,0 +1,78 @@
+'''
+共享的 Microsoft Graph 客户端
+
+按账号在进程内复用 GraphServiceClient，连接池、HTTP/2 连接和令牌缓存在多个脚本、多次运行之间共享
+（ql_daemon 常驻时尤其明显）。底层 httpx 客户端使用调优过的传输层：
+- 开启 HTTP/2，并发请求在同一连接上多路复用
+- 显式的连接池上限和空闲连接保活时间
+- 连接、读写、等待连接池的超时
+- RetryHandler 最多重试 5 次；RedirectHandler 最多跟随 5 次，跨协议不跟随
+客户端创建时统一接入 HttpMetrics 统计和 GraphThrottle 限流。
+'''
+import asyncio
+import httpx
+from msgraph import GraphServiceClient, GraphRequestAdapter
+from msgraph.graph_request_adapter import options as default_options
+from msgraph_core import GraphClientFactory
+from kiota_http.middleware.options import RetryHandlerOption, RedirectHandlerOption
+from kiota_authentication_azure.azure_identity_authentication_provider import AzureIdentityAuthenticationProvider
+from utils.http_metrics import HttpMetrics
+from utils.graph_throttle import GraphThrottle
+
+
+class GraphClients:
+    SCOPES = ['https://graph.microsoft.com/.default']
+    LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120)
+    TIMEOUT = httpx.Timeout(60, connect=10, pool=30)
+    RETRY = RetryHandlerOption(delay=2, max_retries=5)
+    REDIRECT = RedirectHandlerOption(max_redirect=5)
+
+    _clients = {}  # key -> (事件循环, GraphServiceClient)
+
+    @classmethod
+    def transport(cls):
+        """底层传输：HTTP/2、连接池上限，建立连接失败时重试一次"""
+        return httpx.AsyncHTTPTransport(http2=True, limits=cls.LIMITS, retries=1)
+
+    @classmethod
+    def create(cls, credential, scopes=None):
+        """新建一个客户端（不缓存）"""
+        options = dict(default_options)
+        options[RetryHandlerOption.get_key()] = cls.RETRY
+        options[RedirectHandlerOption.get_key()] = cls.REDIRECT
+        http_client = GraphClientFactory.create_with_default_middleware(
+            client=httpx.AsyncClient(transport=cls.transport(), timeout=cls.TIMEOUT, http2=True),
+            options=options)
+        auth_provider = AzureIdentityAuthenticationProvider(credential, scopes=scopes or cls.SCOPES)
+        graph_client = GraphServiceClient(request_adapter=GraphRequestAdapter(auth_provider, client=http_client))
+        return GraphThrottle.install(HttpMetrics.instrument_graph(graph_client))
+
+    @classmethod
+    def shared(cls, key, credential, scopes=None):
+        """
+        按 key（如租户、应用、账号）复用客户端，首次调用时用传入的凭证创建
+        httpx 连接绑定事件循环，因此只在同一事件循环内复用，循环关闭后自动丢弃
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for cached_key, (cached_loop, _) in list(cls._clients.items()):
+            if cached_loop is not None and cached_loop.is_closed():
+                del cls._clients[cached_key]
+        cached = cls._clients.get(key)
+        if cached and cached[0] is loop:
+            return cached[1]
+        graph_client = cls.create(credential, scopes)
+        cls._clients[key] = (loop, graph_client)
+        return graph_client
+
+    @staticmethod
+    def query(request_builder, **params):
+        """
+        为 request_builder 的 GET 请求构造请求配置，select / top / orderby / filter 等参数在服务端生效，
+        只取需要的字段和条数，如 GraphClients.query(client.me.events, select=['id'], top=3, orderby=['start/dateTime'])
+        """
+        name = type(request_builder).__name__
+        query_params = getattr(request_builder, f'{name}GetQueryParameters')(**params)
+        return getattr(request_builder, f'{name}GetRequestConfiguration')(query_parameters=query_params)
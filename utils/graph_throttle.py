@@ -0,0 +1,205 @@
+'''
+Microsoft Graph 客户端限流
+
+按 Graph 的限流范围把请求分桶：Outlook（邮件、日历、To Do）、OneNote、OneDrive/SharePoint 按用户分桶，
+目录（用户、组等）、$batch 信封和其他请求按租户分桶。每个桶是一个令牌桶，同时限制并发请求数：
+- 收到 429/503 时按 Retry-After 暂停整个桶，并把速率减半，之后每个成功请求逐步恢复
+- 响应带 RateLimit-Remaining / RateLimit-Reset 时，把剩余额度均摊到重置前的这段时间
+以 kiota 中间件的形式插在 RetryHandler 之后，重试的请求同样要经过限流。
+环境变量 GRAPH_THROTTLE=0 时不启用。
+'''
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from kiota_http.middleware import BaseMiddleware, RetryHandler
+
+
+class TokenBucket:
+    MIN_FACTOR = 0.1  # 速率最低降到基准的比例
+
+    def __init__(self, name, rate, burst, concurrency):
+        """
+        :param rate: 每秒请求数
+        :param burst: 桶容量（允许的突发请求数）
+        :param concurrency: 同时进行的请求数
+        """
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """取一个令牌（桶被暂停或没有令牌时等待），返回等待的秒数"""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            delay = self.blocked_until - now
+            if delay <= 0:
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def on_throttled(self, retry_after):
+        self.pause(retry_after)
+        self.rate = max(self.base_rate * self.MIN_FACTOR, self.rate / 2)
+        self.tokens = 0.0
+
+    def on_success(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def on_quota(self, remaining, reset):
+        """服务端告知剩余额度：用完则暂停到重置，否则把速率降到均摊值"""
+        if remaining <= 0:
+            self.pause(reset)
+            self.tokens = 0.0
+        elif reset > 0:
+            self.rate = max(self.base_rate * self.MIN_FACTOR, min(self.rate, remaining / reset))
+
+
+class GraphThrottle(BaseMiddleware):
+    # 工作负载: (每秒请求数, 突发数, 并发数)，按 Graph 各服务的限流说明取值并留有余量
+    LIMITS = {
+        'outlook': (15, 15, 4),  # 每应用每邮箱 10 分钟 10000 个请求，并发 4
+        'onenote': (2, 20, 4),  # 每应用每用户每分钟 120 个请求
+        'drive': (20, 40, 8),  # OneDrive / SharePoint 按资源单位计，约每分钟 1250
+        'directory': (50, 100, 16),  # 用户、组等目录对象
+        'batch': (2, 4, 4),  # $batch 信封，每个最多 20 个子请求，子请求在服务端各自计入所属服务的限额
+        'other': (20, 40, 8),
+    }
+    PER_USER = ('outlook', 'onenote', 'drive')
+    DEFAULT_RETRY_AFTER = 5
+
+    OUTLOOK_SEGMENTS = {'messages', 'mailfolders', 'sendmail', 'events', 'calendar', 'calendars', 'calendarview',
+                        'contacts', 'contactfolders', 'mailboxsettings', 'todo', 'outlook'}
+    DRIVE_SEGMENTS = {'drive', 'drives', 'sites', 'shares'}
+    DIRECTORY_SEGMENTS = {'users', 'groups', 'directoryobjects', 'organization', 'applications',
+                          'serviceprincipals', 'subscribedskus', 'domains', 'me'}
+
+    def __init__(self, limits=None):
+        super().__init__()
+        self.limits = dict(self.LIMITS, **(limits or {}))
+        self.buckets = {}
+
+    @classmethod
+    def install(cls, graph_client, limits=None):
+        """插入到 Graph 客户端中间件链的 RetryHandler 之后，返回 graph_client"""
+        if os.environ.get('GRAPH_THROTTLE', '1').strip().lower() in ('0', 'false'):
+            return graph_client
+        pipeline = getattr(graph_client.request_adapter._http_client._transport, 'pipeline', None)
+        node = pipeline._first_middleware if pipeline else None
+        while node is not None and not isinstance(node, RetryHandler):
+            node = node.next
+        if node is None:
+            print("⚠️ Graph 客户端中间件链中没有 RetryHandler，未启用限流")
+            return graph_client
+        throttle = cls(limits)
+        throttle.next = node.next
+        node.next = throttle
+        if pipeline._current_middleware is node:
+            pipeline._current_middleware = throttle
+        return graph_client
+
+    @classmethod
+    def scope(cls, url):
+        """返回 (工作负载, 桶名)：me 或 users/{id} 下的 Outlook、OneNote、Drive 资源按用户分桶"""
+        segments = [s.lower() for s in url.path.split('/') if s]
+        if segments[:1] in (['v1.0'], ['beta']):
+            segments = segments[1:]
+        # SDK 的 /me 请求在 UrlReplaceHandler（位于本中间件之后）之前是 /users/me-token-to-replace
+        if segments[:2] == ['users', 'me-token-to-replace']:
+            segments = ['me'] + segments[2:]
+        if segments == ['$batch']:
+            return 'batch', 'batch'
+        user = None
+        if segments[:1] == ['me']:
+            user = 'me'
+        elif segments[:1] == ['users'] and len(segments) > 1:
+            user = segments[1]
+        rest = segments[1:] if user == 'me' else segments[2:] if user else segments
+        workload = 'other'
+        for segment in rest:
+            if segment == 'onenote':
+                workload = 'onenote'
+            elif segment in cls.OUTLOOK_SEGMENTS:
+                workload = 'outlook'
+            elif segment in cls.DRIVE_SEGMENTS:
+                workload = 'drive'
+            else:
+                continue
+            break
+        else:
+            if segments[:1] and segments[0] in cls.DIRECTORY_SEGMENTS:
+                workload = 'directory'
+        if workload in cls.PER_USER and user:
+            return workload, f'{workload}:{user}'
+        return workload, workload
+
+    def bucket(self, url):
+        workload, name = self.scope(url)
+        if name not in self.buckets:
+            self.buckets[name] = TokenBucket(name, *self.limits[workload])
+        return self.buckets[name]
+
+    @staticmethod
+    def retry_after(headers):
+        """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+        value = headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _header_number(headers, name):
+        try:
+            return float(headers[name])
+        except (KeyError, ValueError):
+            return None
+
+    def adapt(self, bucket, response):
+        """按响应状态和限流相关响应头调整桶"""
+        headers = response.headers
+        if response.status_code in (429, 503):
+            retry_after = self.retry_after(headers)
+            retry_after = self.DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+            bucket.on_throttled(retry_after)
+            print(f"⚠️ Graph 限流（{bucket.name}）：暂停 {retry_after:.0f} 秒，速率降到 {bucket.rate:.1f}/秒")
+        else:
+            bucket.on_success()
+        remaining = self._header_number(headers, 'RateLimit-Remaining')
+        reset = self._header_number(headers, 'RateLimit-Reset')
+        if remaining is not None and reset is not None:
+            bucket.on_quota(remaining, reset)
+
+    async def send(self, request, transport):
+        bucket = self.bucket(request.url)
+        async with bucket.semaphore:
+            await bucket.acquire()
+            response = await super().send(request, transport)
+        self.adapt(bucket, response)
+        return response
+
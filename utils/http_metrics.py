@@ -0,0 +1,536 @@
+'''
+HTTP 请求统计
+
+按 主机 / 接口 记录请求耗时直方图、状态码、异常、重试次数、收发字节数，
+以及按主机记录新建连接的 TCP（含 DNS 解析）和 TLS 握手耗时。
+进程结束时向标准输出打印一行 JSON 汇总（以 HTTP_METRICS 开头），保留在面板日志中；
+环境变量 HTTP_METRICS=0 时不统计、不输出。
+
+接入方式：
+- requests：使用 HttpMetrics.session() 共享会话，或用 InstrumentedSession 替代 requests.Session
+  （自定义连接池参数时挂载 TimedHTTPAdapter）
+- httpx / msgraph：HttpMetrics.instrument_httpx(client) 或 HttpMetrics.instrument_graph(graph_client)
+'''
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class Histogram:
+    '''
+        耗时直方图（毫秒），桶为累计上限
+    '''
+    BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, ms):
+        for i, bound in enumerate(self.BUCKETS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def quantile(self, q):
+        """按桶估算分位数，返回所在桶的上限（最后一个桶返回最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return round(min(self.BUCKETS[i], self.max) if i < len(self.BUCKETS) else self.max, 3)
+        return round(self.max, 3)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'min': None if self.min is None else round(self.min, 3),
+            'max': None if self.max is None else round(self.max, 3),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.BUCKETS + ('+Inf',), self.counts) if count},
+        }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.status = {}
+        self.errors = {}
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def to_dict(self):
+        return {
+            'count': self.latency.count,
+            'status': self.status,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'latency_ms': self.latency.to_dict(),
+        }
+
+
+class HostStats:
+    # 每个主机最多单独统计的接口数，超出的归入 "{other}"
+    MAX_ENDPOINTS = 100
+
+    def __init__(self):
+        self.endpoints = {}
+        self.connections = 0
+        self.connect = Histogram()
+        self.tls = Histogram()
+
+    def endpoint(self, name):
+        if name not in self.endpoints and len(self.endpoints) >= self.MAX_ENDPOINTS:
+            name = '{other}'
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+        return self.endpoints[name]
+
+    def to_dict(self):
+        endpoints = {name: stats.to_dict() for name, stats in self.endpoints.items()}
+        return {
+            'requests': sum(e['count'] for e in endpoints.values()),
+            'errors': sum(sum(e['errors'].values()) for e in endpoints.values()),
+            'retries': sum(e['retries'] for e in endpoints.values()),
+            'bytes_in': sum(e['bytes_in'] for e in endpoints.values()),
+            'bytes_out': sum(e['bytes_out'] for e in endpoints.values()),
+            'connections': self.connections,
+            'connect_ms': self.connect.to_dict(),
+            'tls_ms': self.tls.to_dict(),
+            'endpoints': endpoints,
+        }
+
+
+class HttpMetrics:
+    enabled = os.environ.get('HTTP_METRICS', '1') != '0'
+
+    _hosts = {}
+    _lock = threading.Lock()
+    _started = time.time()
+    _atexit_registered = False
+    _session = None
+
+    # 路径中的 ID 段（纯数字、邮箱、含冒号/百分号的段、较长的字母数字混合串）统一替换为 {id}
+    _ID_SEGMENT = re.compile(r'^(\d+|.*[@:%].*|(?=.*\d)[\w.-]{16,})$')
+    # msgraph SDK 的 /me 请求在 UrlReplaceHandler 改写之前（在 httpx 客户端一层统计时看到的）是 /users/me-token-to-replace
+    _ME_PLACEHOLDER = re.compile(r'/users/me-token-to-replace(?=/|$)')
+
+    @staticmethod
+    def endpoint_name(method, url):
+        """请求方法 + 去掉查询参数和 ID 的路径"""
+        path = HttpMetrics._ME_PLACEHOLDER.sub('/me', urlsplit(str(url)).path or '/', count=1)
+        segments = ['{id}' if HttpMetrics._ID_SEGMENT.match(s) else s for s in path.split('/')]
+        return f"{method.upper()} {'/'.join(segments)}"
+
+    @staticmethod
+    def _host(host):
+        HttpMetrics._register_atexit()
+        if host not in HttpMetrics._hosts:
+            HttpMetrics._hosts[host] = HostStats()
+        return HttpMetrics._hosts[host]
+
+    @staticmethod
+    def record(method, url, elapsed_ms, status=None, error=None, retries=0, bytes_in=0, bytes_out=0):
+        """记录一次请求；失败时 status 为 None，error 为异常类名"""
+        if not HttpMetrics.enabled:
+            return
+        host = urlsplit(str(url)).hostname or ''
+        with HttpMetrics._lock:
+            stats = HttpMetrics._host(host).endpoint(HttpMetrics.endpoint_name(method, url))
+            stats.latency.observe(elapsed_ms)
+            if status is not None:
+                stats.status[str(status)] = stats.status.get(str(status), 0) + 1
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+            stats.retries += retries
+            stats.bytes_in += bytes_in or 0
+            stats.bytes_out += bytes_out or 0
+
+    @staticmethod
+    def record_connection(host, connect_ms=None, tls_ms=None):
+        """记录一次新建连接的 TCP（含 DNS）和 TLS 耗时"""
+        if not HttpMetrics.enabled:
+            return
+        with HttpMetrics._lock:
+            stats = HttpMetrics._host(host or '')
+            stats.connections += 1
+            if connect_ms is not None:
+                stats.connect.observe(connect_ms)
+            if tls_ms is not None:
+                stats.tls.observe(tls_ms)
+
+    @staticmethod
+    def summary():
+        with HttpMetrics._lock:
+            hosts = {host: stats.to_dict() for host, stats in HttpMetrics._hosts.items()}
+        return {
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'pid': os.getpid(),
+            'duration_s': round(time.time() - HttpMetrics._started, 3),
+            'requests': sum(h['requests'] for h in hosts.values()),
+            'errors': sum(h['errors'] for h in hosts.values()),
+            'hosts': hosts,
+        }
+
+    @staticmethod
+    def dump():
+        """打印 JSON 汇总（没有请求时不输出）"""
+        if not HttpMetrics.enabled or not HttpMetrics._hosts:
+            return
+        print('HTTP_METRICS ' + json.dumps(HttpMetrics.summary(), ensure_ascii=False, separators=(',', ':')), flush=True)
+
+    @staticmethod
+    def reset():
+        with HttpMetrics._lock:
+            HttpMetrics._hosts = {}
+            HttpMetrics._started = time.time()
+
+    @staticmethod
+    def _register_atexit():
+        if not HttpMetrics._atexit_registered:
+            HttpMetrics._atexit_registered = True
+            atexit.register(HttpMetrics.dump)
+
+    # ---------- requests ----------
+
+    @staticmethod
+    def session():
+        """进程内共享的 requests 会话（复用连接，并统计请求）"""
+        if HttpMetrics._session is None:
+            with HttpMetrics._lock:
+                if HttpMetrics._session is None:
+                    HttpMetrics._session = InstrumentedSession()
+        return HttpMetrics._session
+
+    # ---------- httpx ----------
+
+    @staticmethod
+    def instrument_httpx(client):
+        """
+        包住 httpx.Client / httpx.AsyncClient 的传输层统计请求，返回 client
+        从发出请求计到响应体读完（或请求失败），字节数按实际经过的请求体 / 响应体（压缩后）计算
+        """
+        if not HttpMetrics.enabled or httpx is None:
+            return client
+        metered = _MeteredAsyncTransport if isinstance(client, httpx.AsyncClient) else _MeteredTransport
+        if not isinstance(client._transport, metered):
+            client._transport = metered(client._transport)
+        for pattern, transport in client._mounts.items():
+            if transport is not None and not isinstance(transport, metered):
+                client._mounts[pattern] = metered(transport)
+        return client
+
+    @staticmethod
+    def instrument_graph(graph_client):
+        """
+        统计 msgraph GraphServiceClient 的请求，返回 graph_client
+        包住 kiota 中间件链末端的传输层：每次实际发出的请求（含重试）分别计，地址已经过 UrlReplaceHandler 改写
+        """
+        if not HttpMetrics.enabled or httpx is None:
+            return graph_client
+        http_client = graph_client.request_adapter._http_client
+        pipeline = getattr(http_client._transport, 'pipeline', None)
+        if pipeline is None:
+            HttpMetrics.instrument_httpx(http_client)
+        elif not isinstance(pipeline._transport, _MeteredAsyncTransport):
+            pipeline._transport = _MeteredAsyncTransport(pipeline._transport)
+        return graph_client
+
+    @staticmethod
+    def _httpx_trace(request, asynchronous):
+        """通过 httpcore 的 trace 扩展记录新建连接的 TCP / TLS 耗时"""
+        host = request.url.host
+        started = {}
+
+        def on_event(name, info):
+            # connection.connect_tcp.* / connection.start_tls.*
+            if name.endswith('.started'):
+                started[name[:-len('.started')]] = time.perf_counter()
+            elif name.endswith('.complete'):
+                step = name[:-len('.complete')]
+                if step in started:
+                    started[step] = (time.perf_counter() - started[step]) * 1000
+                if step == 'connection.start_tls' or (step == 'connection.connect_tcp' and request.url.scheme != 'https'):
+                    HttpMetrics.record_connection(host, started.get('connection.connect_tcp'),
+                                                  started.get('connection.start_tls'))
+
+        if asynchronous:
+            async def trace(name, info):
+                on_event(name, info)
+        else:
+            def trace(name, info):
+                on_event(name, info)
+        request.extensions['trace'] = trace
+
+    @staticmethod
+    def _httpx_record(request, url, start, status=None, error=None, bytes_in=0, bytes_out=0):
+        # kiota 的重试中间件会在重试的请求上加 Retry-Attempt 头
+        try:
+            retries = int(request.headers.get('Retry-Attempt', 0))
+        except ValueError:
+            retries = 0
+        HttpMetrics.record(request.method, url, (time.perf_counter() - start) * 1000, status=status, error=error,
+                           retries=retries, bytes_in=bytes_in, bytes_out=bytes_out)
+
+
+# ---------- requests / urllib3 接入 ----------
+
+class _TimedConnectionMixin:
+    '''
+        记录新建连接的 TCP（含 DNS 解析）和 TLS 握手耗时
+    '''
+    _tcp_ms = None
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_ms = (time.perf_counter() - start) * 1000
+
+    def connect(self):
+        self._tcp_ms = None
+        start = time.perf_counter()
+        super().connect()
+        total = (time.perf_counter() - start) * 1000
+        tls = None
+        if isinstance(self, HTTPSConnection) and self._tcp_ms is not None:
+            tls = max(total - self._tcp_ms, 0.0)
+        HttpMetrics.record_connection(self.host, self._tcp_ms, tls)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    '''
+        统计经过本适配器的每次请求（重定向的每一跳分别计），连接池使用带计时的连接，参数与 HTTPAdapter 相同
+    '''
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, stream=False, **kwargs):
+        start = time.perf_counter()
+        bytes_out = len(request.body) if isinstance(request.body, (bytes, str)) else 0
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        except Exception as e:
+            HttpMetrics.record(request.method, request.url, (time.perf_counter() - start) * 1000,
+                               error=type(e).__name__, bytes_out=bytes_out)
+            raise
+        retries = getattr(getattr(response.raw, 'retries', None), 'history', None) or ()
+        streamed = [0]
+        if hasattr(response.raw, 'stream'):
+            raw_stream = response.raw.stream
+
+            def counted_stream(*args, **kwargs):
+                for chunk in raw_stream(*args, **kwargs):
+                    streamed[0] += len(chunk)
+                    yield chunk
+
+            response.raw.stream = counted_stream
+
+        def record():
+            # 分块传输和压缩响应没有准确的 Content-Length，按实际读到的（压缩后）字节数计；
+            # urllib3 经 iter_content 读取分块响应时不计入 tell()，此时改用解码后的字节数
+            tell = getattr(response.raw, 'tell', None)
+            bytes_in = (tell() if callable(tell) else 0) or streamed[0]
+            HttpMetrics.record(request.method, request.url, (time.perf_counter() - start) * 1000,
+                               status=response.status_code, retries=len(retries),
+                               bytes_in=bytes_in, bytes_out=bytes_out)
+
+        if not stream:
+            # 非流式请求在这里读取内容（会话随后也会读取，内容已缓存）
+            try:
+                response.content
+            except Exception as e:
+                HttpMetrics.record(request.method, request.url, (time.perf_counter() - start) * 1000,
+                                   error=type(e).__name__, bytes_out=bytes_out)
+                raise
+            record()
+            return response
+        # 流式响应在关闭时（with 语句结束或调用 close）记录，耗时包括读取响应体
+        close = response.close
+
+        def metered_close():
+            try:
+                close()
+            finally:
+                if response.__dict__.pop('close', None) is not None:
+                    record()
+
+        response.close = metered_close
+        return response
+
+
+class InstrumentedSession(requests.Session):
+    '''
+        默认挂载 TimedHTTPAdapter 的 requests.Session
+    '''
+    def __init__(self):
+        super().__init__()
+        self.mount('https://', TimedHTTPAdapter())
+        self.mount('http://', TimedHTTPAdapter())
+
+
+# ---------- httpx 接入 ----------
+
+if httpx is not None:
+    class _MeteredStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+        '''
+            统计经过的字节数，读取出错时记下异常类名，关闭时回调 on_close(字节数, 异常类名)（只回调一次）
+        '''
+        def __init__(self, inner, on_close=None):
+            self.inner = inner
+            self.on_close = on_close
+            self.bytes = 0
+            self.error = None
+
+        def __iter__(self):
+            try:
+                for chunk in self.inner:
+                    self.bytes += len(chunk)
+                    yield chunk
+            except Exception as e:
+                self.error = type(e).__name__
+                raise
+
+        async def __aiter__(self):
+            try:
+                async for chunk in self.inner:
+                    self.bytes += len(chunk)
+                    yield chunk
+            except Exception as e:
+                self.error = type(e).__name__
+                raise
+
+        def _closed(self):
+            if self.on_close is not None:
+                self.on_close, on_close = None, self.on_close
+                on_close(self.bytes, self.error)
+
+        def close(self):
+            try:
+                if hasattr(self.inner, 'close'):
+                    self.inner.close()
+            finally:
+                self._closed()
+
+        async def aclose(self):
+            try:
+                if hasattr(self.inner, 'aclose'):
+                    await self.inner.aclose()
+            finally:
+                self._closed()
+
+    class _MeteredTransport(httpx.BaseTransport):
+        '''
+            包住 httpx.Client 的传输层：请求异常计入 errors，收发字节数按实际经过的数据计算
+        '''
+        asynchronous = False
+
+        def __init__(self, inner):
+            self.inner = inner
+
+        def _start(self, request):
+            # 记录发出时的地址，内层传输改写地址（如指向本地模拟服务）时仍按原主机统计
+            url = request.url
+            HttpMetrics._httpx_trace(request, self.asynchronous)
+            request.stream = sent = _MeteredStream(request.stream)
+            return url, sent, time.perf_counter()
+
+        @staticmethod
+        def _failed(request, url, sent, start, error):
+            HttpMetrics._httpx_record(request, url, start, error=type(error).__name__, bytes_out=sent.bytes)
+
+        @staticmethod
+        def _metered(request, response, url, sent, start):
+            def record(received, error=None):
+                HttpMetrics._httpx_record(request, url, start, status=response.status_code, error=error,
+                                          bytes_in=received, bytes_out=sent.bytes)
+
+            if response.is_closed:
+                # 内层直接构造的响应（如 MockTransport）已读完，不会再经过流
+                record(len(response.content))
+            else:
+                response.stream = _MeteredStream(response.stream, record)
+            return response
+
+        def handle_request(self, request):
+            url, sent, start = self._start(request)
+            try:
+                response = self.inner.handle_request(request)
+            except Exception as e:
+                self._failed(request, url, sent, start, e)
+                raise
+            return self._metered(request, response, url, sent, start)
+
+        def close(self):
+            self.inner.close()
+
+    class _MeteredAsyncTransport(_MeteredTransport, httpx.AsyncBaseTransport):
+        '''
+            与 _MeteredTransport 相同，用于 httpx.AsyncClient
+        '''
+        asynchronous = True
+
+        async def handle_async_request(self, request):
+            url, sent, start = self._start(request)
+            try:
+                response = await self.inner.handle_async_request(request)
+            except Exception as e:
+                self._failed(request, url, sent, start, e)
+                raise
+            return self._metered(request, response, url, sent, start)
+
+        async def aclose(self):
+            await self.inner.aclose()
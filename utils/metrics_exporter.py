@@ -0,0 +1,219 @@
+'''
+Prometheus / OpenMetrics 指标导出
+
+每个脚本用 Metrics.for_job(job) 记录 gauge、counter 和运行耗时，所有指标自动带 job 标签：
+- 设置环境变量 METRICS_TEXTFILE_DIR 时，每次运行结束把本脚本的指标原子写入 <目录>/<job>.prom，
+  供 node-exporter 的 textfile collector 采集；counter 的累计值保存在同目录的 .<job>.counters.json 中，跨进程累加
+- 常驻进程（ql_daemon）设置 METRICS_PORT 时，用 Metrics.serve() 在该端口的 /metrics 提供所有脚本的指标
+两者都没有配置时只在内存中记录，不产生任何输出。
+
+每次运行会记录：
+    qinglong_script_runs_total{job, result="success|failure"}
+    qinglong_script_run_duration_seconds{job}
+    qinglong_script_last_run_timestamp_seconds{job}
+    qinglong_script_last_success{job}
+'''
+import os
+import time
+import inspect
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.state_store import StateStore
+
+
+class Metrics:
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    _registries = {}  # job -> Metrics
+    _registries_lock = threading.Lock()
+    _server = None
+
+    def __init__(self, job):
+        self.job = job
+        self.textfile_dir = os.environ.get('METRICS_TEXTFILE_DIR') or None
+        self._lock = threading.Lock()
+        self._help = {}  # 指标名 -> (类型, 说明)
+        self._gauges = {}  # (指标名, 标签) -> 值
+        self._counters = {}  # (指标名, 标签) -> 本进程累计值
+        self._flushed = {}  # (指标名, 标签) -> 已写入累计文件的值
+        self._failed = False
+
+    @classmethod
+    def for_job(cls, job):
+        """进程内按 job 共享的实例（常驻进程中多次运行时 counter 持续累加）"""
+        with cls._registries_lock:
+            if job not in cls._registries:
+                cls._registries[job] = cls(job)
+            return cls._registries[job]
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _describe(self, name, kind, help_text):
+        if help_text or name not in self._help:
+            self._help[name] = (kind, help_text or '')
+
+    def gauge(self, name, value, help=None, **labels):
+        """设置 gauge；value 为 None 时不记录"""
+        if value is None:
+            return
+        with self._lock:
+            self._describe(name, 'gauge', help)
+            self._gauges[(name, self._labels(labels))] = float(value)
+
+    def counter(self, name, value=1, help=None, **labels):
+        """counter 累加（名称应以 _total 结尾）"""
+        with self._lock:
+            self._describe(name, 'counter', help)
+            key = (name, self._labels(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def fail(self):
+        """标记本次运行失败（脚本自己捕获了异常时调用）"""
+        self._failed = True
+
+    def track(self, func):
+        """
+        装饰脚本的 main（同步或协程）：记录运行次数、结果、耗时，结束后写出指标
+        main 抛出异常或调用过 fail() 视为失败
+        """
+        def finish(start, failed):
+            self.gauge('qinglong_script_run_duration_seconds', time.perf_counter() - start, '最近一次运行耗时')
+            self.gauge('qinglong_script_last_run_timestamp_seconds', time.time(), '最近一次运行结束时间')
+            self.gauge('qinglong_script_last_success', 0 if failed else 1, '最近一次运行是否成功')
+            self.counter('qinglong_script_runs_total', 1, '运行次数', result='failure' if failed else 'success')
+            self.flush()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                self._failed = False
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    finish(start, True)
+                    raise
+                finish(start, self._failed)
+                return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                self._failed = False
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    finish(start, True)
+                    raise
+                finish(start, self._failed)
+                return result
+        return wrapper
+
+    # ---------- 输出 ----------
+
+    @staticmethod
+    def _escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def _format_value(value):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(float(value)) if not float(value).is_integer() or abs(value) >= 1e15 else str(int(value))
+
+    def _families(self, counters=None):
+        """{指标名: (类型, 说明, [(标签文本, 值)])}，标签含 job"""
+        with self._lock:
+            samples = list(self._gauges.items()) + list((self._counters if counters is None else counters).items())
+            help_map = dict(self._help)
+        families = {}
+        for (name, labels), value in samples:
+            kind, help_text = help_map.get(name, ('untyped', ''))
+            label_text = ','.join(f'{k}="{self._escape(v)}"' for k, v in (('job', self.job),) + tuple(labels))
+            families.setdefault(name, (kind, help_text, []))[2].append((label_text, value))
+        return families
+
+    @staticmethod
+    def _render(families):
+        """Prometheus 文本格式，同名指标的样本放在一起"""
+        lines = []
+        for name in sorted(families):
+            kind, help_text, samples = families[name]
+            if help_text:
+                lines.append(f'# HELP {name} {Metrics._escape(help_text)}')
+            lines.append(f'# TYPE {name} {kind}')
+            for label_text, value in sorted(samples):
+                lines.append(f'{name}{{{label_text}}} {Metrics._format_value(value)}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def render(self, counters=None):
+        return self._render(self._families(counters))
+
+    def flush(self):
+        """配置了 METRICS_TEXTFILE_DIR 时写出 <job>.prom"""
+        if not self.textfile_dir:
+            return
+        try:
+            counters = self._persist_counters()
+            StateStore.atomic_write(os.path.join(self.textfile_dir, f'{self.job}.prom'), self.render(counters))
+        except Exception as e:
+            print(f"⚠️ 写入指标文件失败: {e}")
+
+    def _persist_counters(self):
+        """把本进程新增的 counter 增量累加到状态文件，返回累计值"""
+        store = StateStore(os.path.join(self.textfile_dir, f'.{self.job}.counters.json'), default=dict)
+        with self._lock:
+            delta = {key: value - self._flushed.get(key, 0) for key, value in self._counters.items()}
+            self._flushed = dict(self._counters)
+        with store.transaction() as data:
+            for (name, labels), value in delta.items():
+                key = name + '|' + '|'.join(f'{k}={v}' for k, v in labels)
+                entry = data.setdefault(key, {'name': name, 'labels': [list(l) for l in labels], 'value': 0})
+                entry['value'] += value
+            return {(e['name'], tuple(tuple(l) for l in e['labels'])): e['value'] for e in data.values()}
+
+    # ---------- 常驻进程 HTTP 接口 ----------
+
+    @staticmethod
+    def render_all():
+        """进程内所有 job 的指标"""
+        with Metrics._registries_lock:
+            registries = list(Metrics._registries.values())
+        families = {}
+        for registry in registries:
+            for name, (kind, help_text, samples) in registry._families().items():
+                families.setdefault(name, (kind, help_text, []))[2].extend(samples)
+        return Metrics._render(families)
+
+    @staticmethod
+    def serve(port, host='0.0.0.0'):
+        """在后台线程提供 /metrics，返回 HTTP 服务对象"""
+        if Metrics._server is not None:
+            return Metrics._server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = Metrics.render_all().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', Metrics.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        Metrics._server = server
+        print(f"指标接口: http://{host}:{server.server_address[1]}/metrics")
+        return server
@@ -1,7 +1,7 @@
-import requests
 import os
 from urllib.parse import quote
 from enum import Enum
+from utils.http_metrics import HttpMetrics
 
 class BarkNotify:
     '''
@@ -43,5 +43,5 @@ class BarkNotify:
         if url:
             payload['url'] = url
 
-        result = requests.post(notify_api, json=payload).json()
+        result = HttpMetrics.session().post(notify_api, json=payload).json()
         return result
\ No newline at end of file
@@ -0,0 +1,86 @@
+import re
+import hashlib
+import requests
+from utils.state_store import StateStore
+
+
+class PageWatcher:
+    '''
+        页面变更监测：保存每个 URL 最新的 ETag / Last-Modified，发送条件请求，
+        304 直接视为未变更；200 时比较关注区域文本的哈希，忽略样式等无关改动
+    '''
+    DEFAULT_STATE_PATH = '/ql/data/page_watch_state.json'
+    _USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+
+    def __init__(self, state_path=DEFAULT_STATE_PATH, session=None):
+        self.state_path = state_path
+        self.store = StateStore(state_path, default=dict)
+        self.state = self.store.load()
+        self._checked = set()
+        # 所有页面共用连接池
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("user-agent", self._USER_AGENT)
+
+    def save(self):
+        # 只写回本次检查过的 URL，保留其他进程写入的记录
+        with self.store.lock():
+            state = self.store.load()
+            state.update({url: self.state[url] for url in self._checked})
+            self.store.save(state)
+        self.state = state
+
+    @staticmethod
+    def content_hash(html, region=None):
+        """
+        计算关注区域的文本哈希
+        :param region: 正则表达式（取第一个匹配）或函数 html -> str，默认整页
+        """
+        if callable(region):
+            text = region(html) or ''
+        elif region:
+            match = re.search(region, html)
+            text = match.group(0) if match else html
+        else:
+            text = html
+        # 去掉标签和多余空白，只比较文本内容
+        text = re.sub(r'<script[\s\S]*?</script>|<style[\s\S]*?</style>', ' ', text)
+        text = re.sub(r'<[^>]+>', ' ', text)
+        text = ' '.join(text.split())
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def check(self, url, region=None, etag=None, last_modified=None):
+        """
+        检查页面是否变更
+        :param etag / last_modified: 尚无保存状态时使用的初始校验值
+        :return: {'changed': bool, 'status': 状态码, 'last_modified': str}
+        """
+        entry = self.state.get(url, {})
+        etag = entry.get('etag', etag)
+        last_modified = entry.get('last_modified', last_modified)
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return {'changed': False, 'status': 304, 'last_modified': last_modified}
+        response.raise_for_status()
+
+        digest = self.content_hash(response.text, region)
+        if 'hash' in entry:
+            changed = digest != entry['hash']
+        else:
+            # 首次运行：带了初始校验值却返回 200，说明页面已不同于已知版本
+            changed = bool(etag or last_modified)
+
+        self.state[url] = {
+            'etag': response.headers.get("ETag"),
+            'last_modified': response.headers.get("Last-Modified"),
+            'hash': digest,
+        }
+        self._checked.add(url)
+        self.save()
+        return {'changed': changed, 'status': response.status_code, 'last_modified': response.headers.get("Last-Modified")}
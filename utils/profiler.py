@@ -0,0 +1,229 @@
+'''
+运行分析
+
+用环境变量开启（如 E5_PROFILE=1，或直接给出输出文件路径），把一次运行拆成若干 span，
+记录每个 span 的耗时、期间的 HTTP 请求数和请求耗时、以及主动等待（asyncio.sleep 节奏控制）的时间，
+结束时写出 Chrome trace 格式的 JSON（可用 chrome://tracing、Perfetto 或 speedscope 打开查看火焰图），
+并打印按 span 汇总的耗时表。未开启时所有接口都是空操作。
+'''
+import os
+import sys
+import json
+import time
+import functools
+import contextvars
+import httpx
+from contextlib import contextmanager
+from datetime import datetime
+from utils.state_store import StateStore
+from utils.http_metrics import HttpMetrics
+
+
+class Span:
+    def __init__(self, name, cat, parent, args):
+        self.name = name
+        self.cat = cat
+        self.parent = parent
+        self.args = args
+        self.start = time.perf_counter()
+        self.end = None
+        self.requests = 0
+        self.http_ms = 0.0
+        self.sleep_ms = 0.0
+
+    def ancestors(self):
+        span = self
+        while span is not None:
+            yield span
+            span = span.parent
+
+
+class Profiler:
+    DEFAULT_DIR = '/ql/data/profiles'
+
+    def __init__(self, path=None, name='profile'):
+        """
+        :param path: 输出文件路径，为 None 时不分析
+        """
+        self.path = path
+        self.name = name
+        self.enabled = path is not None
+        self.events = []
+        self.origin = time.perf_counter()
+        self._current = contextvars.ContextVar(f'profiler_span_{id(self)}', default=None)
+
+    @classmethod
+    def from_env(cls, env, name):
+        """
+        按环境变量创建：未设置或为 0 时不分析；为 1/true 时写到默认目录；其他值视为输出路径（目录则在其中生成文件名）
+        """
+        value = os.environ.get(env, '').strip()
+        if not value or value.lower() in ('0', 'false'):
+            return cls(None, name)
+        file_name = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        if value.lower() in ('1', 'true'):
+            path = os.path.join(cls.DEFAULT_DIR, file_name)
+        elif os.path.isdir(value) or value.endswith(os.sep):
+            path = os.path.join(value, file_name)
+        else:
+            path = value
+        return cls(path, name)
+
+    def _ts(self, moment):
+        return round((moment - self.origin) * 1e6, 1)
+
+    @contextmanager
+    def span(self, name, cat='activity', **args):
+        """记录一个 span，可嵌套（按 asyncio 上下文区分父子关系）"""
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, cat, self._current.get(), args)
+        token = self._current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            self._current.reset(token)
+            wall_ms = (span.end - span.start) * 1000
+            self.events.append({
+                'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': 1,
+                'ts': self._ts(span.start), 'dur': round(wall_ms * 1000, 1),
+                'args': dict(args, wall_ms=round(wall_ms, 3), requests=span.requests,
+                             http_ms=round(span.http_ms, 3), sleep_ms=round(span.sleep_ms, 3),
+                             other_ms=round(max(wall_ms - span.http_ms - span.sleep_ms, 0), 3)),
+            })
+
+    @contextmanager
+    def pacing(self):
+        """包住主动等待（asyncio.sleep），等待时间计入所在 span 的 sleep_ms 而不是 I/O"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            for span in self._ancestors():
+                span.sleep_ms += (end - start) * 1000
+            self.events.append({'name': 'sleep', 'cat': 'pacing', 'ph': 'X', 'pid': os.getpid(), 'tid': 1,
+                                'ts': self._ts(start), 'dur': round((end - start) * 1e6, 1)})
+
+    def _ancestors(self):
+        current = self._current.get()
+        return current.ancestors() if current is not None else ()
+
+    @staticmethod
+    def traced(name=None):
+        """协程方法装饰器：方法执行期间记录为一个 span（默认以方法名命名），实例需有 profiler 属性"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                with self.profiler.span(name or func.__name__):
+                    return await func(self, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_graph(self, graph_client):
+        """
+        统计 msgraph 请求：在中间件链末端的传输层计时，每次实际发出的请求（含重试）记为一个 http 事件并计入所在 span，
+        GraphThrottle 令牌桶的等待和 RetryHandler 的重试间隔不算作请求耗时
+        """
+        if not self.enabled:
+            return graph_client
+        pipeline = getattr(graph_client.request_adapter._http_client._transport, 'pipeline', None)
+        if pipeline is None:
+            print("⚠️ Graph 客户端没有中间件链，未统计请求")
+            return graph_client
+        # 客户端是共享的，先去掉之前的分析器包上的一层
+        transport = pipeline._transport
+        if isinstance(transport, _ProfiledTransport):
+            transport = transport.inner
+        pipeline._transport = _ProfiledTransport(transport, self)
+        return graph_client
+
+    def record_request(self, request, status, start, end):
+        for span in self._ancestors():
+            span.requests += 1
+            span.http_ms += (end - start) * 1000
+        self.events.append({
+            'name': HttpMetrics.endpoint_name(request.method, request.url), 'cat': 'http',
+            'ph': 'X', 'pid': os.getpid(), 'tid': 1, 'ts': self._ts(start), 'dur': round((end - start) * 1e6, 1),
+            'args': {'status': status},
+        })
+
+    def summary(self):
+        """按 span 名称汇总：次数、总耗时、请求数、请求耗时、等待耗时、其他耗时（毫秒）"""
+        rows = {}
+        for event in self.events:
+            if event['cat'] in ('http', 'pacing'):
+                continue
+            row = rows.setdefault(event['name'], {'count': 0, 'wall_ms': 0.0, 'requests': 0,
+                                                  'http_ms': 0.0, 'sleep_ms': 0.0, 'other_ms': 0.0})
+            row['count'] += 1
+            for key in ('wall_ms', 'requests', 'http_ms', 'sleep_ms', 'other_ms'):
+                row[key] += event['args'][key]
+        return rows
+
+    def write(self):
+        """写出 trace 文件并打印汇总，返回文件路径"""
+        if not self.enabled or not self.events:
+            return None
+        trace = {
+            'traceEvents': sorted(self.events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms',
+            'otherData': {'name': self.name, 'argv': sys.argv, 'created': datetime.now().isoformat()},
+        }
+        try:
+            StateStore.atomic_write(self.path, json.dumps(trace, ensure_ascii=False))
+        except Exception as e:
+            print(f"⚠️ 写入分析文件失败: {e}")
+            return None
+        print(f"\n分析结果已写入 {self.path}")
+        print(f"{'span':<28}{'次数':>6}{'总耗时(s)':>11}{'请求数':>8}{'请求(s)':>10}{'等待(s)':>10}{'其他(s)':>10}")
+        for name, row in sorted(self.summary().items(), key=lambda r: -r[1]['wall_ms']):
+            print(f"{name:<28}{row['count']:>6}{row['wall_ms'] / 1000:>11.2f}{row['requests']:>8}"
+                  f"{row['http_ms'] / 1000:>10.2f}{row['sleep_ms'] / 1000:>10.2f}{row['other_ms'] / 1000:>10.2f}")
+        return self.path
+
+
+class _ProfiledTransport(httpx.AsyncBaseTransport):
+    '''
+        包住 Graph 客户端的底层传输，从发出请求计到响应体读完（或请求失败）
+    '''
+    def __init__(self, inner, profiler):
+        self.inner = inner
+        self.profiler = profiler
+
+    async def handle_async_request(self, request):
+        start = time.perf_counter()
+        try:
+            response = await self.inner.handle_async_request(request)
+        except Exception as e:
+            self.profiler.record_request(request, type(e).__name__, start, time.perf_counter())
+            raise
+        response.stream = _TimedStream(response.stream, lambda: self.profiler.record_request(
+            request, response.status_code, start, time.perf_counter()))
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class _TimedStream(httpx.AsyncByteStream):
+    def __init__(self, inner, on_close):
+        self.inner = inner
+        self.on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self.inner:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.inner.aclose()
+        finally:
+            if self.on_close is not None:
+                self.on_close, on_close = None, self.on_close
+                on_close()
@@ -1,12 +1,14 @@
-import requests
 import os
 import json
 import inspect
+from utils.http_metrics import HttpMetrics
 
 class QLUtils:
     # 青龙面板默认配置
     _QL_HOST = "http://127.0.0.1:5700/open"
     _CONFIG_PATH = "/ql/data/config/auth.json"
+    # 禁用脚本时的回调（如常驻调度进程移除对应任务），参数为脚本文件名
+    _disable_hooks = []
 
     @staticmethod
     def disable_self(script_name=None):
@@ -16,6 +18,11 @@ class QLUtils:
             caller_frame = inspect.stack()[1]
             script_name = os.path.basename(caller_frame.filename)
             print(f"禁用调用脚本为：{script_name}")
+        for hook in QLUtils._disable_hooks:
+            try:
+                hook(script_name)
+            except Exception as e:
+                print(f"[内部错误] 禁用回调失败: {e}")
         # 调用内部方法链
         token = QLUtils._get_local_token()
         if not token:
@@ -48,7 +55,7 @@ class QLUtils:
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
             }
-            response = requests.get(url, headers=headers)
+            response = HttpMetrics.session().get(url, headers=headers)
             crons = response.json().get("data", []).get("data", [])
 
             for cron in crons:
@@ -68,7 +75,7 @@ class QLUtils:
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
             }
-            response = requests.put(url, headers=headers,json=[script_id,])
+            response = HttpMetrics.session().put(url, headers=headers,json=[script_id,])
             return response.json()
         except Exception as e:
             print(f"禁用失败: {str(e)}")
@@ -82,6 +89,18 @@ class QLUtils:
         if path:
             QLUtils._CONFIG_PATH = path
 
+    @staticmethod
+    def add_disable_hook(hook):
+        """对外接口：注册禁用脚本时的回调 hook(script_name)"""
+        QLUtils._disable_hooks.append(hook)
+
+    @staticmethod
+    def init_from_env():
+        """对外接口：部署有前缀（环境变量 QlBaseUrl）时适配接口地址"""
+        base_url = os.environ.get("QlBaseUrl")
+        if base_url is not None:
+            QLUtils.set_config(host=f'http://127.0.0.1:5700{base_url}/open')
+
 # 测试用例
 if __name__ == "__main__":
     # 如需修改配置，可在调用前设置
@@ -0,0 +1,135 @@
+'''
+数值时间序列存储
+
+追加式 SQLite 存储，数值按十进制文本保存以保持精确（代币数量常超过 64 位整数），
+支持范围查询、时间窗口内的变化量计算以及压缩历史数据。
+'''
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+
+class SeriesStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS series (
+                name TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (name, ts)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def _ts(value):
+        """时间参数转为秒级时间戳，支持 datetime 或数字"""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return int(value.timestamp())
+        return int(value)
+
+    @staticmethod
+    def _int_text(value):
+        """整数或十进制整数字符串转为规范的十进制文本，其他值返回 None"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return str(value)
+        if isinstance(value, str) and re.fullmatch(r'[+-]?\d+', value.strip()):
+            return str(int(value))
+        return None
+
+    def append(self, name, value, ts=None):
+        """
+        追加一个采样点，value 为整数或整数字符串
+        :return: 是否写入；非整数值（如接口返回的错误信息、小数）跳过并打印警告
+        """
+        text = self._int_text(value)
+        if text is None:
+            print(f"⚠️ {name} 的值 {value!r} 不是整数，跳过记录")
+            return False
+        ts = self._ts(ts) if ts is not None else int(time.time())
+        self.conn.execute(
+            'INSERT OR REPLACE INTO series (name, ts, value) VALUES (?, ?, ?)',
+            (name, ts, text)
+        )
+        self.conn.commit()
+        return True
+
+    def range(self, name, start=None, end=None):
+        """按时间范围查询，返回 [(ts, int)]，按时间升序"""
+        sql = 'SELECT ts, value FROM series WHERE name = ?'
+        params = [name]
+        if start is not None:
+            sql += ' AND ts >= ?'
+            params.append(self._ts(start))
+        if end is not None:
+            sql += ' AND ts < ?'
+            params.append(self._ts(end))
+        rows = self.conn.execute(sql + ' ORDER BY ts', params).fetchall()
+        return [(ts, int(value)) for ts, value in rows]
+
+    def latest(self, name):
+        """最新的采样点 (ts, int)，没有记录时为 None"""
+        row = self.conn.execute(
+            'SELECT ts, value FROM series WHERE name = ? ORDER BY ts DESC LIMIT 1', (name,)
+        ).fetchone()
+        return (row[0], int(row[1])) if row else None
+
+    def value_at(self, name, ts):
+        """某一时刻的值（该时刻及之前最后一个采样点）"""
+        row = self.conn.execute(
+            'SELECT ts, value FROM series WHERE name = ? AND ts <= ? ORDER BY ts DESC LIMIT 1',
+            (name, self._ts(ts))
+        ).fetchone()
+        return (row[0], int(row[1])) if row else None
+
+    def delta(self, name, window):
+        """
+        最新值与 window 秒之前的值比较
+        :return: {'old', 'new', 'change', 'percent'}，数据不足时为 None
+        """
+        latest = self.latest(name)
+        if not latest:
+            return None
+        base = self.value_at(name, latest[0] - window)
+        if not base:
+            return None
+        old, new = base[1], latest[1]
+        change = new - old
+        percent = change * 100 / old if old else None
+        return {'old': old, 'new': new, 'change': change, 'percent': percent}
+
+    def compact(self, older_than, name=None):
+        """
+        压缩 older_than 秒之前的历史：只保留值发生变化的采样点，
+        序列按阶梯函数理解，value_at 的结果不受影响
+        :return: 删除的记录数
+        """
+        cutoff = int(time.time()) - older_than
+        names = [name] if name else [r[0] for r in self.conn.execute('SELECT DISTINCT name FROM series')]
+        removed = 0
+        for series_name in names:
+            rows = self.conn.execute(
+                'SELECT ts, value FROM series WHERE name = ? AND ts < ? ORDER BY ts',
+                (series_name, cutoff)
+            ).fetchall()
+            redundant = [(series_name, ts) for (ts, value), (_, prev) in zip(rows[1:], rows) if value == prev]
+            self.conn.executemany('DELETE FROM series WHERE name = ? AND ts = ?', redundant)
+            removed += len(redundant)
+        self.conn.commit()
+        return removed
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,153 @@
+'''
+状态文件存储
+
+各监测脚本共用的状态文件层：
+- 原子写入：写临时文件 + fsync 后 os.replace，崩溃时不会留下半截文件
+- 文件锁：定时任务重叠执行时串行化读改写
+- 版本号：数据外包一层 {"version": n, "data": ...}，旧格式文件视为版本 0
+- 序列化：默认 JSON（安装了 orjson 时自动使用），可选 msgpack
+'''
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+# 可选依赖，未安装时使用标准库
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class StateStore:
+    def __init__(self, path, version=1, default=None, migrate=None, serializer='json'):
+        """
+        :param path: 状态文件路径
+        :param version: 当前数据版本
+        :param default: 文件不存在或无法读取时的默认值（函数或值）
+        :param migrate: 旧版本数据迁移函数 (data, old_version) -> data，不传则按原样使用
+        :param serializer: 'json' 或 'msgpack'
+        """
+        self.path = path
+        self.version = version
+        self.default = default
+        self.migrate = migrate
+        self.serializer = 'msgpack' if serializer == 'msgpack' and msgpack is not None else 'json'
+        self._data = None
+        self._loaded = False
+
+    def _default(self):
+        return self.default() if callable(self.default) else self.default
+
+    @property
+    def data(self):
+        """首次访问时才读取文件"""
+        if not self._loaded:
+            self.load()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._loaded = True
+
+    @staticmethod
+    def _decode(raw):
+        """根据内容自动识别格式"""
+        if raw.lstrip()[:1] in (b'{', b'['):
+            return orjson.loads(raw) if orjson is not None else json.loads(raw.decode('utf-8'))
+        if msgpack is None:
+            raise ValueError("状态文件为 msgpack 格式，但未安装 msgpack")
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+    def _encode(self, payload):
+        if self.serializer == 'msgpack':
+            return msgpack.packb(payload, use_bin_type=True)
+        if orjson is not None:
+            # 与 json 一致，允许非字符串的键（如整数）并转为字符串
+            return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def load(self):
+        """读取状态，文件损坏时打印警告并使用默认值"""
+        data = self._default()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    payload = self._decode(f.read())
+                if isinstance(payload, dict) and set(payload) == {'version', 'data'}:
+                    stored_version, data = payload['version'], payload['data']
+                else:
+                    # 未带版本号的旧格式文件
+                    stored_version, data = 0, payload
+                if stored_version > self.version:
+                    print(f"⚠️ 状态文件 {self.path} 版本 {stored_version} 高于当前 {self.version}，忽略")
+                    data = self._default()
+                elif stored_version < self.version and self.migrate:
+                    data = self.migrate(data, stored_version)
+            except Exception as e:
+                print(f"⚠️ 读取状态文件 {self.path} 失败，使用默认值: {e}")
+                data = self._default()
+        self.data = data
+        return data
+
+    def save(self, data=None):
+        """原子写入状态"""
+        if data is not None:
+            self.data = data
+        self.atomic_write(self.path, self._encode({'version': self.version, 'data': self._data}))
+
+    @staticmethod
+    def atomic_write(path, content):
+        """写临时文件并 fsync 后替换目标文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # 同步目录项，保证 rename 落盘
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    @contextmanager
+    def lock(self):
+        """独占文件锁（锁文件与状态文件分开，不受 os.replace 影响）"""
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.path + '.lock'
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        """加锁后重新读取，退出时写回：with store.transaction() as data: ..."""
+        with self.lock():
+            data = self.load()
+            yield data
+            self.save(data)
@@ -0,0 +1,241 @@
+'''
+声明式监测引擎
+
+每个监测项（Watch）只描述：从哪里取数据（URL 或函数）、如何提取、如何比较、
+如何通知、什么时候不再需要监测。WatchEngine 在一个进程里用共享的异步连接池
+并发执行所有到期的监测项，状态统一保存在一个状态文件里；
+状态文件里还没有某个监测项时，用它的 seed 从原脚本的状态文件接续，切换后不会重复推送。
+
+同一个监测只能由一个入口执行：设置 watch_runner=1 启用统一监测（watch_runner.py）后，
+被它加载的脚本单独运行时不再推送变化，否则两边各推一次。
+'''
+import os
+import re
+import time
+import asyncio
+import inspect
+import httpx
+from utils.notify_utils import BarkNotify
+from utils.state_store import StateStore
+
+# HTTP/2 需要 h2（httpx[http2]），未安装时使用 HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# 条件请求返回 304 时的取数结果
+NOT_MODIFIED = object()
+
+# 统一监测默认加载的监测脚本，可通过环境变量 watch_modules 覆盖（逗号分隔）
+DEFAULT_MODULES = ['miit_monitor', 'apple_monitor1', 'apple_monitor2', 'AxCNH_monitor']
+
+
+def runner_modules():
+    """统一监测加载的监测脚本"""
+    return [m for m in re.split(r'[,，\s]+', os.environ.get('watch_modules', '')) if m] or DEFAULT_MODULES
+
+
+def runner_enabled():
+    return os.environ.get('watch_runner') == '1'
+
+
+def handled_by_runner(module_name):
+    """该脚本的监测是否已由统一监测负责（此时脚本单独运行时不应推送）"""
+    if runner_enabled() and module_name in runner_modules():
+        print(f"⚠️ {module_name} 已由统一监测（watch_runner=1）执行，本脚本不推送变化")
+        return True
+    return False
+
+
+class Watch:
+    '''
+        单个监测项
+    '''
+    def __init__(self, name, url=None, fetch=None, extract=None, compare=None, notify=None,
+                 disable_when=None, interval=600, method='GET', params=None, headers=None,
+                 conditional=False, title=None, body=None, group=None,
+                 level=BarkNotify.Level.CRITICAL, link=None, seed=None):
+        """
+        :param name: 唯一名称，同时作为状态文件中的键
+        :param url: 请求地址，与 fetch 二选一
+        :param fetch: 取数函数，可以是协程函数 (client, 旧值) -> 数据（使用引擎共享的 httpx 客户端），
+                      也可以是普通函数 () -> 数据（在线程中执行）
+        :param extract: 提取函数 (响应或 fetch 结果) -> 可 JSON 序列化的值
+        :param compare: 比较函数 (旧值, 新值) -> 变化列表，默认值不同即为一条变化，首次运行不算变化
+        :param notify: 通知函数 (变化) -> None，默认按 title / body 推送 Bark
+        :param disable_when: 停用条件 (新值) -> bool，满足后该监测项不再执行
+        :param interval: 执行间隔（秒）
+        :param conditional: 是否发送 If-None-Match / If-Modified-Since 条件请求，304 视为未变化
+        :param seed: 初始状态函数 () -> 状态条目（如 {'value': ..., 'etag': ...}）或 None，
+                     状态文件中还没有该监测项时调用，用于从原脚本的状态文件接续
+        """
+        if url is None and fetch is None:
+            raise ValueError(f"监测项 {name} 需要 url 或 fetch")
+        self.name = name
+        self.url = url
+        self.fetch = fetch
+        self.extract = extract
+        self.compare = compare or self.value_changed
+        self.notify = notify or self.default_notify
+        self.disable_when = disable_when
+        self.interval = interval
+        self.method = method
+        self.params = params
+        self.headers = headers
+        self.conditional = conditional
+        self.title = title or f'{name}出现变动'
+        self.body = body
+        self.group = group
+        self.level = level
+        self.link = link or url
+        self.seed = seed
+
+    @staticmethod
+    def value_changed(old, new):
+        """默认比较：有旧值且与新值不同"""
+        if old is None or old == new:
+            return []
+        return [{'old': old, 'new': new}]
+
+    def default_notify(self, change):
+        body = self.body(change) if callable(self.body) else (self.body or f"{change}")
+        print(f"{self.title}: {body}")
+        BarkNotify.send_notify(self.title, body, group=self.group, level=self.level, url=self.link)
+
+    @staticmethod
+    def default_extract(response):
+        if 'json' in response.headers.get('content-type', ''):
+            return response.json()
+        return response.text
+
+
+class WatchEngine:
+    '''
+        监测项调度：按间隔执行到期的监测项，所有 HTTP 请求共用一个 httpx.AsyncClient
+    '''
+    DEFAULT_STATE_PATH = '/ql/data/watch_state.json'
+    # 定时任务触发时间有抖动，提前这么多秒也算到期
+    DUE_SLACK = 30
+
+    def __init__(self, watches, state_path=DEFAULT_STATE_PATH, client=None, max_concurrency=8):
+        names = [w.name for w in watches]
+        if len(names) != len(set(names)):
+            raise ValueError("监测项名称重复")
+        self.watches = list(watches)
+        self.store = StateStore(state_path, default=dict)
+        self.client = client
+        self._own_client = client is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2, timeout=30, follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"},
+            )
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._own_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @staticmethod
+    def _entry(watch, state):
+        """监测项的状态条目，还没有时用 seed 生成"""
+        if watch.name in state:
+            return state[watch.name]
+        if watch.seed is None:
+            return {}
+        try:
+            return dict(watch.seed() or {})
+        except Exception as e:
+            print(f"{watch.name} 读取原有状态失败: {e}")
+            return {}
+
+    def _due(self, watch, entry, now, force=False):
+        if entry.get('disabled'):
+            return False
+        return force or now - entry.get('checked_at', 0) >= watch.interval - self.DUE_SLACK
+
+    async def _fetch(self, watch, entry):
+        """取数，返回 (数据, 新的校验值)；条件请求命中 304 时数据为 NOT_MODIFIED"""
+        if watch.fetch is not None:
+            if inspect.iscoroutinefunction(watch.fetch):
+                data = await watch.fetch(self.client, entry.get('value'))
+            else:
+                data = await asyncio.to_thread(watch.fetch)
+            return (watch.extract(data) if watch.extract else data), {}
+
+        headers = dict(watch.headers or {})
+        if watch.conditional:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = await self.client.request(watch.method, watch.url, params=watch.params, headers=headers)
+        if response.status_code == 304:
+            return NOT_MODIFIED, {}
+        response.raise_for_status()
+        validators = {}
+        if watch.conditional:
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        return (watch.extract or Watch.default_extract)(response), validators
+
+    async def check(self, watch, entry):
+        """执行一个监测项，返回更新后的状态条目"""
+        entry = dict(entry)
+        async with self._semaphore:
+            try:
+                value, validators = await self._fetch(watch, entry)
+            except Exception as e:
+                print(f"{watch.name} 检查失败: {e}")
+                return entry
+        entry['checked_at'] = int(time.time())
+        if value is NOT_MODIFIED:
+            return entry
+        entry.update(validators)
+        old = entry.get('value')
+        for change in watch.compare(old, value) or []:
+            try:
+                await asyncio.to_thread(watch.notify, change)
+            except Exception as e:
+                print(f"{watch.name} 推送失败: {e}")
+        entry['value'] = value
+        if watch.disable_when and watch.disable_when(value):
+            print(f"{watch.name} 已满足停用条件，不再监测")
+            entry['disabled'] = True
+        return entry
+
+    async def run_once(self, force=False):
+        """执行所有到期的监测项（force 时忽略间隔），返回本次执行的数量"""
+        state = self.store.load()
+        now = time.time()
+        entries = {w.name: self._entry(w, state) for w in self.watches}
+        due = [w for w in self.watches if self._due(w, entries[w.name], now, force)]
+        if not due:
+            return 0
+        checked = await asyncio.gather(*(self.check(w, entries[w.name]) for w in due))
+        # 只写回本次执行的监测项，保留其他进程的记录
+        with self.store.transaction() as state:
+            for watch, entry in zip(due, checked):
+                state[watch.name] = entry
+        return len(due)
+
+    def active(self):
+        """未停用的监测项"""
+        state = self.store.load()
+        return [w for w in self.watches if not state.get(w.name, {}).get('disabled')]
+
+    async def run_forever(self, stop_event=None, tick=5):
+        """常驻执行，直到 stop_event 被设置或所有监测项都已停用"""
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set() and self.active():
+            await self.run_once()
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=tick)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,48 @@
+'''
+name: 统一监测
+cron: */5 * * * *
+'''
+# 在一个进程里执行 miit / apple / AxCNH 的所有监测项，共用一个异步连接池
+# 每个监测项按自己的间隔执行；设置 watch_daemon=1 时常驻运行，否则执行一轮到期的监测项后退出
+# 需要设置 watch_runner=1 才会执行；此时被加载的脚本单独运行时不再推送，同一监测只由一个入口推送
+import os
+import sys
+import asyncio
+import importlib
+import traceback
+from utils.ql_utils import QLUtils
+from utils.watcher import WatchEngine, runner_enabled, runner_modules
+
+
+def load_watches(module_names):
+    watches = []
+    for name in module_names:
+        try:
+            module = importlib.import_module(name)
+            watches.extend(module.build_watches())
+        except Exception as e:
+            print(f"加载监测脚本 {name} 失败: {e}")
+    return watches
+
+
+async def main():
+    QLUtils.init_from_env()
+    if not runner_enabled():
+        print("⚠️ 未设置 watch_runner=1，各监测脚本仍由自己的定时任务执行，统一监测不运行，避免重复推送")
+        return
+    watches = load_watches(runner_modules())
+    print(f"已加载 {len(watches)} 个监测项")
+    async with WatchEngine(watches) as engine:
+        if os.environ.get('watch_daemon') == '1':
+            await engine.run_forever()
+        else:
+            count = await engine.run_once()
+            print(f"本次执行 {count} 个监测项")
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print("脚本执行出错:", e)
+        traceback.print_exc(file=sys.stdout)